@@ -0,0 +1,45 @@
+# Micro-benchmark de los extractores HTML sobre paginas construidas con los datos offline.
+# Uso: python benchmarks/bench_extractors.py [--rounds N]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+# Paginas HTML sinteticas compartidas con los tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+from core.extractors import EXTRACTORS, get_extractor
+from mock_pages import get_mock_html_pages
+
+
+def time_extractor(extractor, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for url, html in pages:
+            extractor.extract(html)
+    return (time.perf_counter() - start) / (rounds * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de extractores HTML')
+    parser.add_argument('--rounds', type=int, default=5, help='Repeticiones por conjunto de paginas')
+    args = parser.parse_args()
+    
+    datasets = {
+        "pequenas": get_mock_html_pages("formal") + get_mock_html_pages("humoristico"),
+        "grandes": get_mock_html_pages("formal", repeat=20)
+    }
+    
+    print(f"{'Paginas':<10} {'KB/pag':>8} {'Extractor':<10} {'ms/pag':>10} {'Aceleracion':>12}")
+    print("-" * 54)
+    for label, pages in datasets.items():
+        avg_kb = sum(len(html) for _, html in pages) / len(pages) / 1024
+        results = {name: time_extractor(get_extractor(name), pages, args.rounds) for name in EXTRACTORS}
+        baseline = results["bs4"]
+        for name, seconds in results.items():
+            print(f"{label:<10} {avg_kb:>8.1f} {name:<10} {seconds * 1000:>10.2f} {baseline / seconds:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
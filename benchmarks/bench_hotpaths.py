@@ -0,0 +1,277 @@
+# Micro-benchmarks de los puntos calientes de CPU del pipeline, comparados con benchmarks/baselines.json.
+# Uso: python benchmarks/bench_hotpaths.py [--filter clean_text] [--threshold 0.25] [--save] [--quick]
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+# Paginas HTML sinteticas compartidas con los tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+
+from core.brochure import BrochureGenerator
+from core.compiler import Compiler
+from core.link_selector import LinkSelector
+from core.scraping import Web
+from utils.exporters import markdown_to_html
+from utils.language_detector import detect_language
+from utils.logger import logger
+from utils.mock_responses import get_mock_compiled_content
+from mock_pages import get_mock_html_pages, split_compiled_pages
+from utils.validators import validate_selected_links
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Version del formato de baselines.json
+BASELINES_VERSION = 2
+
+# Pagina fija de la calibracion: unos 40 KB de HTML con titulos, parrafos y enlaces
+CALIBRATION_HTML = "<html><body>" + "".join(
+    f"<div class='seccion-{i}'><h2>Seccion {i}</h2><p>Texto de ejemplo numero {i} sobre productos, "
+    f"clientes y <a href='/pagina/{i}'>servicios</a> de la empresa.</p></div>" for i in range(250)
+) + "</body></html>"
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def calibrate(repeat=5, min_time=0.2):
+    # Carga fija parecida a los casos (bs4, lxml, regex, JSON y dicts) pero sin codigo del proyecto:
+    # su tiempo solo depende de la maquina. Rondas de min_time segundos y la mediana, no el minimo
+    def workload():
+        text = BeautifulSoup(CALIBRATION_HTML, "html.parser").get_text(" ", strip=True)
+        links = lxml_html.document_fromstring(CALIBRATION_HTML).xpath("//a/@href")
+        words = {}
+        for word in WORD_PATTERN.findall(text):
+            words[word.lower()] = words.get(word.lower(), 0) + 1
+        return json.loads(json.dumps({"links": links, "words": words}))
+
+    workload()
+    timer = timeit.Timer(workload)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return statistics.median(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def get_fingerprint():
+    # Misma maquina y mismo interprete: los tiempos se comparan sin escalar
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "system": platform.system(),
+        "cpus": os.cpu_count()
+    }
+
+
+def build_cases():
+    # {nombre: funcion sin argumentos}; los datos se preparan una sola vez, fuera de la medicion
+    formal = get_mock_compiled_content("formal")
+    humorous = get_mock_compiled_content("humoristico")
+    small_pages = [html for _, html in get_mock_html_pages("formal") + get_mock_html_pages("humoristico")]
+    large_pages = [html for _, html in get_mock_html_pages("formal", repeat=10)]
+
+    base_url = "https://huggingface.co"
+    links = []
+    for i in range(10000):
+        if i % 4 == 0:
+            links.append(f"/seccion-{i % 300}/pagina-{i}")
+        elif i % 4 == 1:
+            links.append(f"https://huggingface.co/modelos/{i % 2500}")
+        elif i % 4 == 2:
+            links.append(f"pagina-relativa-{i % 700}.html")
+        else:
+            links.append("#ancla" if i % 8 == 3 else f"javascript:void({i})")
+
+    compiled_pages = {}
+    for page_type, text in list(formal.items()) + list(humorous.items()):
+        for url, content in split_compiled_pages(text):
+            compiled_pages.setdefault(page_type, []).append({"url": url, "title": url, "content": content})
+
+    selected = {"links": [{"type": f"tipo {i % 7}", "url": f"https://ejemplo.com/pagina/{i}", "score": 60 + i % 40,
+                           "rationale": "Pagina relevante para el folleto corporativo."} for i in range(10)]}
+
+    texts = [text for text in list(formal.values()) + list(humorous.values()) if len(text) >= 50]
+
+    generator = BrochureGenerator.__new__(BrochureGenerator)
+    brochure_markdown = generator.generate_formal_brochure_mock(formal)
+
+    def clean_all(pages):
+        for html in pages:
+            Web.clean_text(html)
+
+    return {
+        "clean_text_small": lambda: clean_all(small_pages),
+        "clean_text_large": lambda: clean_all(large_pages),
+        "normalize_links_10k": lambda: LinkSelector.normalize_links(base_url, links),
+        "consolidate_by_type": lambda: Compiler.consolidate_by_type(compiled_pages),
+        "validate_selected_links": lambda: validate_selected_links(selected),
+        "detect_language": lambda: [detect_language(text) for text in texts],
+        "markdown_to_html": lambda: markdown_to_html(brochure_markdown),
+        "extract_formal_info_mock": lambda: generator.extract_formal_info_from_compiled(formal)
+    }
+
+
+def measure(fn, repeat, min_time):
+    # Segundos por llamada: se calibra el numero de llamadas por ronda y se guardan la mediana y el minimo
+    # de las rondas. Se compara el minimo, el menos afectado por otros procesos de la maquina
+    fn()
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    rounds = [seconds / number for seconds in timer.repeat(repeat=repeat, number=number)]
+    return {"median": statistics.median(rounds), "min": min(rounds), "number": number}
+
+
+def load_baselines(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != BASELINES_VERSION:
+        print(f"Aviso: {path} tiene otro formato; se ignora")
+        return None
+    return data
+
+
+def save_baselines(path, results, calibration):
+    data = {
+        "version": BASELINES_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "fingerprint": get_fingerprint(),
+        "calibration": calibration,
+        "cases": {name: {"median": result["median"], "min": result["min"]} for name, result in results.items()}
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def get_scale(baselines, calibration, normalize=True):
+    # Cuanto mas lenta (>1) o rapida (<1) va la maquina que cuando se guardaron las baselines.
+    # En la misma maquina no se escala: el ruido de la calibracion solo anadiria falsas regresiones
+    if not normalize or not baselines or not baselines.get("calibration"):
+        return 1.0
+    if baselines.get("fingerprint") == get_fingerprint():
+        return 1.0
+    return calibration / baselines["calibration"]
+
+
+def compare(results, baselines, scale, threshold):
+    # Devuelve filas (nombre, actual, baseline escalada, ratio, estado); estado REGRESION si ratio > 1 + threshold
+    rows = []
+    for name, result in results.items():
+        baseline = (baselines or {}).get("cases", {}).get(name)
+        if baseline is None:
+            rows.append((name, result["min"], None, None, "NUEVO"))
+            continue
+        expected = baseline["min"] * scale
+        ratio = result["min"] / expected
+        if ratio > 1 + threshold:
+            status = "REGRESION"
+        elif ratio < 1 - threshold:
+            status = "MEJORA"
+        else:
+            status = "ok"
+        rows.append((name, result["min"], expected, ratio, status))
+    return rows
+
+
+def format_time(seconds):
+    if seconds is None:
+        return "-"
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} us"
+
+
+def print_table(rows, scale, threshold):
+    print(f"\n{'Caso':<26} {'Actual':>11} {'Baseline':>11} {'Ratio':>7}  Estado")
+    print("-" * 66)
+    for name, current, expected, ratio, status in rows:
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"{name:<26} {format_time(current):>11} {format_time(expected):>11} {ratio_text:>7}  {status}")
+    scaling = f"baselines escaladas x{scale:.2f} por la calibracion de la maquina" if scale != 1.0 else "baselines sin escalar"
+    print(f"\nTiempo minimo por llamada; {scaling}; umbral de regresion +{threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks de los puntos calientes del pipeline')
+    parser.add_argument('--filter', type=str, default=None, help='Ejecutar solo los casos que contienen este texto')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Empeoramiento tolerado antes de marcar regresion (0.25 = +25%%)')
+    parser.add_argument('--repeat', type=int, default=7, help='Rondas por caso')
+    parser.add_argument('--min_time', type=float, default=0.2, help='Segundos minimos por ronda')
+    parser.add_argument('--quick', action='store_true', help='Menos rondas y mas cortas (orientativo)')
+    parser.add_argument('--baselines', type=str, default=BASELINES_PATH, help='Fichero de baselines')
+    parser.add_argument('--save', action='store_true', help='Guardar los resultados como nuevas baselines')
+    parser.add_argument('--no_normalize', action='store_true', help='Comparar tiempos absolutos sin escalar por la calibracion')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.repeat, args.min_time = 3, 0.05
+
+    # Sin log (clean_text no usa la cache de contenido salvo que se pida): se mide el trabajo de CPU, no la E/S
+    logger.setLevel(logging.CRITICAL)
+
+    cases = build_cases()
+    if args.filter:
+        cases = {name: fn for name, fn in cases.items() if args.filter in name}
+        if not cases:
+            parser.error(f"Ningun caso contiene '{args.filter}'")
+
+    # La calibracion se repite antes de cada caso y se queda la mediana: en maquinas compartidas
+    # la velocidad varia durante la ejecucion. Solo se usa si las baselines son de otra maquina
+    baselines = load_baselines(args.baselines)
+    calibrations = []
+    results = {}
+    for name, fn in cases.items():
+        print(f"Midiendo {name}...", flush=True)
+        calibrations.append(calibrate())
+        results[name] = measure(fn, args.repeat, args.min_time)
+    calibration = statistics.median(calibrations)
+
+    scale = get_scale(baselines, calibration, normalize=not args.no_normalize)
+    rows = compare(results, baselines, scale, args.threshold)
+
+    # Una regresion solo cuenta si se reproduce: se vuelve a medir el caso con el doble de rondas
+    # y se queda el mejor tiempo de las dos mediciones
+    suspects = [row[0] for row in rows if row[4] == "REGRESION"]
+    if suspects and not args.save:
+        for name in suspects:
+            print(f"Confirmando {name}...", flush=True)
+            retry = measure(cases[name], args.repeat * 2, args.min_time)
+            if retry["min"] < results[name]["min"]:
+                results[name] = retry
+        rows = compare(results, baselines, scale, args.threshold)
+
+    print_table(rows, scale, args.threshold)
+
+    if args.save:
+        # Al filtrar se conservan las baselines del resto de casos
+        if baselines and args.filter:
+            previous = {name: case for name, case in baselines["cases"].items() if name not in results}
+            results = {**previous, **results}
+        save_baselines(args.baselines, results, calibration)
+        print(f"Baselines guardadas en {args.baselines}")
+        return 0
+
+    regressions = [row[0] for row in rows if row[4] == "REGRESION"]
+    if regressions:
+        print(f"Regresiones: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
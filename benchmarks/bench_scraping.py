@@ -0,0 +1,165 @@
+# Benchmark de scraping y compilacion contra el sitio sintetico local (benchmarks/fake_site_server.py).
+# Uso: python benchmarks/bench_scraping.py [--pages 50] [--workers 4] [--skip_dynamic] [--json resultados.json]
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from fake_site_server import FakeSiteServer, add_site_arguments, config_from_args
+from core import scraping
+from core.compiler import Compiler
+from utils.cache_manager import CacheManager
+from utils.cache_store import CacheStore
+from utils.http_client import http_client
+from utils.logger import logger
+from utils.robots_checker import robots_checker
+
+
+def get_server_stats(base_url):
+    response = http_client.get(f"{base_url}/__stats")
+    return response.json()
+
+
+class StageTimer:
+    # Tiempo real, CPU del proceso (solo el scraper: el servidor corre en otro proceso) y bytes servidos
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.results = []
+
+    def run(self, name, pages, fn):
+        served_before = get_server_stats(self.base_url)["bytes"]
+        cpu_before = time.process_time()
+        start = time.perf_counter()
+        extra = fn() or {}
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_before
+        served = get_server_stats(self.base_url)["bytes"] - served_before
+        input_bytes = extra.pop("input_bytes", served)
+
+        result = {
+            "stage": name,
+            "pages": pages,
+            "seconds": round(elapsed, 4),
+            "pages_per_sec": round(pages / elapsed, 2) if elapsed else 0,
+            "mb_per_sec": round(input_bytes / elapsed / 1024 / 1024, 2) if elapsed else 0,
+            "cpu_ms_per_page": round(cpu * 1000 / pages, 3) if pages else 0,
+            **extra
+        }
+        self.results.append(result)
+        return result
+
+
+def run_benchmark(args):
+    with FakeSiteServer(config_from_args(args)) as base_url:
+        site = get_server_stats(base_url)
+        urls = [base_url + path for path in site["pages"]]
+        timer = StageTimer(base_url)
+
+        # Fallback dinamico: se cuenta siempre y, con --skip_dynamic, no se lanza el navegador
+        dynamic_calls = []
+        get_data_dynamic = scraping.Web.get_data_dynamic
+
+        def counted_dynamic(url, timeout=30):
+            dynamic_calls.append(url)
+            return None if args.skip_dynamic else get_data_dynamic(url, timeout=timeout)
+
+        scraping.Web.get_data_dynamic = staticmethod(counted_dynamic)
+
+        def check_robots():
+            robots_checker.parsers.clear()
+            blocked = sum(1 for url in urls if not robots_checker.can_fetch(url))
+            return {"blocked": blocked, "input_bytes": 0}
+
+        downloaded = {}
+
+        def download():
+            def get(url):
+                return url, scraping.Web.get_data(url)
+
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                for url, html in executor.map(get, urls):
+                    if html:
+                        downloaded[url] = html
+            return {"failed": len(urls) - len(downloaded)}
+
+        def extract():
+            for html in downloaded.values():
+                scraping.Web.clean_text(html, use_cache=args.parsed_cache)
+            return {"input_bytes": sum(len(html.encode("utf-8")) for html in downloaded.values())}
+
+        compiled = {}
+
+        def compile_site():
+            dynamic_calls.clear()
+            selected = {"links": [{"type": page_type, "url": base_url + path, "score": 80}
+                                  for path, page_type in site["pages"].items()]}
+            compiled.update(Compiler.compile_pages(selected, delay=0, max_workers=args.workers,
+                                                   per_host_concurrency=args.workers))
+            kept = sum(len(pages) for pages in compiled.values())
+            return {"failed": len(urls) - kept, "dynamic_fallbacks": len(dynamic_calls)}
+
+        def consolidate():
+            content = Compiler.consolidate_by_type(compiled)
+            return {"input_bytes": sum(len(page["content"].encode("utf-8")) for pages in compiled.values() for page in pages),
+                    "output_chars": sum(len(text) for text in content.values())}
+
+        timer.run("robots", len(urls), check_robots)
+        timer.run("descarga", len(urls), download)
+        timer.run("extraccion", len(downloaded), extract)
+        timer.run("compilacion", len(urls), compile_site)
+        timer.run("consolidacion", sum(len(pages) for pages in compiled.values()), consolidate)
+
+        server = get_server_stats(base_url)
+        summary = {key: server[key] for key in ("requests", "bytes", "errors", "slow", "not_found")}
+        return {"config": site["config"], "workers": args.workers, "stages": timer.results, "server": summary}
+
+
+def print_report(report):
+    print(f"\nSitio: {report['config']['pages']} paginas de ~{report['config']['page_kb']} KB, {report['workers']} hilos")
+    print(f"{'Etapa':<14} {'Paginas':>8} {'Seg':>8} {'Pag/s':>9} {'MB/s':>8} {'CPU ms/pag':>11}  Notas")
+    print("-" * 80)
+    for stage in report["stages"]:
+        notes = ", ".join(f"{key}={value}" for key, value in stage.items()
+                          if key not in ("stage", "pages", "seconds", "pages_per_sec", "mb_per_sec", "cpu_ms_per_page"))
+        print(f"{stage['stage']:<14} {stage['pages']:>8} {stage['seconds']:>8.3f} {stage['pages_per_sec']:>9.1f} "
+              f"{stage['mb_per_sec']:>8.2f} {stage['cpu_ms_per_page']:>11.2f}  {notes}")
+    server = report["server"]
+    print(f"\nServidor: {server['requests']} peticiones, {server['bytes'] / 1024 / 1024:.1f} MB, "
+          f"{server['errors']} errores, {server['slow']} lentas, {server['not_found']} no encontradas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de scraping contra un sitio sintetico local')
+    add_site_arguments(parser)
+    parser.add_argument('--workers', type=int, default=4, help='Descargas simultaneas')
+    parser.add_argument('--skip_dynamic', action='store_true', help='Contar los fallbacks dinamicos sin lanzar el navegador')
+    parser.add_argument('--parsed_cache', action='store_true', help='Usar la cache de contenido extraido (por defecto se mide la extraccion)')
+    parser.add_argument('--json', type=str, default=None, help='Guardar los resultados en este fichero JSON')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar el log del scraper')
+    args = parser.parse_args()
+
+    # Los errores y bloqueos esperados ya aparecen en la tabla
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    # Cache temporal: el benchmark no lee ni ensucia la cache real de data/
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        CacheManager._store = CacheStore(os.path.join(tmp_dir, "cache.sqlite3"))
+        report = run_benchmark(args)
+        CacheManager._store = None
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
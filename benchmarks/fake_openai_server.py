@@ -0,0 +1,378 @@
+# Servidor local compatible con /v1/chat/completions de OpenAI para pruebas de carga sin coste.
+# Uso: python benchmarks/fake_openai_server.py [--port 8800] [--latency_ms 400] [--tokens_per_sec 80] [--error_rate_429 0.05]
+# y despues: python src/cli.py --openai_base_url http://127.0.0.1:8800/v1 ... (con cualquier OPENAI_API_KEY no vacia).
+# Las caches de selecciones y respuestas incluyen el endpoint en la clave: lo generado aqui no se sirve a ejecuciones reales
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from utils.token_budget import token_budget
+
+# Tipo de pagina segun palabras de la URL, para respuestas del selector con forma realista
+LINK_TYPES = [
+    ("about page", ("about", "company", "nosotros", "empresa", "mission")),
+    ("products page", ("product", "service", "solution", "platform", "pricing")),
+    ("customers page", ("customer", "client", "case", "partner")),
+    ("careers page", ("career", "job", "empleo", "join")),
+    ("culture page", ("culture", "team", "values", "equipo")),
+    ("contact page", ("contact",)),
+    ("news page", ("news", "blog", "press"))
+]
+
+NUMBERED_LINK_PATTERN = re.compile(r"^(\d+) (\S+)", re.M)
+LISTED_LINK_PATTERN = re.compile(r"^\s*- (https?://\S+)", re.M)
+
+# Prefijos minimos para que el proveedor cachee el prompt (como la API: a partir de 1024 tokens, en bloques de 128)
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+
+class ServerConfig:
+    """
+    Comportamiento del servidor: latencia hasta el primer token segun una
+    distribucion (fixed, uniform, lognormal o exponential), velocidad de
+    generacion en tokens/s y errores 429/500 inyectados con Retry-After.
+    """
+
+    def __init__(self, latency_ms=300, latency_dist="lognormal", latency_jitter=0.5, tokens_per_sec=100,
+                 error_rate_429=0.0, error_rate_500=0.0, retry_after=1.0, seed=42):
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.latency_jitter = latency_jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate_429 = error_rate_429
+        self.error_rate_500 = error_rate_500
+        self.retry_after = retry_after
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def sample_latency(self, rng):
+        # Segundos hasta el primer token; latency_ms es la mediana (lognormal) o la media (resto)
+        base = self.latency_ms / 1000
+        if self.latency_dist == "fixed" or base <= 0:
+            return max(0.0, base)
+        if self.latency_dist == "uniform":
+            return max(0.0, rng.uniform(base * (1 - self.latency_jitter), base * (1 + self.latency_jitter)))
+        if self.latency_dist == "exponential":
+            return rng.expovariate(1 / base)
+        return rng.lognormvariate(0, self.latency_jitter) * base
+
+
+def classify_request(body):
+    # selector (JSON con URLs o indices), translator o writer, segun el system y el formato pedido
+    messages = body.get("messages") or []
+    system = next((message.get("content") or "" for message in messages if message.get("role") == "system"), "")
+    if (body.get("response_format") or {}).get("type") == "json_schema":
+        return "selector"
+    if "Link Selector" in system:
+        return "selector"
+    if "Translator" in system:
+        return "translator"
+    return "writer"
+
+
+def get_link_type(url):
+    lowered = url.lower()
+    for page_type, keywords in LINK_TYPES:
+        if any(keyword in lowered for keyword in keywords):
+            return page_type
+    return None
+
+
+def reply_selector(body, user_text):
+    # Indices (salida estructurada) o URLs (JSON clasico) de los enlaces con tipo reconocible, como mucho 8
+    links = []
+    if body.get("response_format"):
+        for index, path in NUMBERED_LINK_PATTERN.findall(user_text):
+            page_type = "home page" if path == "/" else get_link_type(path)
+            if page_type and len(links) < 8:
+                links.append({"index": int(index), "type": page_type, "score": 90 - 5 * len(links),
+                              "rationale": "Pagina relevante para el folleto."})
+        return json.dumps({"links": links})
+
+    for url in LISTED_LINK_PATTERN.findall(user_text):
+        page_type = get_link_type(url)
+        if page_type and len(links) < 8:
+            links.append({"type": page_type, "url": url, "score": 90 - 5 * len(links),
+                          "rationale": "Pagina relevante para el folleto."})
+    return json.dumps({"links": links})
+
+
+def reply_translator(user_text):
+    # Devuelve la seccion recibida: conserva la estructura Markdown, como una traduccion fiel
+    _, _, original = user_text.partition("FOLLETO ORIGINAL:")
+    return original.strip() or user_text
+
+
+def reply_writer(user_text, rng):
+    match = re.search(r"Empresa: (.+)", user_text)
+    company = match.group(1).strip() if match else "Empresa"
+    sections = ["Resumen", "Propuesta de valor", "Productos/Servicios", "Clientes", "Cultura", "Carreras", "Contacto"]
+    words = re.findall(r"[^\W\d_]{4,}", user_text)[:400] or ["empresa", "soluciones", "clientes"]
+    parts = [f"# {company}", "*Folleto corporativo generado por el servidor de pruebas.*"]
+    for section in sections:
+        parts.append(f"## {section}")
+        parts.append(" ".join(rng.choice(words) for _ in range(60)).capitalize() + ".")
+        parts.append("\n".join(f"- **{rng.choice(words).capitalize()}**: {' '.join(rng.choice(words) for _ in range(12))}."
+                               for _ in range(3)))
+    parts.append("---\n*Nota legal: contenido de prueba sin validez comercial.*")
+    return "\n\n".join(parts)
+
+
+class FakeOpenAIState:
+    # Estado compartido por los hilos del servidor: secuencia aleatoria, prefijos vistos y estadisticas
+    def __init__(self, config):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.prefixes = set()
+        self.stats = {}
+
+    def record(self, kind, key, amount=1):
+        with self.lock:
+            entry = self.stats.setdefault(kind, {"requests": 0, "ok": 0, "429": 0, "500": 0,
+                                                 "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0})
+            entry[key] += amount
+
+    def roll(self):
+        with self.lock:
+            return self.rng.random(), self.config.sample_latency(self.rng), random.Random(self.rng.random())
+
+    def cached_tokens(self, messages, model):
+        # Tokens del prefijo (todo menos el ultimo mensaje) ya vistos en una peticion anterior
+        prefix = messages[:-1]
+        prefix_tokens = token_budget.count_messages(prefix, model)
+        if prefix_tokens < CACHE_MIN_TOKENS:
+            return 0
+        key = hashlib.sha256(json.dumps([model, prefix], sort_keys=True).encode("utf-8")).hexdigest()
+        with self.lock:
+            seen = key in self.prefixes
+            self.prefixes.add(key)
+        return prefix_tokens // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS if seen else 0
+
+
+def make_handler(state):
+    config = state.config
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, data, headers=None):
+            payload = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/__stats":
+                with state.lock:
+                    return self.send_json(200, {"config": config.to_dict(), "stages": json.loads(json.dumps(state.stats))})
+            self.send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self.send_json(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self.send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+            kind = classify_request(body)
+            state.record(kind, "requests")
+            roll, latency, rng = state.roll()
+
+            if roll < config.error_rate_429:
+                state.record(kind, "429")
+                time.sleep(min(latency, 0.05))
+                return self.send_json(429, {"error": {"message": "Rate limit reached (servidor de pruebas)",
+                                                      "type": "requests", "code": "rate_limit_exceeded"}},
+                                      headers={"Retry-After": f"{config.retry_after:g}",
+                                               "x-ratelimit-reset-requests": f"{config.retry_after:g}s"})
+            if roll < config.error_rate_429 + config.error_rate_500:
+                state.record(kind, "500")
+                time.sleep(latency)
+                return self.send_json(500, {"error": {"message": "Internal server error (servidor de pruebas)",
+                                                      "type": "server_error"}})
+
+            self.complete(body, kind, latency, rng)
+
+        def complete(self, body, kind, latency, rng):
+            model = body.get("model", "gpt-4o-mini")
+            messages = body.get("messages") or []
+            user_text = messages[-1].get("content", "") if messages else ""
+
+            if kind == "selector":
+                text = reply_selector(body, user_text)
+            elif kind == "translator":
+                text = reply_translator(user_text)
+            else:
+                text = reply_writer(user_text, rng)
+
+            # Salida troceada como la generaria el modelo; se corta en max_tokens
+            pieces = re.findall(r"\S+\s*|\s+", text)
+            max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+            finish_reason = "stop"
+            if max_tokens and token_budget.count(text, model) > max_tokens:
+                pieces = token_budget.trim(text, max_tokens, model, separators=(" ",)).split(" ")
+                pieces = [piece + " " for piece in pieces]
+                finish_reason = "length"
+            text = "".join(pieces)
+
+            prompt_tokens = token_budget.count_messages(messages, model)
+            completion_tokens = token_budget.count(text, model)
+            cached_tokens = state.cached_tokens(messages, model)
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+            state.record(kind, "ok")
+            state.record(kind, "prompt_tokens", prompt_tokens)
+            state.record(kind, "completion_tokens", completion_tokens)
+            state.record(kind, "cached_tokens", cached_tokens)
+
+            time.sleep(latency)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            if body.get("stream"):
+                return self.stream(completion_id, model, pieces, finish_reason, usage,
+                                   (body.get("stream_options") or {}).get("include_usage"))
+
+            if config.tokens_per_sec:
+                time.sleep(completion_tokens / config.tokens_per_sec)
+            self.send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}],
+                "usage": usage
+            })
+
+        def stream(self, completion_id, model, pieces, finish_reason, usage, include_usage):
+            # Server-sent events terminados en [DONE]; sin Content-Length, se cierra la conexion al acabar
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def send_chunk(choices, extra=None):
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": choices, **(extra or {})}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            send_chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for piece in pieces:
+                if config.tokens_per_sec:
+                    time.sleep(token_budget.count(piece, model) / config.tokens_per_sec)
+                send_chunk([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            send_chunk([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+            if include_usage:
+                send_chunk([], {"usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(config, port=8800, host="127.0.0.1", ready=None):
+    server = ThreadingHTTPServer((host, port), make_handler(FakeOpenAIState(config)))
+    server.daemon_threads = True
+    if ready is not None:
+        ready.put(server.server_address[1])
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class FakeOpenAIServer:
+    """
+    Arranca el servidor en un proceso aparte. Uso:
+    `with FakeOpenAIServer(ServerConfig(...)) as base_url:` (base_url ya incluye /v1).
+    """
+
+    def __init__(self, config=None, port=0, host="127.0.0.1"):
+        self.config = config or ServerConfig()
+        self.port = port
+        self.host = host
+        self.process = None
+
+    def start(self):
+        ready = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=serve, args=(self.config, self.port, self.host, ready), daemon=True)
+        self.process.start()
+        self.port = ready.get(timeout=30)
+        return self.base_url
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(timeout=5)
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_server_arguments(parser):
+    parser.add_argument('--latency_ms', type=float, default=300, help='Latencia hasta el primer token en ms (mediana o media)')
+    parser.add_argument('--latency_dist', type=str, choices=['fixed', 'uniform', 'lognormal', 'exponential'], default='lognormal',
+                        help='Distribucion de la latencia')
+    parser.add_argument('--latency_jitter', type=float, default=0.5, help='Dispersion: sigma (lognormal) o fraccion (uniform)')
+    parser.add_argument('--tokens_per_sec', type=float, default=100, help='Velocidad de generacion (0 = instantanea)')
+    parser.add_argument('--error_rate_429', type=float, default=0.0, help='Fraccion de peticiones rechazadas con 429')
+    parser.add_argument('--error_rate_500', type=float, default=0.0, help='Fraccion de peticiones con error 500')
+    parser.add_argument('--retry_after', type=float, default=1.0, help='Segundos indicados en Retry-After de los 429')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de latencias y errores')
+
+
+def config_from_args(args):
+    return ServerConfig(latency_ms=args.latency_ms, latency_dist=args.latency_dist, latency_jitter=args.latency_jitter,
+                        tokens_per_sec=args.tokens_per_sec, error_rate_429=args.error_rate_429,
+                        error_rate_500=args.error_rate_500, retry_after=args.retry_after, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor local compatible con la API de chat de OpenAI')
+    parser.add_argument('--port', type=int, default=8800, help='Puerto de escucha')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"Servidor OpenAI de pruebas en http://127.0.0.1:{args.port}/v1. Estadisticas en /__stats")
+    serve(config_from_args(args), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
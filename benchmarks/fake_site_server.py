@@ -0,0 +1,303 @@
+# Servidor local que genera sitios web corporativos sinteticos para medir el scraping sin salir a internet.
+# Uso: python benchmarks/fake_site_server.py [--port 8765] [--pages 50] [--page_kb 30] [--js_ratio 0.1] ...
+import argparse
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# Secciones de un sitio corporativo: (tipo de pagina, ruta base, titulo)
+SECTIONS = [
+    ("about page", "/about", "Sobre nosotros"),
+    ("products page", "/products", "Productos"),
+    ("customers page", "/customers", "Clientes"),
+    ("careers page", "/careers", "Trabaja con nosotros"),
+    ("culture page", "/culture", "Cultura y valores"),
+    ("contact page", "/contact", "Contacto"),
+    ("news page", "/news", "Noticias")
+]
+
+# Ruta bloqueada en robots.txt cuando se pide una proporcion de paginas privadas
+PRIVATE_PREFIX = "/private"
+
+FALLBACK_WORDS = (
+    "empresa soluciones clientes equipo innovacion plataforma servicio calidad datos proyecto mercado "
+    "tecnologia producto valor cultura talento crecimiento experiencia sostenible global digital socios"
+).split()
+
+
+def load_vocabulary():
+    # Palabras reales de los datos offline para que el texto se parezca al de un sitio corporativo
+    try:
+        from utils.mock_responses import get_mock_compiled_content
+        text = " ".join(get_mock_compiled_content("formal").values())
+        return re.findall(r"[^\W\d_]{3,}", text) or FALLBACK_WORDS
+    except Exception:
+        return FALLBACK_WORDS
+
+
+class SiteConfig:
+    """
+    Parametros del sitio sintetico. Todo es determinista a partir de la semilla:
+    dos servidores con la misma configuracion sirven exactamente las mismas paginas.
+    """
+
+    def __init__(self, pages=50, page_kb=30, fanout=20, js_ratio=0.1, private_ratio=0.05, latency_ms=0,
+                 slow_ratio=0.0, slow_ms=500, error_rate=0.0, seed=42):
+        self.pages = max(1, pages)
+        self.page_kb = page_kb
+        self.fanout = fanout
+        self.js_ratio = js_ratio
+        self.private_ratio = private_ratio
+        self.latency_ms = latency_ms
+        self.slow_ratio = slow_ratio
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class FakeSite:
+    """
+    Genera el mapa del sitio (ruta -> tipo y variante) y el HTML de cada pagina:
+    menu y pie repetidos en todas las paginas, banner de cookies, contenido de
+    `page_kb` KB y `fanout` enlaces internos. Las paginas "js" solo tienen un
+    contenedor vacio que se rellena con JavaScript, como una SPA.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.words = load_vocabulary()
+        self.pages = self.build_pages()
+        self.paths = list(self.pages)
+
+    def build_pages(self):
+        rng = random.Random(self.config.seed)
+        pages = {"/": {"type": "home page", "title": "Inicio", "kind": "html"}}
+        for index in range(1, self.config.pages):
+            page_type, base, title = SECTIONS[(index - 1) % len(SECTIONS)]
+            # La primera vuelta son las paginas principales de cada seccion; luego subpaginas
+            path = base if index <= len(SECTIONS) else f"{base}/{title.split()[0].lower()}-{index}"
+            if index > len(SECTIONS) and rng.random() < self.config.private_ratio:
+                path = f"{PRIVATE_PREFIX}{path}"
+            kind = "js" if index > 1 and rng.random() < self.config.js_ratio else "html"
+            pages[path] = {"type": page_type, "title": f"{title} {index}", "kind": kind}
+        return pages
+
+    def robots_txt(self):
+        lines = ["User-agent: *"]
+        if self.config.private_ratio > 0:
+            lines.append(f"Disallow: {PRIVATE_PREFIX}/")
+        lines.append("Allow: /")
+        return "\n".join(lines) + "\n"
+
+    def get_rng(self, path):
+        digest = hashlib.blake2b(f"{self.config.seed}:{path}".encode("utf-8"), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, "big"))
+
+    def paragraph(self, rng, words):
+        text = " ".join(rng.choice(self.words) for _ in range(words))
+        return text[0].upper() + text[1:] + "."
+
+    def render(self, path):
+        page = self.pages[path]
+        rng = self.get_rng(path)
+        nav = "".join(f'<li><a href="{base}">{html.escape(title)}</a></li>' for _, base, title in SECTIONS)
+        links = "".join(
+            f'<li><a href="{target}">{html.escape(self.pages[target]["title"])}</a></li>'
+            for target in rng.sample(self.paths, min(self.config.fanout, len(self.paths)))
+        )
+
+        body = []
+        size = 0
+        target_size = self.config.page_kb * 1024
+        while size < target_size:
+            if len(body) % 5 == 0:
+                block = f"<h2>{html.escape(self.paragraph(rng, 5))}</h2>"
+            else:
+                block = f"<p>{html.escape(self.paragraph(rng, rng.randint(30, 80)))}</p>"
+            body.append(block)
+            size += len(block)
+
+        main = f"""<h1>{html.escape(page["title"])}</h1>
+{chr(10).join(body)}
+<section class="related"><h3>Tambien te puede interesar</h3><ul>{links}</ul></section>"""
+        if page["kind"] == "js":
+            # Contenido que solo aparece tras ejecutar el script (necesita el navegador dinamico)
+            main = f'<div id="app"></div>\n<script>document.getElementById("app").innerHTML = {json.dumps(main)};</script>'
+
+        return f"""<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>{html.escape(page["title"])} | Acme Synthetic</title>
+<style>body {{ font-family: sans-serif; }} .cookies {{ position: fixed; bottom: 0; }}</style></head>
+<body>
+<nav><ul>{nav}</ul></nav>
+<div class="cookies">Usamos cookies para mejorar tu experiencia. <a href="/privacy">Politica de privacidad</a></div>
+<main>
+{main}
+</main>
+<footer>Acme Synthetic S.L. Todos los derechos reservados. <a href="/privacy">Privacidad</a> <a href="/terms">Terminos</a></footer>
+</body>
+</html>"""
+
+
+def make_handler(site):
+    config = site.config
+    stats = {"requests": 0, "bytes": 0, "errors": 0, "slow": 0, "not_found": 0}
+    stats_lock = threading.Lock()
+    cache = {}
+    # Una sola secuencia aleatoria para todas las peticiones: errores y esperas reproducibles
+    sequence = random.Random(config.seed)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, status, body, content_type="text/html; charset=utf-8", headers=None, counted=True):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+            if counted:
+                with stats_lock:
+                    stats["bytes"] += len(data)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].split("#", 1)[0]
+            path = path.rstrip("/") or "/"
+
+            if path == "/__stats":
+                with stats_lock:
+                    body = json.dumps(dict(stats, config=config.to_dict(),
+                                           pages={page_path: page["type"] for page_path, page in site.pages.items()}))
+                return self.send_body(200, body, "application/json", counted=False)
+
+            with stats_lock:
+                stats["requests"] += 1
+                roll_error, roll_slow = sequence.random(), sequence.random()
+
+            delay = config.latency_ms
+            if roll_slow < config.slow_ratio:
+                delay += config.slow_ms
+                with stats_lock:
+                    stats["slow"] += 1
+            if delay:
+                time.sleep(delay / 1000)
+
+            if path == "/robots.txt":
+                return self.send_body(200, site.robots_txt(), "text/plain; charset=utf-8")
+
+            if path not in site.pages:
+                with stats_lock:
+                    stats["not_found"] += 1
+                return self.send_body(404, "<html><body><h1>No encontrado</h1></body></html>")
+
+            if roll_error < config.error_rate:
+                with stats_lock:
+                    stats["errors"] += 1
+                status = 503 if roll_error < config.error_rate / 2 else 500
+                return self.send_body(status, "<html><body>Error interno</body></html>", headers={"Retry-After": "0"})
+
+            if path not in cache:
+                cache[path] = site.render(path)
+            self.send_body(200, cache[path], headers={"Cache-Control": "max-age=3600"})
+
+    return Handler
+
+
+def serve(config, port=8765, host="127.0.0.1", ready=None):
+    site = FakeSite(config)
+    server = ThreadingHTTPServer((host, port), make_handler(site))
+    server.daemon_threads = True
+    if ready is not None:
+        ready.put(server.server_address[1])
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class FakeSiteServer:
+    """
+    Arranca el servidor en un proceso aparte (el CPU del servidor no se mezcla
+    con el del scraper medido). Uso: `with FakeSiteServer(SiteConfig(...)) as base_url:`.
+    """
+
+    def __init__(self, config=None, port=0, host="127.0.0.1"):
+        self.config = config or SiteConfig()
+        self.port = port
+        self.host = host
+        self.process = None
+
+    def start(self):
+        ready = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=serve, args=(self.config, self.port, self.host, ready), daemon=True)
+        self.process.start()
+        self.port = ready.get(timeout=30)
+        return self.base_url
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(timeout=5)
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_site_arguments(parser):
+    parser.add_argument('--pages', type=int, default=50, help='Paginas del sitio (incluida la principal)')
+    parser.add_argument('--page_kb', type=int, default=30, help='Tamano aproximado del contenido de cada pagina en KB')
+    parser.add_argument('--fanout', type=int, default=20, help='Enlaces internos por pagina ademas del menu')
+    parser.add_argument('--js_ratio', type=float, default=0.1, help='Fraccion de paginas que solo se ven con JavaScript')
+    parser.add_argument('--private_ratio', type=float, default=0.05, help='Fraccion de subpaginas bloqueadas por robots.txt')
+    parser.add_argument('--latency_ms', type=float, default=0, help='Latencia fija de cada respuesta en ms')
+    parser.add_argument('--slow_ratio', type=float, default=0.0, help='Fraccion de respuestas lentas')
+    parser.add_argument('--slow_ms', type=float, default=500, help='Latencia extra de las respuestas lentas en ms')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Fraccion de respuestas 500/503')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla del contenido y de la secuencia de errores')
+
+
+def config_from_args(args):
+    return SiteConfig(pages=args.pages, page_kb=args.page_kb, fanout=args.fanout, js_ratio=args.js_ratio,
+                      private_ratio=args.private_ratio, latency_ms=args.latency_ms, slow_ratio=args.slow_ratio,
+                      slow_ms=args.slow_ms, error_rate=args.error_rate, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor local de sitios corporativos sinteticos')
+    parser.add_argument('--port', type=int, default=8765, help='Puerto de escucha')
+    add_site_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"Sitio sintetico en http://127.0.0.1:{args.port} ({args.pages} paginas). Estadisticas en /__stats")
+    serve(config_from_args(args), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# Prueba de carga del pipeline LLM (selector -> redactor -> traductor) contra el servidor OpenAI local.
+# Uso: python benchmarks/load_test.py [--concurrency 1,2,4,8] [--runs 8] [--latency_ms 200] [--error_rate_429 0.05] [--json carga.json]
+import argparse
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+# Paginas HTML sinteticas compartidas con los tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+from fake_openai_server import FakeOpenAIServer, add_server_arguments, config_from_args
+from core.brochure import BrochureGenerator
+from core.link_ranker import link_ranker
+from core.link_selector import LinkSelector
+from core.translation import chunked_translator
+from utils.api_openai import OpenAIClient
+from utils.http_client import http_client
+from utils.logger import logger
+from utils.mock_responses import get_mock_compiled_content
+from mock_pages import split_compiled_pages
+from utils.rate_limiter import rate_limiter
+
+STAGES = ("selector", "writer", "translator")
+
+# Etapa de la llamada en curso; los hilos del traductor la heredan con copy_context
+_current_stage = contextvars.ContextVar("load_stage", default=None)
+
+
+def percentile(values, q):
+    # Percentil con interpolacion lineal (q entre 0 y 100)
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Recorder:
+    # Latencias por etapa (de extremo a extremo) y resultado de cada llamada al LLM, desde varios hilos
+    def __init__(self):
+        self.latencies = {stage: [] for stage in STAGES}
+        self.failures = {stage: 0 for stage in STAGES}
+        self.calls = {stage: {"total": 0, "failed": 0} for stage in STAGES}
+        self.lock = threading.Lock()
+
+    def add_latency(self, stage, seconds, failed=False):
+        with self.lock:
+            self.latencies[stage].append(seconds)
+            self.failures[stage] += int(failed)
+
+    def add_call(self, stage, failed):
+        with self.lock:
+            entry = self.calls[stage]
+            entry["total"] += 1
+            entry["failed"] += int(failed)
+
+
+def make_client(recorder):
+    # Cliente real (cuotas, reintentos, Retry-After) que ademas anota el resultado de cada llamada
+    class RecordingClient(OpenAIClient):
+        def call_openai(self, messages, **kwargs):
+            result = super().call_openai(messages, **kwargs)
+            recorder.add_call(_current_stage.get() or "writer", bool(result.get("failed")))
+            return result
+
+    return RecordingClient()
+
+
+def build_inputs():
+    # Entradas fijas: los enlaces y el contenido compilado de los datos offline
+    compiled = get_mock_compiled_content("formal")
+    urls = [url for text in compiled.values() for url, _ in split_compiled_pages(text)]
+    base_url = "https://huggingface.co"
+    links = urls + [f"{base_url}/{path}" for path in ("about", "pricing", "customers", "careers", "login", "privacy",
+                                                       "blog", "docs", "enterprise", "join", "contact", "terms")]
+    return base_url, links, compiled
+
+
+def run_pipeline(recorder, selector, generator, inputs, languages, models):
+    base_url, links, compiled = inputs
+
+    def stage(name, fn, failed):
+        token = _current_stage.set(name)
+        start = time.perf_counter()
+        try:
+            result = fn()
+        finally:
+            _current_stage.reset(token)
+        recorder.add_latency(name, time.perf_counter() - start, failed(result))
+        return result
+
+    selected = stage("selector", lambda: selector.select_relevant_links(base_url, links, model=models["selector"]),
+                     lambda result: not (result or {}).get("links"))
+    brochure = stage("writer", lambda: generator.generate_brochure("Hugging Face", compiled, tone="formal",
+                                                                    model=models["writer"], language="en"),
+                     lambda result: not result or result == OpenAIClient.failed_result(models["writer"])["response"])
+    if not brochure:
+        return bool(selected)
+    for language in languages:
+        stage("translator", lambda: generator.translate_brochure(brochure, language, models["translator"]),
+              lambda result: not result)
+    return bool(selected)
+
+
+def run_level(concurrency, runs, server_url, inputs, args):
+    recorder = Recorder()
+    selector = LinkSelector.__new__(LinkSelector)
+    selector.openai_client = make_client(recorder)
+    generator = BrochureGenerator.__new__(BrochureGenerator)
+    generator.openai_client = selector.openai_client
+    models = {"selector": args.model, "writer": args.model, "translator": args.model}
+
+    before = get_server_stats(server_url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(run_pipeline, recorder, selector, generator, inputs, args.languages, models)
+                   for _ in range(runs)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+    after = get_server_stats(server_url)
+
+    stages = {}
+    for name in STAGES:
+        latencies = recorder.latencies[name]
+        server_before = before.get(name, {})
+        server_after = after.get(name, {})
+        injected = {code: server_after.get(code, 0) - server_before.get(code, 0) for code in ("requests", "429", "500")}
+        stages[name] = {
+            "count": len(latencies),
+            "throughput": round(len(latencies) / elapsed, 3) if elapsed else 0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "failed": recorder.failures[name],
+            "calls": recorder.calls[name]["total"],
+            "calls_failed": recorder.calls[name]["failed"],
+            "http_requests": injected["requests"],
+            "http_429": injected["429"],
+            "http_500": injected["500"]
+        }
+    return {"concurrency": concurrency, "runs": runs, "seconds": round(elapsed, 3),
+            "runs_per_sec": round(runs / elapsed, 3) if elapsed else 0, "stages": stages}
+
+
+def get_server_stats(server_url):
+    return http_client.get(server_url.rsplit("/v1", 1)[0] + "/__stats").json()["stages"]
+
+
+def format_seconds(value):
+    return f"{value:.2f}" if value is not None else "-"
+
+
+def print_report(levels):
+    print(f"\n{'Conc.':>5} {'Etapa':<11} {'Ops':>5} {'Ops/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'Fallos':>7} {'HTTP':>6} {'429':>5} {'500':>5}")
+    print("-" * 82)
+    for level in levels:
+        for name, stage in level["stages"].items():
+            failed = f"{stage['failed'] / stage['count']:.0%}" if stage["count"] else "-"
+            print(f"{level['concurrency']:>5} {name:<11} {stage['count']:>5} {stage['throughput']:>7.2f} "
+                  f"{format_seconds(stage['p50']):>7} {format_seconds(stage['p95']):>7} {format_seconds(stage['p99']):>7} "
+                  f"{failed:>7} {stage['http_requests']:>6} {stage['http_429']:>5} {stage['http_500']:>5}")
+        print(f"{'':>5} {'pipeline':<11} {level['runs']:>5} {level['runs_per_sec']:>7.2f}   ({level['seconds']:.1f}s en total)")
+        print("-" * 82)
+    print("Latencias por etapa de extremo a extremo (incluyen colas por cuota y reintentos). "
+          "Fallos: etapas sin resultado util tras agotar los reintentos.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga del pipeline LLM contra un servidor OpenAI local')
+    add_server_arguments(parser)
+    parser.set_defaults(latency_ms=200, tokens_per_sec=400)
+    parser.add_argument('--concurrency', type=str, default='1,2,4,8', help='Niveles de concurrencia separados por comas')
+    parser.add_argument('--runs', type=int, default=None, help='Ejecuciones del pipeline por nivel (por defecto, 2 por hilo)')
+    parser.add_argument('--languages', type=str, default='es', help='Idiomas de traduccion separados por comas')
+    parser.add_argument('--model', type=str, default='gpt-4o-mini', help='Modelo para las tres etapas')
+    parser.add_argument('--llm_rpm', type=int, default=None, help='Peticiones por minuto permitidas por modelo')
+    parser.add_argument('--llm_tpm', type=int, default=None, help='Tokens por minuto permitidos por modelo')
+    parser.add_argument('--translation_workers', type=int, default=4, help='Secciones traducidas en paralelo')
+    parser.add_argument('--json', type=str, default=None, help='Guardar los resultados en este fichero JSON')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar el log del pipeline')
+    args = parser.parse_args()
+    args.languages = [language.strip() for language in args.languages.split(",") if language.strip()]
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    # Cualquier clave no vacia sirve contra el servidor local; sin cache para que todas las llamadas lleguen a el
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "sk-local-load-test"
+    OpenAIClient.configure_cache(enabled=False)
+    LinkSelector.configure_cache(ttl_hours=0)
+    link_ranker.configure(mode="llm")
+    rate_limiter.configure(rpm=args.llm_rpm, tpm=args.llm_tpm)
+    chunked_translator.configure(max_workers=args.translation_workers)
+
+    inputs = build_inputs()
+    results = []
+    with FakeOpenAIServer(config_from_args(args)) as server_url:
+        # La URL del servidor local manda sobre OPENAI_BASE_URL
+        OpenAIClient.base_url = server_url
+        for concurrency in levels:
+            runs = args.runs or 2 * concurrency
+            print(f"Concurrencia {concurrency}: {runs} ejecuciones...", flush=True)
+            results.append(run_level(concurrency, runs, server_url, inputs, args))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"server": config_from_args(args).to_dict(), "levels": results}, f, indent=2)
+        print(f"Resultados guardados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+# Estado por proceso trabajador: se inicializa una sola vez en init_worker
+_worker_state = {}
+
+
+def load_manifest(manifest_path):
+    # Manifiesto CSV o JSONL con columnas company, url, tone, language (id opcional)
+    if manifest_path.endswith(".jsonl"):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(manifest_path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+
+    jobs = []
+    used_ids = set()
+    for i, row in enumerate(rows, 1):
+        row = {str(k).strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+
+        if not row.get("url"):
+            raise ValueError(f"Fila {i} del manifiesto sin url")
+
+        company = row.get("company") or row["url"]
+        job_id = row.get("id") or re.sub(r"[^a-z0-9]+", "_", company.lower()).strip("_")
+        if job_id in used_ids:
+            job_id = f"{job_id}_{i}"
+        used_ids.add(job_id)
+
+        jobs.append({
+            "id": job_id,
+            "company": company,
+            "url": row["url"],
+            "tone": row.get("tone") or "formal",
+            "language": row.get("language") or "es"
+        })
+
+    return jobs
+
+
+def load_progress(progress_path):
+    done = {}
+    if os.path.exists(progress_path):
+        with open(progress_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    done[record["id"]] = record
+    return done
+
+
+def percentile(values, pct):
+    # Percentil por rango mas cercano
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def summarize(results, elapsed, stage_latency=None):
+    latencies = [r["latency"] for r in results if r["status"] == "ok"]
+    failures = [r for r in results if r["status"] != "ok"]
+
+    return {
+        "jobs": len(results),
+        "succeeded": len(latencies),
+        "failed": len(failures),
+        "elapsed_seconds": elapsed,
+        "jobs_per_minute": len(results) / elapsed * 60 if elapsed > 0 else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "total_cost": sum(r.get("cost", 0.0) for r in results),
+        "failures": [{"id": r["id"], "error": r.get("error")} for r in failures],
+        # Percentiles por etapa de todos los procesos (registro de metricas combinado)
+        "stage_latency": stage_latency or {}
+    }
+
+
+def init_worker(settings, batch_spend=None):
+    # Coste unico por proceso: imports, .env, cliente OpenAI y sesion HTTP
+    from utils.api_openai import OpenAIClient
+    from utils.cost_ledger import cost_ledger
+    from utils.http_client import http_client
+    from utils.rate_limiter import rate_limiter
+    from utils.token_budget import token_budget
+    from core import scraping
+    from core.link_ranker import link_ranker
+    from core.link_selector import LinkSelector
+
+    http_client.configure(pool_maxsize=settings["http_pool_size"])
+    scraping.Web.set_extractor(settings["extractor"])
+    OpenAIClient.configure_cache(enabled=settings.get("llm_cache"))
+    OpenAIClient.configure_endpoint(settings.get("openai_base_url"))
+    # Cada proceso tiene su propio limitador: la cuota de la API se reparte entre ellos
+    rate_limiter.configure(rpm=settings.get("llm_rpm"), tpm=settings.get("llm_tpm"), scale=1 / settings.get("workers", 1))
+    token_budget.configure(max_prompt_tokens=settings.get("max_prompt_tokens"))
+    link_ranker.configure(mode=settings.get("link_ranking"), top_k=settings.get("link_top_k"))
+    LinkSelector.configure_cache(ttl_hours=settings.get("selection_cache_hours"), min_overlap=settings.get("selection_overlap"))
+    LinkSelector.configure_output(settings.get("selection_output"))
+    # El gasto del lote se lleva en un contador compartido por todos los procesos
+    cost_ledger.configure(pricing_path=settings.get("pricing_file"), max_run_cost=settings.get("max_run_cost"),
+                          max_batch_cost=settings.get("max_batch_cost"), action=settings.get("budget_action"),
+                          batch_spend=batch_spend)
+    _worker_state["mock_mode"] = OpenAIClient().mock_mode
+
+
+def run_job(job, settings):
+    import cli
+    from utils.utils import get_outputs_path, set_outputs_subdir
+    from utils.logger import logger
+    from utils.metrics import metrics_registry, metrics_tracker
+
+    if not _worker_state:
+        init_worker(settings)
+
+    start = time.time()
+    metrics_tracker.start()
+    set_outputs_subdir(os.path.join(settings["batch_dir"], job["id"]))
+
+    try:
+        logger.info(f"[batch] Iniciando trabajo {job['id']} ({job['url']})")
+        if _worker_state["mock_mode"]:
+            consolidated_content = cli.run_mock_mode(job["tone"])
+            detected_lang = "en"
+        else:
+            consolidated_content, detected_lang = cli.run_normal_mode(
+                job["url"], settings["model_selector"],
+                compile_workers=settings["compile_workers"],
+                host_concurrency=settings["host_concurrency"],
+                delay=settings["delay"],
+                streaming=settings["streaming"]
+            )
+
+        if not consolidated_content:
+            raise RuntimeError("No se pudo obtener contenido compilado")
+
+        # Varios idiomas por trabajo: "fr,de" o "fr de"
+        target_languages = [lang for lang in re.split(r"[,;|\s]+", job["language"]) if lang]
+        cli.run_generate_brochure(job["company"], consolidated_content, job["tone"], detected_lang, target_languages,
+                                  settings["formats"], settings["model_writer"], settings["model_translator"])
+        status, error = "ok", None
+    except SystemExit as e:
+        # Las funciones del CLI terminan con sys.exit ante errores irrecuperables
+        status, error = "failed", f"SystemExit({e.code})"
+    except Exception as e:
+        status, error = "failed", f"{type(e).__name__}: {e}"
+    finally:
+        metrics_tracker.finish(report_path=get_outputs_path("costs.json"))
+        set_outputs_subdir(None)
+
+    return {
+        "id": job["id"],
+        "status": status,
+        "error": error,
+        "latency": time.time() - start,
+        "cost": metrics_tracker.total_cost,
+        "finished_at": datetime.now().isoformat(),
+        # Registro acumulado del proceso: el padre combina el ultimo de cada trabajador
+        "worker": os.getpid(),
+        "metrics": metrics_registry.snapshot()
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generacion de folletos en lote a partir de un manifiesto')
+    parser.add_argument('--manifest', type=str, required=True, help='Manifiesto CSV o JSONL (company, url, tone, language; varios idiomas separados por comas)')
+    parser.add_argument('--workers', type=int, default=max(1, min(4, os.cpu_count() or 1)), help='Procesos trabajadores')
+    parser.add_argument('--batch_name', type=str, default=None, help='Carpeta del lote dentro de outputs/ (por defecto, nombre del manifiesto)')
+    parser.add_argument('--format', type=str, nargs='+', choices=['md', 'html', 'pdf'], default=['md'], help='Formatos de salida')
+    parser.add_argument('--model_selector', type=str, default='gpt-4o-mini', help='Modelo para selección de enlaces (LLM 1)')
+    parser.add_argument('--model_writer', type=str, default='gpt-4o-mini', help='Modelo para redacción del folleto (LLM 2)')
+    parser.add_argument('--model_translator', type=str, default='gpt-4o-mini', help='Modelo para traducción (LLM 3)')
+    parser.add_argument('--compile_workers', type=int, default=4, help='Descargas simultaneas al compilar paginas')
+    parser.add_argument('--host_concurrency', type=int, default=1, help='Descargas simultaneas maximas contra un mismo host')
+    parser.add_argument('--delay', type=float, default=1.5, help='Espaciado minimo (segundos) entre peticiones a un mismo host')
+    parser.add_argument('--http_pool_size', type=int, default=8, help='Conexiones keep-alive maximas por host')
+    parser.add_argument('--extractor', type=str, choices=['bs4', 'lxml'], default='bs4', help='Motor de extraccion de texto HTML')
+    parser.add_argument('--streaming', action='store_true', help='Descargar las paginas por trozos')
+    parser.add_argument('--llm_cache', action='store_true', default=None, help='Reutilizar respuestas del LLM ya cacheadas')
+    parser.add_argument('--llm_rpm', type=int, default=None, help='Peticiones por minuto permitidas por modelo para todo el lote')
+    parser.add_argument('--llm_tpm', type=int, default=None, help='Tokens por minuto permitidos por modelo para todo el lote')
+    parser.add_argument('--link_ranking', type=str, choices=['auto', 'llm', 'heuristic'], default='auto', help='Preseleccion local de enlaces')
+    parser.add_argument('--link_top_k', type=int, default=40, help='Enlaces candidatos que se envian al LLM tras la preseleccion')
+    parser.add_argument('--selection_cache_hours', type=float, default=24, help='Horas de validez de la seleccion de enlaces cacheada por dominio (0 = desactivada)')
+    parser.add_argument('--selection_overlap', type=float, default=0.8, help='Fraccion minima de enlaces ya evaluados para reutilizar una seleccion previa')
+    parser.add_argument('--selection_output', type=str, choices=['structured', 'json'], default='structured', help='Formato de respuesta del LLM al seleccionar enlaces')
+    parser.add_argument('--openai_base_url', type=str, default=None, help='Endpoint compatible con OpenAI (por defecto, OPENAI_BASE_URL)')
+    parser.add_argument('--max_run_cost', type=float, default=None, help='Gasto maximo en el LLM por trabajo')
+    parser.add_argument('--max_batch_cost', type=float, default=None, help='Gasto maximo en el LLM de todo el lote (entre todos los procesos)')
+    parser.add_argument('--budget_action', type=str, choices=['abort', 'downgrade'], default='abort', help='Al llegar a un tope de gasto: abortar o pasar a un modelo mas barato')
+    parser.add_argument('--pricing_file', type=str, default=None, help='Tabla de precios por modelo (por defecto, config/pricing.json)')
+    parser.add_argument('--metrics_file', type=str, default=None, help='Fichero de metricas Prometheus del lote (por defecto, metrics.prom en la carpeta del lote)')
+    parser.add_argument('--metrics_port', type=int, default=None, help='Puerto del endpoint /metrics de Prometheus mientras dura el lote')
+    parser.add_argument('--max_prompt_tokens', type=int, default=12000, help='Tokens maximos de contenido web por llamada al LLM')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    from utils.utils import get_outputs_path
+    from utils.metrics import metrics_registry
+
+    batch_name = args.batch_name or os.path.splitext(os.path.basename(args.manifest))[0]
+    batch_dir = os.path.join("batch", batch_name)
+    os.makedirs(get_outputs_path(batch_dir), exist_ok=True)
+    progress_path = get_outputs_path(os.path.join(batch_dir, "progress.jsonl"))
+    metrics_path = args.metrics_file or get_outputs_path(os.path.join(batch_dir, "metrics.prom"))
+    if args.metrics_port:
+        metrics_registry.serve(args.metrics_port)
+
+    jobs = load_manifest(args.manifest)
+    done = load_progress(progress_path)
+    # Reanudar: solo se repiten los trabajos pendientes o fallidos
+    pending = [job for job in jobs if done.get(job["id"], {}).get("status") != "ok"]
+
+    print(f"Lote '{batch_name}': {len(jobs)} trabajos, {len(jobs) - len(pending)} ya completados, {len(pending)} pendientes")
+
+    settings = {
+        "batch_dir": batch_dir,
+        "formats": args.format,
+        "model_selector": args.model_selector,
+        "model_writer": args.model_writer,
+        "model_translator": args.model_translator,
+        "compile_workers": args.compile_workers,
+        "host_concurrency": args.host_concurrency,
+        "delay": args.delay,
+        "http_pool_size": args.http_pool_size,
+        "extractor": args.extractor,
+        "streaming": args.streaming,
+        "llm_cache": args.llm_cache,
+        "llm_rpm": args.llm_rpm,
+        "llm_tpm": args.llm_tpm,
+        "max_prompt_tokens": args.max_prompt_tokens,
+        "link_ranking": args.link_ranking,
+        "link_top_k": args.link_top_k,
+        "selection_cache_hours": args.selection_cache_hours,
+        "selection_overlap": args.selection_overlap,
+        "selection_output": args.selection_output,
+        "openai_base_url": args.openai_base_url,
+        "max_run_cost": args.max_run_cost,
+        "max_batch_cost": args.max_batch_cost,
+        "budget_action": args.budget_action,
+        "pricing_file": args.pricing_file,
+        "workers": args.workers
+    }
+
+    results = []
+    worker_metrics = {}
+    start = time.time()
+
+    # spawn: procesos limpios, sin heredar hilos ni conexiones SQLite del padre
+    context = multiprocessing.get_context("spawn")
+    # Al reanudar, el gasto de los trabajos ya registrados cuenta para el tope del lote
+    batch_spend = context.Value("d", sum(record.get("cost", 0.0) for record in done.values()))
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                             initializer=init_worker, initargs=(settings, batch_spend)) as executor:
+        futures = {executor.submit(run_job, job, settings): job for job in pending}
+
+        with open(progress_path, 'a', encoding='utf-8') as progress:
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"id": job["id"], "status": "failed", "error": f"{type(e).__name__}: {e}",
+                              "latency": 0.0, "finished_at": datetime.now().isoformat()}
+
+                snapshot = result.pop("metrics", None)
+                worker = result.pop("worker", None)
+                if snapshot:
+                    worker_metrics[worker] = snapshot
+                    metrics_registry.load_snapshots(worker_metrics.values())
+                    metrics_registry.write_prometheus(metrics_path)
+
+                progress.write(json.dumps(result, ensure_ascii=False) + "\n")
+                progress.flush()
+                results.append(result)
+                print(f"[{len(results)}/{len(pending)}] {result['id']}: {result['status']} ({result['latency']:.1f}s)")
+
+    summary = summarize(results, time.time() - start, metrics_registry.describe("brochure_stage_seconds", by="stage"))
+    summary_path = get_outputs_path(os.path.join(batch_dir, "summary.json"))
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    print("\n" + "=" * 60)
+    print("RESUMEN DEL LOTE")
+    print("=" * 60)
+    print(f"Trabajos: {summary['jobs']} (correctos: {summary['succeeded']}, fallidos: {summary['failed']})")
+    print(f"Rendimiento: {summary['jobs_per_minute']:.2f} trabajos/min")
+    print(f"Latencia por trabajo: p50 {summary['latency_p50']:.1f}s, p95 {summary['latency_p95']:.1f}s")
+    print(f"Coste estimado del lote: {summary['total_cost']:.6f}" + (f" (tope {args.max_batch_cost})" if args.max_batch_cost else ""))
+    for stage, stats in summary["stage_latency"].items():
+        print(f"  Etapa '{stage}': {stats['count']} veces, p50 {stats['p50']:.1f}s, p95 {stats['p95']:.1f}s")
+    for failure in summary["failures"]:
+        print(f"  - {failure['id']}: {failure['error']}")
+    print(f"Resumen guardado en: {summary_path}")
+    print(f"Metricas Prometheus en: {metrics_path}")
+    print("=" * 60)
+
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import sys
+from utils.cache_manager import cache_manager
+
+
+def format_bytes(size):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def print_stats():
+    stats = cache_manager.get_store().stats()
+    ratio = stats["raw_bytes"] / stats["bytes"] if stats["bytes"] else 0
+    lookups = stats["hits"] + stats["revalidated"] + stats["misses"]
+    
+    print("=" * 60)
+    print("CACHE DE PAGINAS")
+    print("=" * 60)
+    print(f"Entradas: {stats['entries']}")
+    print(f"Tamano comprimido: {format_bytes(stats['bytes'])} / {format_bytes(stats['max_bytes'])}")
+    print(f"Tamano original: {format_bytes(stats['raw_bytes'])} (compresion x{ratio:.1f})")
+    print(f"Consultas: {lookups} (aciertos: {stats['hits']}, revalidadas 304: {stats['revalidated']}, fallos: {stats['misses']})")
+    print(f"Tasa de acierto: {stats['hit_rate'] * 100:.1f}%")
+    print(f"Contenido extraido: {stats['parsed_entries']} entradas, {format_bytes(stats['parsed_bytes'])} "
+          f"(aciertos: {stats['parsed_hits']}, fallos: {stats['parsed_misses']})")
+    print(f"Respuestas del LLM: {stats['response_entries']} entradas, {format_bytes(stats['response_bytes'])} "
+          f"(aciertos: {stats['response_hits']}, fallos: {stats['response_misses']}, "
+          f"tokens ahorrados: {stats['response_tokens_saved']})")
+    print(f"Selecciones de enlaces: {stats['selection_entries']} dominios "
+          f"(aciertos: {stats['selection_hits']}, parciales: {stats['selection_partial']}, fallos: {stats['selection_misses']})")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gestion de la cache de paginas')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('stats', help='Muestra tamano y tasa de acierto')
+    subparsers.add_parser('purge', help='Aplica el TTL y el presupuesto de bytes')
+    subparsers.add_parser('clear', help='Vacia la cache')
+    migrate = subparsers.add_parser('migrate', help='Importa los archivos .html del formato anterior')
+    migrate.add_argument('--keep', action='store_true', help='No borrar los archivos importados')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'purge':
+        removed = cache_manager.get_store().evict()
+        print(f"Entradas expulsadas: {removed}")
+    elif args.command == 'clear':
+        cache_manager.get_store().clear()
+        print("Cache vaciada")
+    elif args.command == 'migrate':
+        migrated = cache_manager.migrate_legacy_files(remove=not args.keep)
+        print(f"Entradas migradas: {migrated}")
+    elif args.command == 'stats':
+        print_stats()
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,16 +1,25 @@
+import contextvars
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from core import scraping, link_selector, compiler, brochure
+from core.link_ranker import link_ranker
+from core.translation import chunked_translator
 from utils.utils import *
 from utils.args_manager import args_manager
 from utils.cache_manager import cache_manager
-from utils.api_openai import OpenAIClient
+from utils.api_openai import OpenAIClient, StreamInterruptedError
+from utils.cost_ledger import cost_ledger, BudgetExceededError
 from utils.mock_responses import get_mock_compiled_content
 from utils.logger import logger
 from utils.language_detector import *
 from utils.exporters import markdown_to_html, markdown_to_pdf
+from utils.http_client import http_client
+from utils.browser_pool import browser_pool
 from utils.metrics import metrics_tracker
+from utils.rate_limiter import rate_limiter
+from utils.token_budget import token_budget
 
 def download_html(test_url):
     logger.info("- PASO 1: Descargando página web...")
@@ -24,26 +33,30 @@ def download_html(test_url):
         # response = input("Usar cache para esta sesion? (s/n): ").lower().strip()
         # use_cache_decision = (response == 's')
         use_cache_decision = True
+    elif cache_manager.has_validators(test_url):
+        # Cache caducada pero revalidable con una peticion condicional
+        logger.info(f"\nCache caducada (edad: {cache_manager.get_cache_age(test_url)}), se revalidara con el servidor")
+        use_cache_decision = True
     else:
         use_cache_decision = False
 
     web_content = scraping.Web.get_data_with_cache(test_url, use_cache=use_cache_decision)
     return web_content, use_cache_decision
 
-def extract_and_clean_links(web_content):
+def extract_and_clean_links(web_content, use_cache=False):
     logger.info("\n- PASO 2: Extrayendo enlaces y limpiando contenido...")
-    [web_title, web_text, web_links] = scraping.Web.clean_text(web_content)   
+    [web_title, web_text, web_links] = scraping.Web.clean_text(web_content, use_cache=use_cache)   
     
     detected_lang = detect_language(web_text)
     lang_name = get_language_name(detected_lang)
     logger.info(f"Idioma de la web: {lang_name}")    
     return web_links, detected_lang
 
-def get_relevant_links(test_url, web_links, model_selector):
+def get_relevant_links(test_url, web_links, model_selector, anchors=None):
     logger.info(f"\n- PASO 3: Seleccionando enlaces relevantes con IA ({model_selector})...")
     selector = link_selector.LinkSelector()
     # Pasamos el modelo dinámico
-    selected_links = selector.select_relevant_links(test_url, web_links, model=model_selector)    
+    selected_links = selector.select_relevant_links(test_url, web_links, model=model_selector, anchors=anchors)    
     
     if not selected_links or not selected_links.get("links"):
         logger.error("\nNo se encontraron enlaces relevantes")
@@ -54,7 +67,7 @@ def get_relevant_links(test_url, web_links, model_selector):
     return selected_links
     
 
-def run_normal_mode(test_url, model_selector):    
+def run_normal_mode(test_url, model_selector, compile_workers=4, host_concurrency=1, delay=1.5, streaming=False):    
     #########################################################################
     #                         PASO 1 - DESCARGAR HTML                       #
     #########################################################################
@@ -65,14 +78,14 @@ def run_normal_mode(test_url, model_selector):
     #                        PASO 2 - LIMPIAR Y EXTRAER                     #
     #########################################################################
     start = time.time()
-    web_links, detected_lang = extract_and_clean_links(web_content)
+    web_links, detected_lang = extract_and_clean_links(web_content, use_cache=use_cache_decision)
     metrics_tracker.record_stage("Limpiar y extraer links", time.time() - start)
     #########################################################################
     #                   PASO 3 - SELECCIONAR ENLACES CON IA                 #
     #########################################################################
     start = time.time()
     # Usamos el modelo selector
-    selected_links = get_relevant_links(test_url, web_links, model_selector)
+    selected_links = get_relevant_links(test_url, web_links, model_selector, scraping.Web.extract_anchors(web_content))
     metrics_tracker.record_stage("Seleccion de enlaces con IA", time.time() - start)
 
     #########################################################################
@@ -80,7 +93,9 @@ def run_normal_mode(test_url, model_selector):
     #########################################################################
     start = time.time()
     logger.info(f"\nPASO 4: Compilando contenido de paginas seleccionadas...")
-    consolidated_content = compiler.compile_links(selected_links, delay=1.5, use_cache=use_cache_decision)    
+    consolidated_content = compiler.compile_links(selected_links, delay=delay, use_cache=use_cache_decision,
+                                                  max_workers=compile_workers, per_host_concurrency=host_concurrency,
+                                                  streaming=streaming)    
     save_json_with_timestamp(consolidated_content, "compiled_content")    
     metrics_tracker.record_stage("Extraer y compilar contenido", time.time() - start)
     
@@ -102,13 +117,30 @@ def run_mock_mode(tone):
     
     return consolidated_content
 
-def write_brochure(brochure_content, formats, suffix=""):
+def print_stream(chunks):
+    # Muestra el folleto en consola segun se genera y devuelve el texto completo (None si el flujo se corto)
+    parts = []
+    try:
+        for chunk in chunks:
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+            parts.append(chunk)
+    except StreamInterruptedError as e:
+        sys.stdout.write("\n")
+        logger.error(f"Folleto descartado por respuesta incompleta: {e}")
+        return None
+    sys.stdout.write("\n")
+    return "".join(parts) or None
+
+def write_brochure(brochure_content, formats, suffix="", timestamp=None, md_saved=False):
     start = time.time()
     if brochure_content:
         filename = f"brochure{suffix}"
-        save_md_with_timestamp(brochure_content, filename)
+        # En streaming el .md ya se ha escrito segun llegaba el texto
+        if not md_saved:
+            save_md_with_timestamp(brochure_content, filename)
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
         
         if 'html' in formats:            
             markdown_to_html(brochure_content, f"{timestamp}_{filename}.html")
@@ -119,35 +151,73 @@ def write_brochure(brochure_content, formats, suffix=""):
         logger.error(f"Error al generar el folleto {suffix}")
     metrics_tracker.record_stage(f"Exportar folleto {suffix}", time.time() - start)
 
-def run_generate_brochure(company_name, consolidated_content, tone, detected_lang, target_language, formats, model_writer, model_translator):    
+def run_translations(brochure_content, target_languages, formats, model_translator):
+    # Un hilo por idioma; cada traducción se exporta en el hilo principal en cuanto termina.
+    # Los hilos heredan el contexto para imputar tokens y presupuesto a esta ejecución
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=len(target_languages)) as executor:
+        futures = {
+            executor.submit(contextvars.copy_context().run, brochure.translate_brochure,
+                            brochure_content, target_language, model_translator): target_language
+            for target_language in target_languages
+        }
+        for future in as_completed(futures):
+            target_language = futures[future]
+            write_brochure(future.result(), formats, suffix=f"_{target_language}")
+    metrics_tracker.record_stage(f"Traducciones ({len(target_languages)} idiomas)", time.time() - start)
+
+def run_generate_brochure(company_name, consolidated_content, tone, detected_lang, target_languages, formats, model_writer, model_translator, stream=False):    
     #########################################################################
     #                 PASO 5 - GENERAR FOLLETO CORPORATIVO                  #
     #########################################################################
     logger.info(f"\nPASO 5: Generando folleto corporativo (Origen: {detected_lang}) con {model_writer}...")
-    brochure_content = brochure.generate_brochure(
-        company_name=company_name,
-        compiled_content=consolidated_content,
-        tone=tone,
-        model=model_writer, # Modelo dinámico
-        language=detected_lang # Generamos en el idioma fuente primero
-    )
-    
-    # Guardar original
-    write_brochure(brochure_content, formats, suffix="_original")
+    if stream:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        brochure_content = print_stream(brochure.stream_brochure(
+            company_name=company_name,
+            compiled_content=consolidated_content,
+            tone=tone,
+            model=model_writer,
+            language=detected_lang,
+            output_path=get_outputs_path(f"{timestamp}_brochure_original.md")
+        ))
+        write_brochure(brochure_content, formats, suffix="_original", timestamp=timestamp, md_saved=True)
+    else:
+        brochure_content = brochure.generate_brochure(
+            company_name=company_name,
+            compiled_content=consolidated_content,
+            tone=tone,
+            model=model_writer, # Modelo dinámico
+            language=detected_lang # Generamos en el idioma fuente primero
+        )
+        
+        # Guardar original
+        write_brochure(brochure_content, formats, suffix="_original")
 
     #########################################################################
     #                 PASO 6 - TRADUCCIÓN AUTOMÁTICA                        #
     #########################################################################
-    # Si el idioma destino es diferente al origen, traducimos
-    if brochure_content and target_language != detected_lang:
-        logger.info(f"\nPASO 6: Traduciendo folleto a {target_language} con {model_translator}...")
-        translated_content = brochure.translate_brochure(
-            brochure_text=brochure_content,
-            target_language=target_language,
-            model=model_translator # Modelo dinámico
-        )
-        # Guardar traducido
-        write_brochure(translated_content, formats, suffix=f"_{target_language}")
+    # Se traduce a cada idioma destino distinto del de origen
+    if isinstance(target_languages, str):
+        target_languages = [target_languages]
+    pending_languages = [lang for lang in dict.fromkeys(target_languages) if lang != detected_lang]
+    
+    if brochure_content and pending_languages:
+        logger.info(f"\nPASO 6: Traduciendo folleto a {', '.join(pending_languages)} con {model_translator}...")
+        if stream and len(pending_languages) == 1:
+            target_language = pending_languages[0]
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            translated_content = print_stream(brochure.stream_translation(
+                brochure_text=brochure_content,
+                target_language=target_language,
+                model=model_translator,
+                output_path=get_outputs_path(f"{timestamp}_brochure_{target_language}.md")
+            ))
+            write_brochure(translated_content, formats, suffix=f"_{target_language}", timestamp=timestamp, md_saved=True)
+        else:
+            if stream:
+                logger.info("Varias traducciones en paralelo: se muestran al terminar, sin streaming")
+            run_translations(brochure_content, pending_languages, formats, model_translator)
     else:
         logger.info(f"\nPASO 6: Omitiendo traducción debido a que el idioma de la web es el mismo que el lenguaje introducido")
     
@@ -155,6 +225,7 @@ def run_generate_brochure(company_name, consolidated_content, tone, detected_lan
 def main():
     metrics_tracker.start()
     args_manager.parse_args()
+    OpenAIClient.configure_endpoint(args_manager.get('openai_base_url'))
     openai_client = OpenAIClient()
     
     company_name = args_manager.get('company')
@@ -162,16 +233,51 @@ def main():
     test_url = args_manager.get('url')
     tone = args_manager.get('tone')
     formats = args_manager.get('format')
-    target_language = args_manager.get('language')
+    target_languages = args_manager.get('language')
     
     # Modelos (TAREA 9)
     model_selector = args_manager.get('model_selector')
     model_writer = args_manager.get('model_writer')
     model_translator = args_manager.get('model_translator')
     
-    if not target_language:
-        target_language = "es"  # Idioma por defecto
-        logger.info(f"Nota: No se especificó idioma destino (--language). Usando '{target_language}' por defecto.")
+    # Compilacion concurrente
+    compile_workers = args_manager.get('compile_workers')
+    host_concurrency = args_manager.get('host_concurrency')
+    delay = args_manager.get('delay')
+    streaming = args_manager.get('streaming')
+    
+    http_client.configure(
+        pool_maxsize=args_manager.get('http_pool_size'),
+        read_timeout=args_manager.get('http_timeout')
+    )
+    scraping.Web.set_extractor(args_manager.get('extractor'))
+    browser_pool.configure(
+        max_pages=args_manager.get('browser_pages'),
+        max_navigations=args_manager.get('browser_recycle')
+    )
+    OpenAIClient.configure_cache(
+        enabled=args_manager.get('llm_cache'),
+        max_temperature=args_manager.get('llm_cache_max_temp')
+    )
+    rate_limiter.configure(rpm=args_manager.get('llm_rpm'), tpm=args_manager.get('llm_tpm'))
+    chunked_translator.configure(max_workers=args_manager.get('translation_workers'))
+    link_ranker.configure(mode=args_manager.get('link_ranking'), top_k=args_manager.get('link_top_k'))
+    link_selector.LinkSelector.configure_cache(
+        ttl_hours=args_manager.get('selection_cache_hours'),
+        min_overlap=args_manager.get('selection_overlap')
+    )
+    link_selector.LinkSelector.configure_output(args_manager.get('selection_output'))
+    token_budget.configure(max_prompt_tokens=args_manager.get('max_prompt_tokens'))
+    metrics_tracker.configure_export(path=args_manager.get('metrics_file'), port=args_manager.get('metrics_port'))
+    cost_ledger.configure(
+        pricing_path=args_manager.get('pricing_file'),
+        max_run_cost=args_manager.get('max_run_cost'),
+        action=args_manager.get('budget_action')
+    )
+    
+    if not target_languages:
+        target_languages = ["es"]  # Idioma por defecto
+        logger.info(f"Nota: No se especificó idioma destino (--language). Usando '{target_languages[0]}' por defecto.")
         
     if not test_url:
         test_url = "https://huggingface.co"
@@ -183,26 +289,35 @@ def main():
     logger.info(f"\nEmpresa: {company_name}")
     logger.info(f"URL a analizar: {test_url}")
     logger.info(f"Tono: {tone}")
-    logger.info(f"Idioma destino: {target_language}")
+    logger.info(f"Idiomas destino: {', '.join(target_languages)}")
     logger.info(f"Modelos: Sel={model_selector}, Wri={model_writer}, Tra={model_translator}\n")
     
-    if openai_client.mock_mode:
-        consolidated_content = run_mock_mode(tone)
-        detected_lang = "en" # Asumimos inglés para el mock
-    else:
-        # Pasamos model_selector
-        consolidated_content, detected_lang = run_normal_mode(test_url, model_selector)       
+    cost_report = get_outputs_path(f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_costs.json")
+    try:
+        if openai_client.mock_mode:
+            consolidated_content = run_mock_mode(tone)
+            detected_lang = "en" # Asumimos inglés para el mock
+        else:
+            # Pasamos model_selector
+            consolidated_content, detected_lang = run_normal_mode(test_url, model_selector, compile_workers, host_concurrency, delay, streaming)       
+            
+        if not consolidated_content:
+            logger.error("No se pudo obtener contenido compilado")
+            sys.exit(1)
         
-    if not consolidated_content:
-        logger.error("No se pudo obtener contenido compilado")
+        # Llamamos al flujo con los modelos writer y translator
+        run_generate_brochure(company_name, consolidated_content, tone, detected_lang, target_languages, formats, model_writer, model_translator,
+                              stream=args_manager.get('stream'))       
+    except BudgetExceededError as e:
+        logger.error(f"Proceso abortado por presupuesto: {e}")
+        metrics_tracker.finish(report_path=cost_report)
+        metrics_tracker.print_summary()
         sys.exit(1)
     
-    # Llamamos al flujo con los modelos writer y translator
-    run_generate_brochure(company_name, consolidated_content, tone, detected_lang, target_language, formats, model_writer, model_translator)       
-    
     logger.info("\n" + "=" * 60)
     logger.info("Proceso completado")
     logger.info("=" * 60)
+    metrics_tracker.finish(report_path=cost_report)
     metrics_tracker.print_summary()
         
 
@@ -1,11 +1,14 @@
+import os
 import re
 import time
 from datetime import datetime
+from core.translation import chunked_translator
 from utils.api_openai import OpenAIClient
-from utils.utils import get_prompts_path
 from utils.language_detector import get_language_name
 from utils.logger import logger
 from utils.metrics import metrics_tracker
+from utils.prompt_registry import prompt_registry
+from utils.token_budget import token_budget
 
 # Constante de secciones fijas requerida por la Tarea 8
 SECTIONS = [
@@ -18,42 +21,91 @@ SECTIONS = [
     "Contacto"
 ]
 
-class BrochureGenerator:
+class MarkdownFenceStripper:
+    """
+    Elimina de forma incremental el bloque ```markdown ... ``` con el que el modelo
+    envuelve a veces la respuesta. feed() devuelve el texto ya seguro de mostrar y
+    retiene las ultimas lineas mientras aun puedan ser la valla de cierre; finish()
+    entrega el resto.
+    """
     
     def __init__(self):
-        self.openai_client = OpenAIClient()
+        self.started = False
+        self.fenced = False
+        self.head = ""
+        self.pending = ""
+    
+    def is_tail_line(self, line):
+        return not line.strip() or (self.fenced and line.strip() == "```")
+    
+    def feed(self, chunk):
+        if not self.started:
+            # Decidir si hay valla de apertura antes de emitir nada
+            self.head += chunk
+            stripped = self.head.lstrip()
+            if not stripped or "```".startswith(stripped):
+                return ""
+            if stripped.startswith("```"):
+                if "\n" not in stripped:
+                    return ""
+                self.fenced = True
+                chunk = stripped.split("\n", 1)[1]
+            else:
+                chunk = stripped
+            self.started = True
+            self.head = ""
+        
+        lines = (self.pending + chunk).split("\n")
+        # La ultima linea puede estar incompleta: se retiene junto a las finales en blanco o de valla
+        cut = len(lines) - 1
+        while cut > 0 and self.is_tail_line(lines[cut - 1]):
+            cut -= 1
+        
+        if cut == 0:
+            self.pending = "\n".join(lines)
+            return ""
+        
+        self.pending = "\n" + "\n".join(lines[cut:])
+        return "\n".join(lines[:cut])
+    
+    @staticmethod
+    def strip(text):
+        stripper = MarkdownFenceStripper()
+        return stripper.feed(text) + stripper.finish()
+    
+    def finish(self):
+        if not self.started:
+            text = self.head.strip()
+            return "" if text.startswith("```") else text
+        
+        lines = self.pending.split("\n")
+        while lines and self.is_tail_line(lines[-1]):
+            lines.pop()
+        self.pending = ""
+        return "\n".join(lines).rstrip()
+
+
+class BrochureGenerator:
+    
+    def __init__(self, response_cache=None):
+        # response_cache: cache de respuestas del LLM para esta generacion; None = la configurada en OpenAIClient
+        self.openai_client = OpenAIClient(response_cache=response_cache)
     
     @staticmethod
     def load_prompt(prompt_filename):
-        try:
-            prompt_path = get_prompts_path(prompt_filename)
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            logger.error(f"Error: No se encontro el archivo {prompt_filename}")
-            return None
-        except Exception as e:
-            logger.error(f"Error al leer el prompt: {e}")
-            return None
+        return prompt_registry.get_text(prompt_filename)
       
-    def generate_brochure_normal(self, company_name, compiled_content, tone, model, max_tokens, language="en"):
-        base_prompt = self.load_prompt("brochure_system.md")
-        tone_prompt = self.load_prompt(f"tone_{tone}.md")
-        
+    def build_brochure_messages(self, company_name, compiled_content, tone, language="en", model="gpt-4o-mini", max_tokens=4000):
         if not compiled_content:
             logger.error("Contenido compilado vacio")
             return None
         
-        if not base_prompt or not tone_prompt:
+        # System estable por tono (mismos bytes en cada llamada); lo variable va en el mensaje de usuario
+        prefix, _ = prompt_registry.get_prefix(["brochure_system.md", f"tone_{tone}.md"])
+        if not prefix:
             logger.error("No hay prompt para hacer el folleto")
             return None
         
-        system_prompt = base_prompt + "\n\n" + tone_prompt
-        
-        content_summary = ""
-        for page_type, content in compiled_content.items():
-            content_summary += f"\n\n## [{page_type.upper()}]\n{content[:8000]}\n"
-        
         current_date = datetime.now().strftime("%Y-%m-%d")
         
         lang_name = get_language_name(language)
@@ -61,7 +113,8 @@ class BrochureGenerator:
         # Generar lista de secciones para el prompt
         sections_list = chr(10).join(f"- {s}" for s in SECTIONS)
         
-        user_message = f"""Empresa: {company_name}
+        def build_messages(content_summary):
+            user_message = f"""Empresa: {company_name}
         
         IMPORTANTE: Genera el folleto en {lang_name}.
 
@@ -74,21 +127,36 @@ class BrochureGenerator:
         Fecha actual: {current_date}
 
         Genera el folleto corporativo en Markdown."""
+            
+            return prefix + [{"role": "user", "content": user_message}]
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ]
+        # El contenido se reparte entre tipos de pagina segun el espacio que deja la plantilla
+        budget = token_budget.input_budget(model, max_tokens, build_messages(""))
+        packed, _ = token_budget.pack(compiled_content, budget, model)
+        
+        content_summary = ""
+        for page_type, content in packed.items():
+            content_summary += f"\n\n## [{page_type.upper()}]\n{content}\n"
+        
+        messages = build_messages(content_summary)
+        token_budget.report(messages, model, max_tokens)
+        return messages
+    
+    def generate_brochure_normal(self, company_name, compiled_content, tone, model, max_tokens, language="en"):
+        messages = self.build_brochure_messages(company_name, compiled_content, tone, language, model, max_tokens)
+        if not messages:
+            return None
         
         logger.info(f"\nGenerando folleto con {model}...")
         logger.info(f"Tono: {tone}")
         
-        result = self.openai_client.call_openai(
-            messages=messages,
-            model=model,
-            max_tokens=max_tokens,
-            temperature=0.7
-        )
+        with metrics_tracker.llm_stage("Generar folleto con IA"):
+            result = self.openai_client.call_openai(
+                messages=messages,
+                model=model,
+                max_tokens=max_tokens,
+                temperature=0.7
+            )
         
         brochure_text = result["response"].strip()
         
@@ -118,11 +186,7 @@ class BrochureGenerator:
         
         return text
 
-    def translate_brochure(self, brochure_text, target_language="es", model="gpt-4o-mini"):
-        if self.openai_client.mock_mode:
-            logger.info("MODO MOCK: Saltando traducción real")
-            return f"{brochure_text}\n\n[TRADUCCION SIMULADA A {target_language.upper()}]"
-        
+    def build_translation_messages(self, brochure_text, target_language):
         system_prompt = self.load_prompt("translator_system.md")
         # Fallback simple si no existe el archivo
         if not system_prompt:
@@ -130,37 +194,134 @@ class BrochureGenerator:
 
         lang_name = get_language_name(target_language)
         
-        user_message = f"""Traduce el siguiente folleto Markdown al idioma: {lang_name}.
+        user_message = f"""Traduce el siguiente folleto Markdown (o una de sus secciones) al idioma: {lang_name}.
         Recuerda preservar estrictamente el formato.
         
         FOLLETO ORIGINAL:
         {brochure_text}"""
         
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_message}
         ]
+    
+    def translate_brochure(self, brochure_text, target_language="es", model="gpt-4o-mini"):
+        if self.openai_client.mock_mode:
+            logger.info("MODO MOCK: Saltando traducción real")
+            return self.mock_translation(brochure_text, target_language)
         
-        logger.info(f"\nTraduciendo folleto a {lang_name} con {model}...")
+        logger.info(f"\nTraduciendo folleto a {get_language_name(target_language)} con {model}...")
         
+        # Secciones en paralelo: la latencia pasa a ser la de la seccion mas larga
         start = time.time()
+        with metrics_tracker.llm_stage(f"Traduccion ({target_language})"):
+            translated_text = chunked_translator.translate(
+                brochure_text, lambda section: self.translate_chunk(section, target_language, model)
+            )
+        metrics_tracker.record_stage(f"Traduccion ({target_language})", time.time() - start)
+        
+        logger.info(f"Traducción completada")
+        return translated_text
+    
+    def translate_chunk(self, section_text, target_language, model):
+        messages = self.build_translation_messages(section_text, target_language)
+        
         result = self.openai_client.call_openai(
             messages=messages,
             model=model,
-            max_tokens=4000,
+            # La traduccion ocupa como mucho ~2 tokens por cada 4 caracteres del original
+            max_tokens=min(4000, 500 + len(section_text) // 2),
             temperature=0.3 # Temperatura baja para ser fiel al original
         )
-        metrics_tracker.record_stage(f"Traduccion ({target_language})", time.time() - start)
         
-        translated_text = result["response"].strip()
+        if result.get("failed"):
+            return None
+        return MarkdownFenceStripper.strip(result["response"])
+    
+    @staticmethod
+    def mock_translation(brochure_text, target_language):
+        return f"{brochure_text}\n\n[TRADUCCION SIMULADA A {target_language.upper()}]"
+    
+    @staticmethod
+    def write_output(output_path, text):
+        if output_path and text:
+            with open(output_path, 'w', encoding='utf-8', errors='replace') as f:
+                f.write(text)
+            logger.info(f"\nFolleto guardado en: {output_path}")
+    
+    def stream_markdown(self, messages, model, max_tokens, temperature, stage_name, output_path=None):
+        # Fragmentos de Markdown sin vallas de codigo
+        def stripped_chunks():
+            stripper = MarkdownFenceStripper()
+            for chunk in self.openai_client.stream_openai(messages, model=model, max_tokens=max_tokens, temperature=temperature):
+                text = stripper.feed(chunk)
+                if text:
+                    yield text
+            text = stripper.finish()
+            if text:
+                yield text
         
-        if translated_text.startswith("```markdown"):
-            translated_text = translated_text.replace("```markdown", "").replace("```", "").strip()
-        elif translated_text.startswith("```"):
-            translated_text = translated_text.replace("```", "").strip()
-            
-        logger.info(f"Traducción completada. Tokens usados: {result['tokens']['total']}")
-        return translated_text
+        yield from self.record_stream(stripped_chunks(), stage_name, output_path)
+    
+    def record_stream(self, chunks, stage_name, output_path=None):
+        # Reenvia los fragmentos, los escribe a disco segun llegan y mide el primero y el total
+        output_file = open(output_path, 'w', encoding='utf-8', errors='replace') if output_path else None
+        start = time.time()
+        first_token = None
+        completed = False
+        
+        try:
+            for text in chunks:
+                if first_token is None:
+                    first_token = time.time() - start
+                if output_file:
+                    output_file.write(text)
+                    output_file.flush()
+                yield text
+            completed = True
+        finally:
+            if output_file:
+                output_file.close()
+                if completed:
+                    logger.info(f"\nFolleto guardado en: {output_path}")
+                else:
+                    # Un flujo cortado no se deja con el nombre de un folleto completo
+                    root, extension = os.path.splitext(output_path)
+                    os.replace(output_path, f"{root}.incomplete{extension}")
+                    logger.warning(f"\nFolleto incompleto guardado en: {root}.incomplete{extension}")
+            metrics_tracker.record_streaming(stage_name, first_token, time.time() - start)
+    
+    def stream_brochure(self, company_name, compiled_content, tone="formal", model="gpt-4o-mini", max_tokens=4000, language="en", output_path=None):
+        if self.openai_client.mock_mode:
+            text = self.generate_brochure(company_name, compiled_content, tone, model, max_tokens, language)
+            self.write_output(output_path, text)
+            yield text
+            return
+        
+        messages = self.build_brochure_messages(company_name, compiled_content, tone, language, model, max_tokens)
+        if not messages:
+            return
+        
+        logger.info(f"\nGenerando folleto en streaming con {model}...")
+        with metrics_tracker.llm_stage("Generar folleto con IA"):
+            yield from self.stream_markdown(messages, model, max_tokens, 0.7, "Generar folleto con IA", output_path)
+    
+    def stream_translation(self, brochure_text, target_language="es", model="gpt-4o-mini", output_path=None):
+        if self.openai_client.mock_mode:
+            text = self.mock_translation(brochure_text, target_language)
+            self.write_output(output_path, text)
+            yield text
+            return
+        
+        logger.info(f"\nTraduciendo folleto en streaming a {get_language_name(target_language)} con {model}...")
+        
+        # Cada seccion se entrega en orden en cuanto esta traducida
+        sections = chunked_translator.iter_translate(
+            brochure_text, lambda section: self.translate_chunk(section, target_language, model)
+        )
+        chunks = (("\n\n" if index else "") + section for index, section in enumerate(sections))
+        with metrics_tracker.llm_stage(f"Traduccion ({target_language})"):
+            yield from self.record_stream(chunks, f"Traduccion ({target_language})", output_path)
 
     def extract_formal_info_from_compiled(self, compiled_content):
         # Estructura base por si faltan datos
@@ -352,10 +513,19 @@ Content generated offline for testing.
 """
         return texto
 
-def generate_brochure(company_name, compiled_content, tone="formal", model="gpt-4o-mini", language = 'en'):
-    generator = BrochureGenerator()
+def generate_brochure(company_name, compiled_content, tone="formal", model="gpt-4o-mini", language = 'en', response_cache=None):
+    generator = BrochureGenerator(response_cache=response_cache)
     return generator.generate_brochure(company_name, compiled_content, tone=tone, model=model, language=language)
 
-def translate_brochure(brochure_text, target_language="es", model="gpt-4o-mini"):
-    generator = BrochureGenerator()
-    return generator.translate_brochure(brochure_text, target_language, model)
\ No newline at end of file
+def translate_brochure(brochure_text, target_language="es", model="gpt-4o-mini", response_cache=None):
+    generator = BrochureGenerator(response_cache=response_cache)
+    return generator.translate_brochure(brochure_text, target_language, model)
+
+def stream_brochure(company_name, compiled_content, tone="formal", model="gpt-4o-mini", language="en", output_path=None,
+                    response_cache=None):
+    generator = BrochureGenerator(response_cache=response_cache)
+    return generator.stream_brochure(company_name, compiled_content, tone=tone, model=model, language=language, output_path=output_path)
+
+def stream_translation(brochure_text, target_language="es", model="gpt-4o-mini", output_path=None, response_cache=None):
+    generator = BrochureGenerator(response_cache=response_cache)
+    return generator.stream_translation(brochure_text, target_language, model, output_path=output_path)
\ No newline at end of file
@@ -1,12 +1,50 @@
-import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from core import scraping
+from core.dedup import deduplicator
+from utils.host_scheduler import HostScheduler
 from utils.logger import logger
 from utils.validators import validate_compiled_content
 
 class Compiler:
     
     @staticmethod
-    def compile_pages(selected_links, delay=1.5, use_cache=False):
+    def fetch_page(link_info, use_cache=False, label="", streaming=False, extractor=None):
+        url = link_info.get("url")
+        page_type = link_info.get("type", "unknown")
+        
+        logger.info(f"{label} Descargando {page_type}: {url}")
+        
+        if streaming:
+            parsed = scraping.Web.get_page_text(url, use_cache=use_cache, streaming=True, extractor=extractor)
+        else:
+            html = scraping.Web.get_data_with_cache(url, use_cache=use_cache)
+            parsed = scraping.Web.clean_text(html, use_cache=use_cache, extractor=extractor) if html else None
+        
+        if not parsed:
+            logger.info(f"   Error: No se pudo descargar {url}")
+            return None
+        
+        [title, cleaned_text, links] = parsed
+        
+        if len(cleaned_text) < 100:
+            logger.info(f"   Contenido insuficiente en {url}, intentando con navegador dinamico...")
+            html = scraping.Web.get_data_dynamic(url)
+            if html:
+                [title, cleaned_text, links] = scraping.Web.clean_text(html, use_cache=use_cache, extractor=extractor)
+                logger.info(f"   Contenido obtenido con navegador: {url}")
+        
+        logger.info(f"   Extraidos {len(cleaned_text)} caracteres de {url}")
+        
+        return {
+            "url": url,
+            "title": title,
+            "content": cleaned_text
+        }
+    
+    @staticmethod
+    def compile_pages(selected_links, delay=1.5, use_cache=False, max_workers=4, per_host_concurrency=1, streaming=False,
+                      extractor=None):
         compiled_data = {}
         
         if not selected_links or "links" not in selected_links:
@@ -16,6 +54,8 @@ class Compiler:
         total_links = len(selected_links["links"])
         logger.info(f"\nCompilando {total_links} paginas...")
         
+        # Los enlaces con score bajo se descartan sin esperar: no generan trafico
+        jobs = []
         for i, link_info in enumerate(selected_links["links"], 1):
             url = link_info.get("url")
             page_type = link_info.get("type", "unknown")
@@ -23,48 +63,49 @@ class Compiler:
             
             if score < 60:
                 logger.warning(f"[{i}/{total_links}] Saltando enlace '{url}' ({page_type}) por score bajo: {score} < 60")
-                if i < total_links:
-                    # Mantener el delay aunque se salte para no saturar el servidor
-                    time.sleep(delay)
                 continue
             
-            logger.info(f"[{i}/{total_links}] Descargando {page_type}: {url}")
-            
-            html = scraping.Web.get_data_with_cache(url, use_cache=use_cache)
+            jobs.append((i, link_info))
+        
+        # El delay pasa a ser el espaciado minimo entre peticiones a un mismo host
+        scheduler = HostScheduler(per_host_concurrency=per_host_concurrency, min_interval=delay)
+        
+        def run_job(job):
+            i, link_info = job
+            with scheduler.slot(link_info.get("url", "")):
+                return Compiler.fetch_page(link_info, use_cache=use_cache, label=f"[{i}/{total_links}]", streaming=streaming,
+                                           extractor=extractor)
+        
+        if max_workers <= 1 or len(jobs) <= 1:
+            pages = [run_job(job) for job in jobs]
+        else:
+            # Cada descarga hereda el contexto del pipeline: sus metricas van a esta ejecucion
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+                futures = [executor.submit(contextvars.copy_context().run, run_job, job) for job in jobs]
+                pages = [future.result() for future in futures]
+        
+        # Reconstruir el resultado en el orden original de los enlaces
+        for (i, link_info), page in zip(jobs, pages):
+            if not page:
+                continue
             
-            if html:
-                [title, cleaned_text, links] = scraping.Web.clean_text(html)
-                
-                if len(cleaned_text) < 100:
-                    logger.info(f"   Contenido insuficiente, intentando con navegador dinamico...")
-                    html = scraping.Web.get_data_dynamic(url)
-                    if html:
-                        [title, cleaned_text, links] = scraping.Web.clean_text(html)
-                        logger.info(f"   Contenido obtenido con navegador")
-                
-                if page_type not in compiled_data:
-                    compiled_data[page_type] = []
-                
-                compiled_data[page_type].append({
-                    "url": url,
-                    "title": title,
-                    "content": cleaned_text
-                })
-                
-                logger.info(f"   Extraidos {len(cleaned_text)} caracteres")
-            else:
-                logger.info(f"   Error: No se pudo descargar")
+            page_type = link_info.get("type", "unknown")
+            if page_type not in compiled_data:
+                compiled_data[page_type] = []
             
-            if i < total_links:
-                time.sleep(delay)
+            compiled_data[page_type].append(page)
         
         logger.info(f"\nCompilacion completada: {len(compiled_data)} tipos de paginas")
         return compiled_data
     
     @staticmethod
-    def consolidate_by_type(compiled_data):
+    def consolidate_by_type(compiled_data, dedup=True):
         consolidated = {}
         
+        # Menus, banners y paginas repetidas costarian tokens en el prompt del redactor
+        if dedup:
+            compiled_data, _ = deduplicator.deduplicate(compiled_data)
+        
         for page_type, pages in compiled_data.items():
             consolidated_text = ""
             
@@ -78,7 +119,10 @@ class Compiler:
         return validate_compiled_content(consolidated)
 
 
-def compile_links(selected_links, delay=1.5, use_cache=False):
+def compile_links(selected_links, delay=1.5, use_cache=False, max_workers=4, per_host_concurrency=1, streaming=False,
+                  extractor=None):
+    # extractor: nombre del extractor HTML de esta ejecucion; None = el configurado con Web.set_extractor
     compiler = Compiler()
-    compiled = compiler.compile_pages(selected_links, delay=delay, use_cache=use_cache)
+    compiled = compiler.compile_pages(selected_links, delay=delay, use_cache=use_cache, max_workers=max_workers,
+                                      per_host_concurrency=per_host_concurrency, streaming=streaming, extractor=extractor)
     return compiler.consolidate_by_type(compiled)
\ No newline at end of file
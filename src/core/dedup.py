@@ -0,0 +1,158 @@
+import hashlib
+import math
+import re
+from utils.logger import logger
+from utils.token_budget import token_budget
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+WORD_PATTERN = re.compile(r"\w+")
+
+# Valor de los compartimentos de la firma MinHash sin ningun shingle
+EMPTY_BIN = 1 << 64
+
+
+def normalize_line(line):
+    return WHITESPACE_PATTERN.sub(" ", line).strip().lower()
+
+
+def fingerprint(text):
+    # Huella estable de 64 bits (hash() de Python cambia entre procesos)
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class Deduplicator:
+    """
+    Limpia las paginas compiladas antes de montar el prompt del redactor:
+    elimina las lineas que se repiten en la mayoria de paginas (menus, banners
+    de cookies, pies) conservando su primera aparicion, y colapsa las paginas
+    casi identicas (variantes de idioma, redirecciones) con MinHash y LSH. Todo
+    el proceso es lineal en el tamano del texto.
+    """
+
+    def __init__(self, boilerplate_ratio=0.5, similarity=0.8, shingle_size=5, num_bins=64, bands=16):
+        self.boilerplate_ratio = boilerplate_ratio
+        self.similarity = similarity
+        self.shingle_size = shingle_size
+        self.num_bins = num_bins
+        self.bands = bands
+
+    def configure(self, boilerplate_ratio=None, similarity=None):
+        if boilerplate_ratio:
+            self.boilerplate_ratio = boilerplate_ratio
+        if similarity:
+            self.similarity = similarity
+
+    def find_boilerplate(self, pages):
+        # Lineas presentes en al menos boilerplate_ratio de las paginas (minimo 3 paginas)
+        if len(pages) < 3:
+            return set()
+
+        document_frequency = {}
+        for page in pages:
+            for key in {fingerprint(normalize_line(line)) for line in page["content"].split("\n") if line.strip()}:
+                document_frequency[key] = document_frequency.get(key, 0) + 1
+
+        threshold = max(2, math.ceil(self.boilerplate_ratio * len(pages)))
+        return {key for key, count in document_frequency.items() if count >= threshold}
+
+    def remove_boilerplate(self, pages, boilerplate):
+        seen = set()
+        cleaned = []
+        for page in pages:
+            lines = []
+            for line in page["content"].split("\n"):
+                key = fingerprint(normalize_line(line)) if line.strip() else None
+                if key in boilerplate:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                lines.append(line)
+            cleaned.append(dict(page, content="\n".join(lines).strip()))
+        return cleaned
+
+    def signature(self, text):
+        # MinHash de una sola permutacion: cada shingle se hashea una vez y cae en un
+        # compartimento, que guarda el minimo. Coste lineal en el numero de palabras
+        words = WORD_PATTERN.findall(text.lower())
+        size = self.shingle_size
+        signature = [EMPTY_BIN] * self.num_bins
+        for i in range(max(1, len(words) - size + 1)):
+            value = fingerprint(" ".join(words[i:i + size]))
+            index = value % self.num_bins
+            if value < signature[index]:
+                signature[index] = value
+        return signature
+
+    @staticmethod
+    def similarity_estimate(first, second):
+        # Jaccard estimado sobre los compartimentos ocupados en alguna de las dos firmas
+        used = [(a, b) for a, b in zip(first, second) if a != EMPTY_BIN or b != EMPTY_BIN]
+        if not used:
+            return 1.0
+        return sum(1 for a, b in used if a == b) / len(used)
+
+    def find_near_duplicates(self, pages):
+        # LSH por bandas: solo se comparan las paginas que coinciden en alguna banda
+        rows = self.num_bins // self.bands
+        buckets = {}
+        signatures = []
+        duplicates = {}
+
+        for index, page in enumerate(pages):
+            signature = self.signature(page["content"])
+            signatures.append(signature)
+            candidates = set()
+            for band in range(self.bands):
+                values = tuple(signature[band * rows:(band + 1) * rows])
+                if all(value == EMPTY_BIN for value in values):
+                    # Una banda vacia no indica parecido: juntaria todas las paginas cortas en el mismo cubo
+                    continue
+                key = (band, values)
+                candidates.update(buckets.setdefault(key, []))
+                buckets[key].append(index)
+
+            for candidate in sorted(candidates):
+                if candidate not in duplicates and self.similarity_estimate(signature, signatures[candidate]) >= self.similarity:
+                    duplicates[index] = candidate
+                    break
+
+        return duplicates
+
+    def deduplicate(self, compiled_data):
+        """
+        Recibe {tipo: [paginas]} y devuelve el mismo formato sin boilerplate ni
+        paginas casi duplicadas (se conserva la primera), junto con un informe
+        de caracteres y tokens eliminados.
+        """
+        entries = [(page_type, page) for page_type, pages in compiled_data.items() for page in pages]
+        pages = [page for _, page in entries]
+        chars_before = sum(len(page["content"]) for page in pages)
+        tokens_before = sum(token_budget.count(page["content"]) for page in pages)
+
+        boilerplate = self.find_boilerplate(pages)
+        pages = self.remove_boilerplate(pages, boilerplate)
+        duplicates = self.find_near_duplicates(pages)
+
+        result = {}
+        for index, ((page_type, _), page) in enumerate(zip(entries, pages)):
+            if index in duplicates:
+                logger.info(f"Pagina casi duplicada descartada: {page['url']} (igual a {pages[duplicates[index]]['url']})")
+                continue
+            if page["content"]:
+                result.setdefault(page_type, []).append(page)
+
+        kept = [page for page_list in result.values() for page in page_list]
+        chars_after = sum(len(page["content"]) for page in kept)
+        tokens_after = sum(token_budget.count(page["content"]) for page in kept)
+        stats = {
+            "boilerplate_lines": len(boilerplate),
+            "duplicate_pages": len(duplicates),
+            "chars_removed": chars_before - chars_after,
+            "tokens_removed": tokens_before - tokens_after
+        }
+        logger.info(f"Deduplicacion: {stats['boilerplate_lines']} lineas repetidas, {stats['duplicate_pages']} paginas casi duplicadas. "
+                    f"Eliminados {stats['chars_removed']} caracteres (~{stats['tokens_removed']} tokens)")
+        return result, stats
+
+
+deduplicator = Deduplicator()
@@ -0,0 +1,212 @@
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+
+# Etiquetas cuyo contenido no aporta texto util al folleto
+IRRELEVANT_TAGS = ["script", "style", "img", "input", "noscript", "svg", "footer", "nav", "aside"]
+
+# Cota de memoria por pagina; el ajuste al contexto del modelo lo hace token_budget al montar el prompt
+MAX_TEXT_CHARS = 40000
+
+
+class HtmlExtractor:
+    """
+    Contrato comun de los extractores: extract(html) devuelve [title, text, links]
+    con los enlaces de todo el documento y el texto visible del body.
+    """
+
+    name = None
+
+    def extract(self, html):
+        raise NotImplementedError
+
+    @staticmethod
+    def join_strings(strings):
+        # Mismo criterio que get_text(separator="\n", strip=True) de BeautifulSoup
+        stripped = (s.strip() for s in strings)
+        return "\n".join(s for s in stripped if s)[:MAX_TEXT_CHARS]
+
+
+class BeautifulSoupExtractor(HtmlExtractor):
+
+    name = "bs4"
+
+    def extract(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        links = [a.get('href') for a in soup.find_all('a', href=True)]
+        title = soup.title.string if soup.title else "Sin título"
+        # Eliminar contenido irrelevante
+        for irrelevant in soup.body(IRRELEVANT_TAGS):
+            irrelevant.decompose()
+        # Extraer texto plano
+        text = soup.body.get_text(separator="\n", strip=True)
+        return [title, text[:MAX_TEXT_CHARS], links]
+
+
+class LxmlExtractor(HtmlExtractor):
+    """
+    Extractor sobre el parser en C de libxml2. Recorre el arbol sin modificarlo:
+    drop_tree() fusionaria el texto anterior con la cola del nodo eliminado y
+    cambiaria los saltos de linea respecto a BeautifulSoup.
+    """
+
+    name = "lxml"
+
+    SKIP_TAGS = frozenset(IRRELEVANT_TAGS)
+
+    @staticmethod
+    def parse(html):
+        try:
+            return lxml_html.document_fromstring(html)
+        except ValueError:
+            # Cadenas con declaracion de codificacion XML: parsear como bytes
+            return lxml_html.document_fromstring(html.encode("utf-8"), parser=lxml_html.HTMLParser(encoding="utf-8"))
+
+    def iter_body_strings(self, body):
+        stack = [(body, False)]
+        while stack:
+            node, closing = stack.pop()
+
+            if closing:
+                if node.tail and node is not body:
+                    yield node.tail
+                continue
+
+            stack.append((node, True))
+
+            # Comentarios, instrucciones y etiquetas irrelevantes: solo cuenta su cola
+            if not isinstance(node.tag, str) or node.tag in self.SKIP_TAGS:
+                continue
+
+            if node.text:
+                yield node.text
+            for child in reversed(node):
+                stack.append((child, False))
+
+    def extract(self, html):
+        doc = self.parse(html)
+        links = [a.get('href') for a in doc.iter('a') if a.get('href') is not None]
+
+        title_element = doc.find('.//title')
+        title = title_element.text if title_element is not None else "Sin título"
+
+        text = self.join_strings(self.iter_body_strings(doc.body))
+        return [title, text, links]
+
+
+def extract_anchors(html):
+    # Texto visible (o title/aria-label) de cada enlace: {href: texto}, primera aparicion
+    anchors = {}
+    for a in LxmlExtractor.parse(html).iter('a'):
+        href = a.get('href')
+        if href is None or anchors.get(href):
+            continue
+        text = " ".join(a.text_content().split()) or a.get('title') or a.get('aria-label') or ""
+        anchors[href] = text.strip()
+    return anchors
+
+
+class StreamingExtractor(HTMLParser):
+    """
+    Extractor incremental para descargas en streaming: se alimenta por trozos con
+    feed() y acumula titulo, texto y enlaces a medida que llegan. Cuando el texto
+    alcanza el presupuesto y ya se ha visto la zona de enlaces final (cierre del
+    footer o del body), done indica que el resto del documento puede descartarse.
+    """
+
+    VOID_TAGS = frozenset(["img", "input", "br", "hr", "meta", "link", "source", "wbr", "area", "base", "col", "embed", "param", "track"])
+
+    def __init__(self, text_budget=MAX_TEXT_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.text_budget = text_budget
+        self.title = None
+        self.title_seen = False
+        self.links = []
+        self.strings = []
+        self.text_length = 0
+        self.footer_seen = False
+        self.body_closed = False
+        self._in_body = False
+        self._in_title = False
+        self._skip_stack = []
+        self._pending = []
+
+    @property
+    def done(self):
+        return self.text_length >= self.text_budget and (self.footer_seen or self.body_closed)
+
+    def _flush(self):
+        # Los datos contiguos forman una sola cadena, aunque lleguen en trozos distintos
+        if not self._pending:
+            return
+        data = "".join(self._pending)
+        self._pending = []
+
+        if self._in_title:
+            self.title = (self.title or "") + data
+        elif self._in_body and not self._skip_stack:
+            stripped = data.strip()
+            if stripped:
+                self.strings.append(data)
+                self.text_length += len(stripped) + 1
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href is not None:
+                self.links.append(href)
+
+        if tag == "title" and not self.title_seen:
+            self.title_seen = True
+            self._in_title = True
+        elif tag == "body":
+            self._in_body = True
+        elif tag in IRRELEVANT_TAGS and tag not in self.VOID_TAGS and self._in_body:
+            self._skip_stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href is not None:
+                self.links.append(href)
+
+    def handle_endtag(self, tag):
+        self._flush()
+
+        if tag == "title":
+            self._in_title = False
+        elif tag == "body":
+            self._in_body = False
+            self.body_closed = True
+        elif self._skip_stack and self._skip_stack[-1] == tag:
+            self._skip_stack.pop()
+
+        if tag == "footer":
+            self.footer_seen = True
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def result(self):
+        self._flush()
+        title = self.title if self.title_seen else "Sin título"
+        return [title, HtmlExtractor.join_strings(self.strings), self.links]
+
+
+EXTRACTORS = {
+    BeautifulSoupExtractor.name: BeautifulSoupExtractor,
+    LxmlExtractor.name: LxmlExtractor
+}
+
+
+def get_extractor(name):
+    if name not in EXTRACTORS:
+        raise ValueError(f"Extractor HTML desconocido: {name}. Disponibles: {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name]()
@@ -0,0 +1,244 @@
+import re
+from urllib.parse import urljoin, urlsplit
+from utils.logger import logger
+
+# Palabras clave por tipo de pagina (fragmentos de regex, en varios idiomas) y ajuste de prioridad
+PAGE_TYPES = {
+    "about page": (5, [
+        r"about(?:[-_]?us)?", r"company", r"who[-_]we[-_]are", r"our[-_]story", r"mission", r"empresa",
+        r"nosotros", r"quienes[-_]somos", r"qui[eé]nes[-_]somos", r"sobre[-_]nosotros", r"misi[oó]n",
+        r"a[-_]propos", r"qui[-_]sommes[-_]nous", r"entreprise", r"[uü]ber[-_]uns", r"unternehmen",
+        r"chi[-_]siamo", r"azienda", r"sobre", r"over[-_]ons"
+    ]),
+    "products page": (5, [
+        r"products?", r"services?", r"solutions?", r"platform", r"features?", r"productos?", r"servicios?",
+        r"soluciones", r"plataforma", r"produits?", r"produkte?", r"l[oö]sungen", r"leistungen",
+        r"prodotti", r"servizi", r"soluzioni"
+    ]),
+    "customers page": (0, [
+        r"customers?", r"clients?", r"case[-_]stud(?:y|ies)", r"success[-_]stories", r"testimonials?",
+        r"partners?", r"clientes?", r"casos(?:[-_]de[-_][eé]xito)?", r"socios", r"kunden", r"referenzen",
+        r"clienti", r"references?", r"showcase"
+    ]),
+    "careers page": (0, [
+        r"careers?", r"jobs?", r"join[-_]us", r"work[-_]with[-_]us", r"hiring", r"vacancies",
+        r"empleos?", r"trabaja[-_]con[-_]nosotros", r"vacantes", r"carreras?", r"trabajo",
+        r"karriere", r"stellenangebote", r"emplois?", r"carri[eè]res?", r"recrutement",
+        r"lavora[-_]con[-_]noi", r"carriere"
+    ]),
+    "culture page": (0, [
+        r"culture", r"values", r"team", r"life[-_]at", r"diversity", r"people", r"cultura", r"valores",
+        r"equipo", r"kultur", r"werte", r"[eé]quipe", r"valeurs", r"squadra"
+    ]),
+    "contact page": (-5, [
+        r"contact(?:[-_]?us)?", r"locations?", r"offices?", r"contacto", r"cont[aá]ctanos", r"oficinas",
+        r"kontakt", r"nous[-_]contacter", r"contatti"
+    ]),
+    "news page": (-15, [
+        r"news(?:room)?", r"press", r"blog", r"media", r"noticias", r"prensa", r"actualit[eé]s?",
+        r"presse", r"neuigkeiten", r"notizie", r"stampa"
+    ])
+}
+
+# Rutas que nunca aportan al folleto (legales, cuentas, comercio, ficheros)
+EXCLUDED_PATTERN = re.compile(
+    r"(?<![^\W_])(?:log[-_]?in|log[-_]?out|sign[-_]?in|sign[-_]?up|register|registro|account|cuenta|cart|carrito|"
+    r"checkout|privacy|privacidad|terms|terminos|t[eé]rminos|legal|cookies?|policy|pol[ií]tica|impressum|"
+    r"datenschutz|faq|search|buscar|tags?|category|feed|rss|wp[-_]admin|download|descargas?)(?![^\W_])",
+    re.IGNORECASE
+)
+FILE_PATTERN = re.compile(r"\.(?:pdf|jpe?g|png|gif|svg|zip|docx?|xlsx?|pptx?|mp4|mp3)$", re.IGNORECASE)
+LOCALE_PATTERN = re.compile(r"^[a-z]{2}(?:[-_][a-z]{2})?$", re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def compile_keywords(fragments):
+    # Palabra completa: los separadores de ruta (/ - _ .) y los espacios del texto actuan de limite
+    pattern = "|".join(fragment.replace("[-_]", r"[-_\s]") for fragment in fragments)
+    return re.compile(r"(?<![^\W_])(?:" + pattern + r")(?![^\W_])", re.IGNORECASE)
+
+
+TYPE_PATTERNS = {page_type: (bonus, compile_keywords(fragments)) for page_type, (bonus, fragments) in PAGE_TYPES.items()}
+
+
+def find_types(text):
+    # {tipo: coincidencia}; si la palabra clave de un tipo esta dentro de otra mas larga
+    # ("nosotros" en "trabaja con nosotros") gana la mas larga
+    matches = {}
+    for page_type, (_, pattern) in TYPE_PATTERNS.items():
+        match = pattern.search(text)
+        if match:
+            matches[page_type] = match
+    return {
+        page_type: match for page_type, match in matches.items()
+        if not any(other is not match and other.start() <= match.start() and match.end() <= other.end()
+                   and other.end() - other.start() > match.end() - match.start() for other in matches.values())
+    }
+
+
+def get_host(url):
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def same_site(host, base_host):
+    # Mismo dominio o subdominio (jobs.empresa.com cuenta como empresa.com)
+    return host == base_host or host.endswith("." + base_host) or base_host.endswith("." + host)
+
+
+class LinkRanker:
+    """
+    Puntua en local los enlaces de la pagina principal (palabras de la ruta y del
+    texto del enlace en varios idiomas, profundidad, mismo dominio) para enviar
+    al LLM solo los mejores candidatos o, si la seleccion es clara, prescindir
+    de el y devolver directamente {type, url, score, rationale}.
+
+    Modos: "auto" (omite el LLM si hay confianza), "llm" (siempre llama al
+    LLM, pero solo con los mejores candidatos) y "heuristic" (nunca lo llama).
+    """
+
+    def __init__(self, mode="auto", top_k=40, confidence=80, min_types=4, max_links=10, per_type=2):
+        self.mode = mode
+        self.top_k = top_k
+        self.confidence = confidence
+        self.min_types = min_types
+        self.max_links = max_links
+        self.per_type = per_type
+
+    def configure(self, mode=None, top_k=None, confidence=None):
+        if mode:
+            self.mode = mode
+        if top_k:
+            self.top_k = max(1, int(top_k))
+        if confidence:
+            self.confidence = confidence
+
+    @staticmethod
+    def score_link(base_url, url, anchor=""):
+        # Devuelve (score 0-100, tipo, justificacion); score 0 = descartado
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not same_site(get_host(url), get_host(base_url)):
+            return 0, None, None
+
+        path = parts.path.rstrip("/")
+        if FILE_PATTERN.search(path) or EXCLUDED_PATTERN.search(path):
+            return 0, None, None
+
+        # Los prefijos de idioma (/es/, /en-us/) no cuentan como profundidad
+        segments = [segment for segment in path.split("/") if segment]
+        while segments and LOCALE_PATTERN.match(segments[0]):
+            segments.pop(0)
+
+        if not segments:
+            if parts.query:
+                return 0, None, None
+            return 70, "home page", "Pagina principal: resumen y propuesta de valor de la empresa."
+
+        anchor = WHITESPACE_PATTERN.sub(" ", anchor or "").strip()
+        penalty = 6 * (len(segments) - 1) + (10 if parts.query else 0)
+        # Sin palabras clave: candidato de baja puntuacion que solo puede elegir el LLM
+        best = (max(1, 30 - penalty), None, None)
+        last_types = find_types(segments[-1])
+        path_types = {}
+        for segment in segments[:-1]:
+            for page_type, match in find_types(segment).items():
+                path_types.setdefault(page_type, match)
+        anchor_types = find_types(anchor) if anchor else {}
+        # Bajo /blog/ o /news/ el titulo del articulo ("our-new-products-launch") no define la pagina: es una noticia
+        if "news page" in path_types:
+            last_types = {page_type: match for page_type, match in last_types.items() if page_type == "news page"}
+            anchor_types = {page_type: match for page_type, match in anchor_types.items() if page_type == "news page"}
+        path_types.update(last_types)
+
+        for page_type, (bonus, _) in TYPE_PATTERNS.items():
+            path_match = path_types.get(page_type)
+            anchor_match = anchor_types.get(page_type)
+            if not path_match and not anchor_match:
+                continue
+            in_last = page_type in last_types
+
+            if in_last:
+                score = 85
+            elif path_match:
+                score = 65
+            else:
+                score = 60
+            if path_match and anchor_match:
+                score += 10
+            score += bonus - penalty
+
+            if score > best[0]:
+                reasons = []
+                if path_match:
+                    reasons.append(f"ruta con '{path_match.group(0)}'")
+                if anchor_match:
+                    reasons.append(f"texto del enlace '{anchor[:60]}'")
+                best = (score, page_type, f"Clasificado como {page_type} por {' y '.join(reasons)}.")
+
+        score, page_type, rationale = best
+        return max(1, min(100, score)), page_type, rationale
+
+    def rank(self, base_url, links, anchors=None):
+        """
+        Puntua los enlaces (ya absolutos y sin duplicados). anchors es un
+        diccionario {href: texto del enlace} tal y como aparece en el HTML.
+        Devuelve los candidatos con score > 0 ordenados de mayor a menor.
+        """
+        anchor_text = {}
+        for href, text in (anchors or {}).items():
+            anchor_text.setdefault(urljoin(base_url, href), text)
+
+        ranked = []
+        for position, url in enumerate(links):
+            score, page_type, rationale = self.score_link(base_url, url, anchor_text.get(url, ""))
+            if score > 0:
+                ranked.append({"type": page_type, "url": url, "score": score, "rationale": rationale, "position": position})
+
+        # A igual puntuacion, primero la ruta mas corta y luego el orden de aparicion
+        ranked.sort(key=lambda link: (-link["score"], len(link["url"]), link["position"]))
+        return ranked
+
+    @staticmethod
+    def variant_key(url, page_type):
+        # Misma pagina en otro idioma: /es/about y /about, o la portada del tipo con el nombre
+        # traducido (/about, /sobre, /es/sobre-nosotros) comparten clave
+        parts = urlsplit(url)
+        segments = [segment for segment in parts.path.lower().split("/") if segment]
+        while segments and LOCALE_PATTERN.match(segments[0]):
+            segments.pop(0)
+        if not segments or (len(segments) == 1 and page_type in TYPE_PATTERNS
+                            and TYPE_PATTERNS[page_type][1].fullmatch(segments[0])):
+            return page_type, ""
+        return page_type, get_host(url) + "/" + "/".join(segments)
+
+    def select(self, ranked, require_confidence=True):
+        # Mejores enlaces por tipo, sin variantes de idioma de una pagina ya elegida;
+        # None si no hay suficientes tipos con confianza alta
+        selected = []
+        per_type = {}
+        seen = set()
+        for link in ranked:
+            if link["score"] < 60 or not link["type"] or per_type.get(link["type"], 0) >= self.per_type:
+                continue
+            key = self.variant_key(link["url"], link["type"])
+            if key in seen:
+                continue
+            seen.add(key)
+            per_type[link["type"]] = per_type.get(link["type"], 0) + 1
+            selected.append({key: link[key] for key in ("type", "url", "score", "rationale")})
+            if len(selected) >= self.max_links:
+                break
+
+        confident_types = {link["type"] for link in selected if link["score"] >= self.confidence and link["type"] != "home page"}
+        if require_confidence and (len(confident_types) < self.min_types or len(selected) < 5):
+            return None
+        return selected
+
+    def top_candidates(self, ranked, total):
+        # Candidatos para el LLM: los mejor puntuados, sin los enlaces externos ni excluidos
+        candidates = [link["url"] for link in ranked[:self.top_k]]
+        logger.info(f"Preseleccion heuristica: {len(candidates)} de {total} enlaces candidatos")
+        return candidates
+
+
+link_ranker = LinkRanker()
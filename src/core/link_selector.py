@@ -1,47 +1,55 @@
+import hashlib
 import json
 import sys
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit
+from core.link_ranker import link_ranker, get_host
 from utils.api_openai import OpenAIClient
-from utils.utils import get_prompts_path
+from utils.cache_manager import CacheManager
 from utils.logger import logger
-from utils.validators import validate_selected_links
+from utils.metrics import metrics_tracker
+from utils.prompt_registry import prompt_registry
+from utils.token_budget import token_budget
+from utils.validators import validate_selected_links, validate_indexed_links, get_strict_schema, IndexedLinksResponse
+
+# Modelos que admiten response_format con json_schema estricto (por prefijo del nombre)
+STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
 
 class LinkSelector:
     
-    def __init__(self):
-        self.openai_client = OpenAIClient()
+    # Formato de la respuesta del LLM: "structured" (json_schema e indices) o "json" (texto JSON con URLs)
+    output_mode = "structured"
+    repair_attempts = 2
+    
+    # Cache de selecciones por dominio: horas de validez (0 = desactivada) y solape minimo
+    # de enlaces ya evaluados para reutilizar una seleccion previa en parte
+    cache_ttl_hours = 24
+    min_overlap = 0.8
+    
+    @classmethod
+    def configure_cache(cls, ttl_hours=None, min_overlap=None):
+        if ttl_hours is not None:
+            cls.cache_ttl_hours = ttl_hours
+        if min_overlap is not None:
+            cls.min_overlap = min_overlap
+    
+    @classmethod
+    def configure_output(cls, output_mode=None):
+        if output_mode:
+            cls.output_mode = output_mode
+    
+    def __init__(self, response_cache=None):
+        self.openai_client = OpenAIClient(response_cache=response_cache)
     
     @staticmethod
     def load_prompt(prompt_filename):
-        try:
-            prompt_path = get_prompts_path(prompt_filename)
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            logger.error(f"Error: No se encontro el archivo {prompt_path}")
-            sys.exit(1)
-        except Exception as e:
-            logger.error(f"Error al leer el prompt: {e}")
+        prompt = prompt_registry.get_text(prompt_filename)
+        if prompt is None:
             sys.exit(1)
+        return prompt
     
     @staticmethod
     def load_json_prompts(prompt_filename):       
-        prompt_path = get_prompts_path(prompt_filename)
-        
-        try:
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-                # Convertir el contenido del assistant que está en formato JSON a string
-                # para evitar que el LLM lo vea como un objeto y se confunda
-                for message in data:
-                    if message.get("role") == "assistant":
-                        message["content"] = json.dumps(message["content"])
-                        
-                return data
-        except Exception as e:
-            logger.error(f"Error cargando prompts multi-shot desde {prompt_filename}: {e}")
-            return []
+        return prompt_registry.get_messages(prompt_filename)
     
     @staticmethod
     def normalize_url(base_url, link):
@@ -71,38 +79,212 @@ class LinkSelector:
         
         return unique_links
 
-    def select_relevant_links(self, base_url, links_list, model="gpt-4o-mini", max_tokens=2000):        
+    def select_relevant_links(self, base_url, links_list, model="gpt-4o-mini", max_tokens=2000, anchors=None):        
             normalized_links = self.normalize_links(base_url, links_list)
             
-            if len(normalized_links) > 200:
-                normalized_links = normalized_links[:200]
-                logger.info(f"Advertencia: Se limitaron los enlaces a 200 para no exceder el contexto")
+            # Preseleccion local: con enlaces evidentes se omite el LLM (salvo en modo "llm");
+            # si no, solo recibe los mejores candidatos
+            ranked = link_ranker.rank(base_url, normalized_links, anchors)
+            if link_ranker.mode != "llm":
+                heuristic_links = link_ranker.select(ranked, require_confidence=link_ranker.mode == "auto")
+                if heuristic_links is not None:
+                    logger.info(f"Seleccion heuristica con confianza suficiente: se omite la llamada al LLM")
+                    validated_result = validate_selected_links({"links": heuristic_links})
+                    logger.info(f"Enlaces seleccionados: {len(validated_result['links'])}")
+                    return validated_result
+            # Sin candidatos propios (p. ej. todo en otro dominio) el LLM decide sobre la lista completa
+            normalized_links = link_ranker.top_candidates(ranked, len(normalized_links)) or normalized_links
             
-            system_prompt = self.load_prompt("link_system.md")
+            # Tantos enlaces como quepan en el presupuesto de tokens del modelo, en su orden de aparicion
+            normalized_links = self.pack_links(normalized_links, model, max_tokens, base_url)
             
-            messages = [
-                        {"role": "system", "content": system_prompt}
-                    ]            
-            few_shots = self.load_json_prompts("link_multishot_prompts.json")         
+            # Seleccion previa del mismo dominio: se reutiliza entera o solo se juzgan los enlaces nuevos
+            domain = get_host(base_url)
+            cache_key = CacheManager.get_selection_key(domain, model, prompt_registry.get_version(), OpenAIClient.base_url)
+            links_hash = self.get_links_hash(normalized_links)
+            cached = None
+            if LinkSelector.cache_ttl_hours:
+                cached = CacheManager.load_selection(cache_key, LinkSelector.cache_ttl_hours)
             
-            messages.extend(few_shots)                        
+            if cached and cached["links_hash"] == links_hash:
+                CacheManager.record_lookup("selection_hits")
+                logger.info(f"Seleccion de enlaces de {domain} servida desde cache ({len(cached['result']['links'])} enlaces)")
+                return cached["result"]
+            
+            judged = set(cached["judged"]) if cached else set()
+            overlap = len(judged.intersection(normalized_links)) / len(normalized_links) if normalized_links else 0
+            if cached and overlap >= LinkSelector.min_overlap:
+                CacheManager.record_lookup("selection_partial")
+                pending = [link for link in normalized_links if link not in judged]
+                current = set(normalized_links)
+                previous = [link for link in cached["result"]["links"] if link["url"] in current]
+                logger.info(f"Seleccion de {domain} reutilizada en parte ({overlap:.0%} de enlaces ya evaluados); "
+                            f"se evaluan {len(pending)} enlaces nuevos")
+                fresh = self.query_llm(base_url, pending, model, max_tokens)["links"] if pending else []
+                merged = sorted(previous + fresh, key=lambda link: -link["score"])[:10]
+                result = validate_selected_links({"links": merged})
+            else:
+                CacheManager.record_lookup("selection_misses")
+                result = self.query_llm(base_url, normalized_links, model, max_tokens)
+            
+            if result.get("links") and LinkSelector.cache_ttl_hours:
+                CacheManager.save_selection(cache_key, {
+                    "links_hash": links_hash,
+                    "judged": sorted(judged.union(normalized_links)),
+                    "result": result
+                }, domain=domain, model=model)
+            return result
+
+    @staticmethod
+    def get_links_hash(links):
+        return hashlib.sha256("\n".join(sorted(set(links))).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def use_structured_output(model):
+        return LinkSelector.output_mode == "structured" and model.startswith(STRUCTURED_OUTPUT_MODELS)
+
+    @staticmethod
+    def get_prefix(model):
+        # Prefijo estable (system + ejemplos few-shot o formato por indices) compartido por todas las llamadas
+        if LinkSelector.use_structured_output(model):
+            return prompt_registry.get_prefix(["link_system.md", "link_index_format.md"])
+        return prompt_registry.get_prefix(["link_system.md"], "link_multishot_prompts.json")
+
+    @staticmethod
+    def compact_link(base_url, link):
+        # Ruta relativa al sitio base ("/about?x=1"); URL completa si es de otro dominio
+        parts = urlsplit(link)
+        if parts.netloc != urlsplit(base_url).netloc:
+            return link
+        return (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+    @staticmethod
+    def format_links(base_url, links, model):
+        if LinkSelector.use_structured_output(model):
+            return [f"{index} {LinkSelector.compact_link(base_url, link)}" for index, link in enumerate(links)]
+        return [f"- {link}" for link in links]
+
+    @staticmethod
+    def pack_links(links, model, max_tokens, base_url=""):
+        prefix, _ = LinkSelector.get_prefix(model)
+        budget = token_budget.input_budget(model, max_tokens, prefix or [])
+        packed_links = token_budget.pack_lines(LinkSelector.format_links(base_url, links, model), budget, model)
+        if len(packed_links) < len(links):
+            logger.info(f"Advertencia: Se limitaron los enlaces a {len(packed_links)} de {len(links)} "
+                        f"para no exceder el presupuesto de {budget} tokens")
+        return links[:len(packed_links)]
+
+    def query_llm(self, base_url, normalized_links, model="gpt-4o-mini", max_tokens=2000):
+        if LinkSelector.use_structured_output(model):
+            return self.query_llm_structured(base_url, normalized_links, model, max_tokens)
+        if LinkSelector.output_mode == "structured":
+            logger.info(f"{model} no admite salida estructurada: se usa el formato JSON con URLs")
+        return self.query_llm_json(base_url, normalized_links, model, max_tokens)
+
+    def query_llm_structured(self, base_url, normalized_links, model="gpt-4o-mini", max_tokens=2000):
+        """
+        Seleccion con salida estructurada (json_schema estricto): el LLM recibe los
+        enlaces numerados con su ruta relativa y devuelve indices, que se traducen
+        a URLs en local. Si algun elemento no supera la validacion solo se vuelven
+        a pedir esos elementos y sus campos, en una peticion nueva y corta.
+        """
+        prefix, prefix_hash = LinkSelector.get_prefix(model)
+        if prefix is None:
+            sys.exit(1)
+        logger.debug(f"Prefijo de seleccion de enlaces: {prefix_hash}")
+        
+        response_format = {"type": "json_schema", "json_schema": get_strict_schema(IndexedLinksResponse)}
+        lines = self.format_links(base_url, normalized_links, model)
+        user_message = (f"Sitio web base: {base_url}\n"
+                        f"Enlaces encontrados ({len(normalized_links)} total):\n" + "\n".join(lines) +
+                        "\nSelecciona los enlaces mas relevantes y devuelve sus indices.")
+        messages = prefix + [{"role": "user", "content": user_message}]
+        token_budget.report(messages, model, max_tokens)
+        
+        logger.info(f"Analizando {len(normalized_links)} enlaces con {model} (salida estructurada)...")
+        with metrics_tracker.llm_stage("Seleccion de enlaces con IA"):
+            result = self.openai_client.call_openai(messages=messages, model=model, max_tokens=max_tokens,
+                                                    temperature=0.3, response_format=response_format)
+        logger.info(f"Respuesta recibida. Tokens usados: {result['tokens']['total']}")
+        
+        try:
+            links, errors = validate_indexed_links(json.loads(result["response"]), normalized_links)
+        except json.JSONDecodeError as e:
+            # Respuesta truncada o rechazada: se repite con el formato JSON clasico
+            logger.warning(f"La salida estructurada no es JSON valido ({e}); se usa el formato JSON con URLs")
+            return self.query_llm_json(base_url, normalized_links, model, max_tokens)
+        
+        for attempt in range(1, LinkSelector.repair_attempts + 1):
+            if not errors:
+                break
+            logger.warning(f"{len(errors)} enlaces con campos invalidos; se piden de nuevo (reparacion {attempt}/{LinkSelector.repair_attempts})")
+            chosen = {link["url"] for link in links}
+            repaired, errors = self.repair_links(prefix, lines, errors, normalized_links, model, response_format)
+            links.extend(link for link in repaired if link["url"] not in chosen)
+        
+        if errors:
+            logger.warning(f"Se descartan {len(errors)} enlaces que no pudieron repararse")
+        
+        validated_result = validate_selected_links({"links": links[:10]})
+        logger.info(f"Enlaces seleccionados: {len(validated_result['links'])}")
+        return validated_result
+
+    def repair_links(self, prefix, lines, errors, normalized_links, model, response_format):
+        # Peticion nueva con solo los elementos fallidos: no se reenvia la conversacion anterior
+        failed = []
+        for error in errors:
+            index = error["item"]["index"]
+            failed.append(f"{lines[index]} -> corrige {', '.join(error['fields'])}. Recibido: "
+                          f"{json.dumps(error['item'], ensure_ascii=False)}")
+        user_message = ("Estos elementos de una seleccion anterior no superaron la validacion. "
+                        "Devuelve solo estos elementos corregidos, con el mismo index:\n" + "\n".join(failed))
+        messages = prefix + [{"role": "user", "content": user_message}]
+        
+        with metrics_tracker.llm_stage("Seleccion de enlaces con IA"):
+            result = self.openai_client.call_openai(messages=messages, model=model, max_tokens=100 + 150 * len(errors),
+                                                    temperature=0.3, response_format=response_format)
+        try:
+            data = json.loads(result["response"])
+        except json.JSONDecodeError:
+            return [], errors
+        
+        # Solo se aceptan los indices que se pidieron
+        requested = {error["item"]["index"] for error in errors}
+        if isinstance(data, dict) and isinstance(data.get("links"), list):
+            data = {"links": [item for item in data["links"] if isinstance(item, dict) and item.get("index") in requested]}
+        repaired, repair_errors = validate_indexed_links(data, normalized_links)
+        fixed = {normalized_links.index(link["url"]) for link in repaired}
+        pending = [error for error in errors if error["item"]["index"] not in fixed]
+        # Para el siguiente intento cuenta la ultima version de cada elemento
+        latest = {error["item"]["index"]: error for error in repair_errors}
+        return repaired, [latest.get(error["item"]["index"], error) for error in pending]
+
+    def query_llm_json(self, base_url, normalized_links, model="gpt-4o-mini", max_tokens=2000):
+            # Prefijo estable (system + ejemplos few-shot) compartido por todas las llamadas
+            messages, prefix_hash = prompt_registry.get_prefix(["link_system.md"], "link_multishot_prompts.json")
+            if messages is None:
+                sys.exit(1)
+            logger.debug(f"Prefijo de seleccion de enlaces: {prefix_hash}")
             
             user_message = f"""Sitio web base: {base_url} 
-            Enlaces encontrados ({len(normalized_links)} total):{chr(10).join(f"- {link}" for link in normalized_links)}
+            Enlaces encontrados ({len(normalized_links)} total):
+{chr(10).join(f"- {link}" for link in normalized_links)}
             Selecciona los enlaces mas relevantes y devuelve el JSON.""" 
             
             messages.append({"role": "user", "content": user_message})
+            token_budget.report(messages, model, max_tokens)
             
             logger.info(f"Analizando {len(normalized_links)} enlaces con {model}...")
             
             # Intentar hasta 3 veces si falla el parseo
             for attempt in range(1, 4):
-                result = self.openai_client.call_openai(
-                    messages=messages,
-                    model=model,
-                    max_tokens=max_tokens,
-                    temperature=0.3
-                )
+                with metrics_tracker.llm_stage("Seleccion de enlaces con IA"):
+                    result = self.openai_client.call_openai(
+                        messages=messages,
+                        model=model,
+                        max_tokens=max_tokens,
+                        temperature=0.3
+                    )
                 
                 response_text = result["response"].strip()
                 
@@ -156,6 +338,6 @@ Intenta de nuevo con el formato correcto."""
                         return {"links": []}
 
 
-def select_links(base_url, links_list, model="gpt-4o-mini"):
-    selector = LinkSelector()
-    return selector.select_relevant_links(base_url, links_list, model=model)
\ No newline at end of file
+def select_links(base_url, links_list, model="gpt-4o-mini", anchors=None, response_cache=None):
+    selector = LinkSelector(response_cache=response_cache)
+    return selector.select_relevant_links(base_url, links_list, model=model, anchors=anchors)
\ No newline at end of file
@@ -1,54 +1,181 @@
+import codecs
+import hashlib
+import inspect
 import requests
-from bs4 import BeautifulSoup
+import time
+from core.extractors import HtmlExtractor, StreamingExtractor, get_extractor, extract_anchors, MAX_TEXT_CHARS
 from utils.cache_manager import cache_manager
-from playwright.sync_api import sync_playwright
+from utils.browser_pool import browser_pool
+from utils.http_client import http_client
 from utils.logger import logger
+from utils.metrics import metrics_tracker
 from utils.robots_checker import robots_checker
 
+# Subir al cambiar la extraccion de forma que no se refleje en el codigo del extractor
+EXTRACTOR_VERSION = "1"
+
+# Limite duro de bytes por pagina en las descargas en streaming
+STREAM_MAX_BYTES = 5 * 1024 * 1024
+
 class Web:
     
+    extractor = get_extractor("bs4")
+    _extractor_versions = {}
+    
     @classmethod
-    def get_data(cls, url):
+    def fetch(cls, url, headers=None, stream=False):
         if not robots_checker.can_fetch(url):
             logger.error(f"Acceso bloqueado por robots.txt: {url}")
             return None
         
+        start = time.monotonic()
         try:
-            headers = {'User-Agent': 'BrochureBot/1.0 (Educational Project)'}
             logger.info(f"Descargando: {url}")
-            response = requests.get(url, headers=headers, timeout=30)
+            # Sesion compartida: reutiliza conexiones keep-alive con el mismo host
+            response = http_client.get(url, headers=headers, stream=stream)
+            # En streaming se mide hasta las cabeceras; el cuerpo se lee despues
+            metrics_tracker.record_http(url, response.status_code, time.monotonic() - start)
             response.raise_for_status()
             logger.info(f"Descarga exitosa: {url}")
-            return response.text
+            return response
         except requests.exceptions.RequestException as e:
+            if getattr(e, "response", None) is None:
+                metrics_tracker.record_http(url, "error", time.monotonic() - start)
             logger.error(f"Error al descargar {url}: {e}")
-            return None    
+            return None
+    
+    @classmethod
+    def get_data(cls, url):
+        response = cls.fetch(url)
+        return response.text if response is not None else None
         
     @classmethod
-    def clean_text(cls, text):
-        soup = BeautifulSoup(text, 'html.parser')
-        links = [a.get('href') for a in soup.find_all('a', href=True)]
-        title = soup.title.string if soup.title else "Sin título"
-        # Eliminar contenido irrelevante
-        for irrelevant in soup.body(["script", "style", "img", "input", "noscript", "svg", "footer", "nav", "aside"]):
-            irrelevant.decompose()
-        # Extraer texto plano
-        text = soup.body.get_text(separator="\n", strip=True)
-        # Recortar texto para no exceder el contexto del modelo
-        text = text[:12000]
-        return [title, text, links]
+    def set_extractor(cls, name):
+        # Extractor por defecto del proceso (CLI, batch); la UI lo pasa en cada llamada
+        cls.extractor = get_extractor(name)
+        logger.info(f"Extractor HTML: {name}")
+    
+    @classmethod
+    def resolve_extractor(cls, name=None):
+        return get_extractor(name) if name else cls.extractor
+    
+    @classmethod
+    def get_extractor_version(cls, extractor=None):
+        # La huella incluye el codigo del extractor: cualquier cambio en la
+        # logica de extraccion invalida automaticamente la cache de contenido
+        extractor = cls.resolve_extractor(extractor)
+        if extractor.name not in cls._extractor_versions:
+            try:
+                source = inspect.getsource(type(extractor)) + inspect.getsource(HtmlExtractor)
+            except (OSError, TypeError):
+                source = ""
+            fingerprint = hashlib.md5(source.encode("utf-8")).hexdigest()[:12]
+            cls._extractor_versions[extractor.name] = f"{extractor.name}-{EXTRACTOR_VERSION}-{fingerprint}"
+        return cls._extractor_versions[extractor.name]
+    
+    @classmethod
+    def extract(cls, text, extractor=None):
+        return cls.resolve_extractor(extractor).extract(text)
+    
+    @staticmethod
+    def extract_anchors(text):
+        # Texto de cada enlace para la preseleccion heuristica; opcional, nunca rompe el flujo
+        try:
+            return extract_anchors(text)
+        except Exception as e:
+            logger.warning(f"No se pudo extraer el texto de los enlaces: {e}")
+            return {}
+        
+    @classmethod
+    def clean_text(cls, text, use_cache=False, extractor=None):
+        # La cache de contenido extraido sigue a la de paginas: solo si el usuario la activa
+        if not use_cache:
+            return cls.extract(text, extractor=extractor)
+        
+        content_hash = cache_manager.get_content_hash(text)
+        version = cls.get_extractor_version(extractor)
+        
+        parsed = cache_manager.load_parsed(content_hash, version)
+        if parsed is not None:
+            return parsed
+        
+        parsed = cls.extract(text, extractor=extractor)
+        cache_manager.save_parsed(content_hash, version, parsed)
+        return parsed
+    
+    @classmethod
+    def get_data_streaming(cls, url, text_budget=MAX_TEXT_CHARS, max_bytes=STREAM_MAX_BYTES, chunk_size=16 * 1024):
+        # Descarga por trozos alimentando el extractor incremental; se corta al
+        # completar el presupuesto de texto o al superar max_bytes
+        response = cls.fetch(url, stream=True)
+        
+        if response is None:
+            return None
+        
+        extractor = StreamingExtractor(text_budget)
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        parts = []
+        downloaded = 0
+        complete = False
+        
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                downloaded += len(chunk)
+                text = decoder.decode(chunk)
+                parts.append(text)
+                extractor.feed(text)
+                
+                if extractor.done:
+                    break
+                if downloaded >= max_bytes:
+                    logger.warning(f"Descarga cortada en {downloaded} bytes (limite {max_bytes}): {url}")
+                    break
+            else:
+                tail = decoder.decode(b"", final=True)
+                parts.append(tail)
+                extractor.feed(tail)
+                complete = True
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error durante la descarga de {url}: {e}")
+            return None
+        finally:
+            response.close()
+        
+        extractor.close()
+        logger.info(f"Streaming {'completo' if complete else 'cortado'}: {downloaded} bytes de {url}")
+        
+        return {
+            "html": "".join(parts),
+            "parsed": extractor.result(),
+            "complete": complete,
+            "headers": response.headers
+        }
+    
+    @classmethod
+    def get_page_text(cls, url, use_cache=False, streaming=False, extractor=None):
+        # Devuelve [title, text, links] de la pagina, o None si no se pudo descargar.
+        # En streaming se usa siempre el extractor incremental
+        cache_usable = use_cache and (cache_manager.is_cache_valid(url) or cache_manager.has_validators(url))
+        
+        if not streaming or cache_usable:
+            html = cls.get_data_with_cache(url, use_cache=use_cache)
+            return cls.clean_text(html, use_cache=use_cache, extractor=extractor) if html else None
+        
+        result = cls.get_data_streaming(url)
+        if result is None:
+            return None
+        
+        # Solo un documento completo puede guardarse como pagina en cache
+        if result["complete"]:
+            cache_manager.save_to_cache(url, result["html"], cache_manager.parse_validators(result["headers"]))
+        
+        return result["parsed"]
     
     @staticmethod
     def get_data_dynamic(url, timeout=30):
-        try:              
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                page.goto(url, timeout=timeout * 1000)
-                page.wait_for_timeout(3000)
-                content = page.content()
-                browser.close()
-                return content
+        try:
+            # Navegador persistente del pool en lugar de lanzar Chromium por pagina
+            return browser_pool.get_content(url, timeout=timeout)
                 
         except ImportError:
             logger.error("Playwright no esta instalado. Usa: pip install playwright && playwright install chromium")
@@ -58,15 +185,58 @@ class Web:
             return None
         
     @classmethod
-    def get_data_with_cache(cls, url, use_cache=False, max_age_hours=12):        
-        if use_cache and cache_manager.is_cache_valid(url, max_age_hours):
+    def revalidate(cls, url):
+        validators = cache_manager.load_validators(url)
+        
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        
+        logger.info(f"Revalidando cache: {url}")
+        response = cls.fetch(url, headers=headers)
+        
+        if response is None:
+            return None
+        
+        if response.status_code == 304:
             cached = cache_manager.load_from_cache(url)
-            if cached:
-                return cached
+            if cached is None:
+                return None
+            # Conservar los validadores previos si el 304 no los repite
+            validators.update(cache_manager.parse_validators(response.headers))
+            cache_manager.refresh_cache(url, validators)
+            cache_manager.record_lookup("revalidated")
+            logger.info(f"Cache revalidada sin cambios (304): {url}")
+            return cached
         
-        html = cls.get_data(url)
+        html = response.text
+        cache_manager.save_to_cache(url, html, cache_manager.parse_validators(response.headers))
+        cache_manager.record_lookup("misses")
+        return html
+        
+    @classmethod
+    def get_data_with_cache(cls, url, use_cache=False, max_age_hours=12):        
+        if use_cache:
+            if cache_manager.is_cache_valid(url, max_age_hours):
+                cached = cache_manager.load_from_cache(url)
+                if cached:
+                    cache_manager.record_lookup("hits")
+                    return cached
+            elif cache_manager.has_validators(url):
+                # Cache caducada: peticion condicional en lugar de descarga completa
+                html = cls.revalidate(url)
+                if html:
+                    return html
+            cache_manager.record_lookup("misses")
+        
+        response = cls.fetch(url)
+        
+        if response is None:
+            return None
         
-        if html:
-            cache_manager.save_to_cache(url, html)
+        html = response.text
+        cache_manager.save_to_cache(url, html, cache_manager.parse_validators(response.headers))
         
         return html
\ No newline at end of file
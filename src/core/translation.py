@@ -0,0 +1,123 @@
+import contextvars
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.logger import logger
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s")
+LIST_ITEM_PATTERN = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s")
+TABLE_ROW_PATTERN = re.compile(r"^\s*\|")
+
+
+def split_sections(markdown_text):
+    """
+    Divide el folleto en trozos que empiezan en cada encabezado '## ' (las
+    secciones de SECTIONS). Lo anterior al primer '## ' (titulo) es un trozo
+    propio. Nunca se corta dentro de un bloque de codigo.
+    """
+    sections = []
+    current = []
+    in_code = False
+
+    for line in markdown_text.strip().split("\n"):
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        if not in_code and line.startswith("## ") and any(l.strip() for l in current):
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip())
+    return sections
+
+
+def markdown_structure(markdown_text):
+    # Huella de formato que una traduccion fiel debe conservar
+    headings = []
+    list_items = 0
+    table_rows = 0
+    in_code = False
+
+    for line in markdown_text.split("\n"):
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+            continue
+        if in_code:
+            continue
+        match = HEADING_PATTERN.match(line)
+        if match:
+            headings.append(len(match.group(1)))
+        elif LIST_ITEM_PATTERN.match(line):
+            list_items += 1
+        elif TABLE_ROW_PATTERN.match(line):
+            table_rows += 1
+
+    return {"headings": headings, "list_items": list_items, "table_rows": table_rows}
+
+
+class ChunkedTranslator:
+    """
+    Traduce un folleto por secciones en paralelo con un numero acotado de hilos y
+    lo recompone en el orden original. Cada seccion se verifica contra la
+    estructura del original y, si falla, se reintenta de forma aislada.
+    """
+
+    def __init__(self, max_workers=4, max_attempts=2):
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+
+    def configure(self, max_workers=None, max_attempts=None):
+        if max_workers:
+            self.max_workers = max(1, int(max_workers))
+        if max_attempts:
+            self.max_attempts = max(1, int(max_attempts))
+
+    def translate_section(self, index, section, translate_chunk):
+        # translate_chunk(texto) -> texto traducido, o None si la llamada fallo
+        expected = markdown_structure(section)
+        best = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.time()
+            translated = translate_chunk(section)
+            if translated:
+                found = markdown_structure(translated)
+                if found == expected:
+                    logger.info(f"Seccion {index + 1} traducida en {time.time() - start:.2f}s")
+                    return translated
+                best = translated
+                logger.warning(f"Seccion {index + 1}: la traduccion altera la estructura (intento {attempt}/{self.max_attempts}). "
+                               f"Esperada {expected}, obtenida {found}")
+            else:
+                logger.warning(f"Seccion {index + 1}: fallo de traduccion (intento {attempt}/{self.max_attempts})")
+
+        if best:
+            logger.warning(f"Seccion {index + 1}: se usa la ultima traduccion aunque su estructura difiere")
+            return best
+        logger.error(f"Seccion {index + 1}: no se pudo traducir, se conserva el texto original")
+        return section
+
+    def iter_translate(self, markdown_text, translate_chunk):
+        # Devuelve las secciones traducidas en orden, cada una en cuanto esta lista
+        sections = split_sections(markdown_text)
+        if not sections:
+            return
+
+        workers = min(self.max_workers, len(sections))
+        logger.info(f"Traduciendo {len(sections)} secciones con {workers} hilos")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Cada hilo hereda el contexto del llamante (etapa de metricas a la que imputar el coste)
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.translate_section, index, section, translate_chunk)
+                for index, section in enumerate(sections)
+            ]
+            for future in futures:
+                yield future.result()
+
+    def translate(self, markdown_text, translate_chunk):
+        return "\n\n".join(self.iter_translate(markdown_text, translate_chunk))
+
+
+chunked_translator = ChunkedTranslator()
@@ -3,6 +3,8 @@ import sys
 import os
 import time
 import asyncio 
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # --- PARCHE PARA WINDOWS + PLAYWRIGHT ---
@@ -14,11 +16,12 @@ if sys.platform == "win32":
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 
 from core import scraping, link_selector, compiler, brochure
+from core.extractors import EXTRACTORS
 from utils.cache_manager import cache_manager
-from utils.metrics import MetricsTracker
+from utils.metrics import metrics_tracker
 from utils.api_openai import OpenAIClient
 from utils.exporters import markdown_to_html, markdown_to_pdf
-from utils.utils import save_md
+from utils.utils import save_md, get_outputs_path
 from utils.mock_responses import get_mock_compiled_content
 from utils.language_detector import *
 from utils.logger import logger 
@@ -28,6 +31,8 @@ st.set_page_config(page_title="Generador de Folletos IA", page_icon="📄", layo
 st.title("📄 Generador de Folletos Corporativos con IA")
 
 openai_client = OpenAIClient()
+# Exportacion Prometheus opcional (METRICS_FILE / METRICS_PORT); el endpoint se abre una sola vez por proceso
+metrics_tracker.configure_export()
 
 
 def render_brochure_tab(content, language_code, file_paths, company_name):
@@ -105,6 +110,31 @@ def render_brochure_tab(content, language_code, file_paths, company_name):
         st.warning("⚠️ El archivo PDF expiró o fue borrado.")
 
 
+def render_stream(chunks, refresh_seconds=0.15):
+    """
+    Muestra el Markdown en vivo según llega y devuelve el texto completo y el tiempo hasta el primer token.
+    Si el flujo se corta (StreamInterruptedError) se retira el texto parcial y el error llega al llamante.
+    """
+    placeholder = st.empty()
+    parts = []
+    start = time.time()
+    first_token = None
+    last_refresh = 0
+    
+    try:
+        for chunk in chunks:
+            if first_token is None:
+                first_token = time.time() - start
+            parts.append(chunk)
+            # Repintar todo el Markdown en cada fragmento es cuadrático: se limita la frecuencia
+            if time.time() - last_refresh >= refresh_seconds:
+                placeholder.markdown("".join(parts) + " ▌")
+                last_refresh = time.time()
+    finally:
+        placeholder.empty()
+    return "".join(parts) or None, first_token
+
+
 def generate_export_files(content, company_name, lang_code, formats):
     """
     Genera los archivos físicos una sola vez y devuelve sus rutas.
@@ -152,17 +182,21 @@ with st.sidebar:
         model_translator = st.selectbox("Traducción", ["gpt-4o-mini", "gpt-4-turbo", "gpt-3.5-turbo"], index=0)
     
     lang_options = list(get_language_list().keys())
-    default_lang_index = lang_options.index("Español") if "Español" in lang_options else 0
-    selected_language = st.selectbox(
-        "Idioma de destino (Traducción)", 
+    default_langs = ["Español"] if "Español" in lang_options else lang_options[:1]
+    selected_languages = st.multiselect(
+        "Idiomas de destino (Traducción)", 
         lang_options, 
-        index=default_lang_index,
+        default=default_langs,
         disabled=openai_client.mock_mode
     )
     
     tone = st.selectbox("Tono", ["formal", "humoristico"])
 
     use_cache = st.checkbox("Usar caché local", value=False)
+    use_llm_cache = st.checkbox("Reutilizar respuestas de la IA", value=bool(OpenAIClient.response_cache),
+                                help="Repetir una generación con el mismo contenido y modelos no vuelve a consumir tokens")
+    extractor_name = st.selectbox("Extractor HTML", list(EXTRACTORS.keys()), index=0,
+                                  help="lxml usa un parser en C mucho más rápido que BeautifulSoup")
     formats = st.multiselect("Formatos de descarga", ["html", "pdf"], default=["html", "pdf"])
     
     st.divider()
@@ -184,7 +218,8 @@ if generate_button:
         company_name = "Empresa"
 
     # 3. Ejecución
-    metrics = MetricsTracker()
+    # Tracker global: recoge tambien el consumo de tokens por etapa e idioma
+    metrics = metrics_tracker
     metrics.start()
     
     progress_bar = st.progress(0)
@@ -197,6 +232,7 @@ if generate_button:
         logger.info("="*60)
         logger.info("INICIANDO GENERACIÓN DESDE UI")
         
+        # Extractor y cache del LLM se pasan en cada llamada: los atributos de clase los comparten todas las sesiones
         if openai_client.mock_mode:
             st.warning("⚠️ Modo MOCK activado.")
             progress_bar.progress(50)
@@ -216,15 +252,17 @@ if generate_button:
             # Extracción
             status_text.text("Paso 2/5: Analizando...")
             progress_bar.progress(25)
-            [web_title, web_text, web_links] = scraping.Web.clean_text(web_content)
+            [web_title, web_text, web_links] = scraping.Web.clean_text(web_content, use_cache=use_cache,
+                                                                        extractor=extractor_name)
             detected_lang = detect_language(web_text)
             
             # Selección
             status_text.text("Paso 3/5: Seleccionando enlaces...")
             progress_bar.progress(40)
             start = time.time()
-            selector = link_selector.LinkSelector()
-            selected_links = selector.select_relevant_links(url, web_links, model=model_selector)
+            selector = link_selector.LinkSelector(response_cache=use_llm_cache)
+            selected_links = selector.select_relevant_links(url, web_links, model=model_selector,
+                                                           anchors=scraping.Web.extract_anchors(web_content))
             metrics.record_stage("Seleccion", time.time() - start)
             
             if not selected_links or not selected_links.get("links"):
@@ -235,53 +273,74 @@ if generate_button:
             status_text.text("Paso 4/5: Compilando contenido...")
             progress_bar.progress(60)
             start = time.time()
-            consolidated_content = compiler.compile_links(selected_links, delay=1.0, use_cache=use_cache)
+            consolidated_content = compiler.compile_links(selected_links, delay=1.0, use_cache=use_cache,
+                                                          extractor=extractor_name)
             metrics.record_stage("Compilacion", time.time() - start)
 
         if consolidated_content:
             # Generación
             status_text.text("Paso 5/6: Redactando...")
             progress_bar.progress(80)
-            start = time.time()
-            brochure_original = brochure.generate_brochure(
+            brochure_original, _ = render_stream(brochure.stream_brochure(
                 company_name=company_name,
                 compiled_content=consolidated_content,
                 tone=tone,
                 model=model_writer,
-                language=detected_lang
-            )
-            metrics.record_stage("Generacion", time.time() - start)
+                language=detected_lang,
+                response_cache=use_llm_cache
+            ))
 
-            # Traducción
-            target_lang_code = get_language_list()[selected_language]
-            brochure_translated = None
+            # Traducción (las etapas y su coste por idioma las registra el módulo brochure)
+            target_lang_codes = []
+            for language_name in selected_languages:
+                code = get_language_list()[language_name]
+                if code and code != detected_lang and code not in target_lang_codes:
+                    target_lang_codes.append(code)
+            translations = {}
             
-            if target_lang_code and target_lang_code != detected_lang:
+            if len(target_lang_codes) == 1:
                 status_text.text("Paso 6/6: Traduciendo...")
                 progress_bar.progress(90)
-                start = time.time()
-                brochure_translated = brochure.translate_brochure(
+                translations[target_lang_codes[0]], _ = render_stream(brochure.stream_translation(
                     brochure_text=brochure_original,
-                    target_language=target_lang_code,
-                    model=model_translator
-                )
-                metrics.record_stage("Traduccion", time.time() - start)
+                    target_language=target_lang_codes[0],
+                    model=model_translator,
+                    response_cache=use_llm_cache
+                ))
+            elif target_lang_codes:
+                status_text.text(f"Paso 6/6: Traduciendo a {len(target_lang_codes)} idiomas...")
+                progress_bar.progress(90)
+                start = time.time()
+                # Cada hilo hereda el contexto de la sesión: tokens, coste y presupuesto no se mezclan con otras
+                with ThreadPoolExecutor(max_workers=len(target_lang_codes)) as executor:
+                    futures = {
+                        code: executor.submit(contextvars.copy_context().run, brochure.translate_brochure,
+                                              brochure_original, code, model_translator, response_cache=use_llm_cache)
+                        for code in target_lang_codes
+                    }
+                    translations = {code: future.result() for code, future in futures.items()}
+                metrics.record_stage(f"Traducciones ({len(target_lang_codes)} idiomas)", time.time() - start)
             
             progress_bar.progress(100)
             status_text.success("✅ ¡Completado!")
             
-            # --- GENERACIÓN DE ARCHIVOS FÍSICOS
+            # --- GENERACIÓN DE ARCHIVOS FÍSICOS (en el hilo principal: Playwright no admite hilos)
             logger.info("Generando archivos físicos (PDF/HTML)...")
             
             paths_original = generate_export_files(
                 brochure_original, company_name, f"{detected_lang}_original", formats
             )
             
-            paths_translated = {}
-            if brochure_translated:
-                paths_translated = generate_export_files(
-                    brochure_translated, company_name, f"{target_lang_code}_translated", formats
-                )
+            translated_results = []
+            for code, content in translations.items():
+                if content:
+                    translated_results.append({
+                        'content': content,
+                        'lang': code,
+                        'files': generate_export_files(content, company_name, f"{code}_translated", formats)
+                    })
+
+            metrics.finish(report_path=get_outputs_path(f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_costs.json"))
 
             # --- GUARDADO EN SESSION STATE ---
             st.session_state['results'] = {
@@ -290,11 +349,7 @@ if generate_button:
                     'lang': detected_lang,
                     'files': paths_original
                 },
-                'translated': {
-                    'content': brochure_translated,
-                    'lang': target_lang_code,
-                    'files': paths_translated
-                } if brochure_translated else None,
+                'translations': translated_results,
                 'metrics': metrics.get_summary(),
                 'company_name': company_name
             }
@@ -314,8 +369,8 @@ if 'results' in st.session_state:
     
     # Etiquetas de pestañas
     tabs_labels = [f"📄 Original ({res['original']['lang']})"]
-    if res['translated']:
-        tabs_labels.append(f"🌍 Traducido ({res['translated']['lang']})")
+    for translated in res['translations']:
+        tabs_labels.append(f"🌍 Traducido ({translated['lang']})")
     tabs_labels.append("📊 Métricas")
     
     tabs = st.tabs(tabs_labels)
@@ -329,13 +384,13 @@ if 'results' in st.session_state:
             company_name=res['company_name']
         )
     
-    # Tab Traducido
-    if res['translated']:
-        with tabs[1]:
+    # Tabs Traducidos (uno por idioma)
+    for index, translated in enumerate(res['translations'], start=1):
+        with tabs[index]:
             render_brochure_tab(
-                content=res['translated']['content'], 
-                language_code=res['translated']['lang'], 
-                file_paths=res['translated']['files'],
+                content=translated['content'], 
+                language_code=translated['lang'], 
+                file_paths=translated['files'],
                 company_name=res['company_name']
             )
             
@@ -345,9 +400,22 @@ if 'results' in st.session_state:
         c1, c2 = st.columns(2)
         c1.metric("Tiempo Total", f"{summary['total_time']:.2f}s")
         c1.metric("Tokens Totales", summary['total_tokens'])
+        c1.metric("Coste Estimado", f"{summary['total_cost']:.4f} {summary['currency']}")
         c2.write("**Detalle por etapa:**")
         for stage, duration in summary['stages'].items():
-            c2.write(f"- {stage}: {duration:.2f}s")
+            if stage in summary['first_token']:
+                c2.write(f"- {stage}: {duration:.2f}s (primer token: {summary['first_token'][stage]:.2f}s)")
+            else:
+                c2.write(f"- {stage}: {duration:.2f}s")
+        if summary['stage_costs']:
+            c2.write("**Consumo por etapa:**")
+            for stage, entry in summary['stage_costs'].items():
+                c2.write(f"- {stage}: {entry['prompt_tokens']} de entrada ({entry['cached_tokens']} en cache), "
+                         f"{entry['completion_tokens']} de salida, {entry['cost']:.4f} {summary['currency']}")
+        if summary.get('llm_latency'):
+            c2.write("**Latencia del LLM:**")
+            for model, stats in summary['llm_latency'].items():
+                c2.write(f"- {model}: {stats['count']} peticiones, p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s")
 
 else:
     if not generate_button:
@@ -1,80 +1,377 @@
+import asyncio
 import os
 import sys
-from openai import OpenAI, APIError, APIConnectionError, RateLimitError, AuthenticationError
+from openai import OpenAI, AsyncOpenAI, APIError, APIConnectionError, RateLimitError, AuthenticationError
 from dotenv import load_dotenv
 from utils.utils import get_config_path
+from utils.cache_manager import CacheManager
 from utils.logger import logger
+from utils.prompt_registry import prompt_registry
 from utils.metrics import metrics_tracker
+from utils.rate_limiter import rate_limiter, estimate_tokens, get_retry_after, backoff_delay
 import time
 
+
+class StreamInterruptedError(RuntimeError):
+    # El flujo de respuesta no llego al final; partial conserva el texto ya entregado
+    def __init__(self, message, partial=""):
+        super().__init__(message)
+        self.partial = partial
+
+
+class LLMClientError(RuntimeError):
+    # Error irrecuperable del cliente asincrono (sys.exit no puede lanzarse dentro del event loop)
+    pass
+
+
 class OpenAIClient:
-    
-    def __init__(self):
+
+    # Cache de respuestas (opcional). None = tomar el valor de config/.env
+    response_cache = None
+    cache_max_temperature = None
+    cache_ttl_hours = None
+
+    # Endpoint compatible con OpenAI (p. ej. un servidor local de pruebas). None = tomar OPENAI_BASE_URL
+    base_url = None
+
+    max_attempts = 3
+
+    @classmethod
+    def configure_cache(cls, enabled=None, max_temperature=None, ttl_hours=None):
+        if enabled is not None:
+            cls.response_cache = enabled
+        if max_temperature is not None:
+            cls.cache_max_temperature = max_temperature
+        if ttl_hours is not None:
+            cls.cache_ttl_hours = ttl_hours
+
+    @classmethod
+    def configure_endpoint(cls, base_url=None):
+        if base_url:
+            cls.base_url = base_url
+
+    def __init__(self, response_cache=None):
+        # response_cache: cache de respuestas de este cliente (p. ej. la opcion de una sesion de la UI);
+        # None = el valor de la clase
+        if response_cache is not None:
+            self.response_cache = response_cache
+
         try:
             load_dotenv(get_config_path())
         except Exception as e:
             logger.error(f"Error al cargar el archivo .env: {e}")
             sys.exit(1)
-        
+
         self.api_key = os.environ.get("OPENAI_API_KEY")
         self.mock_mode = not self.api_key or self.api_key.strip() == ""
-        
+
+        if OpenAIClient.response_cache is None:
+            OpenAIClient.response_cache = os.environ.get("LLM_CACHE", "").lower() in ("1", "true", "yes")
+        if OpenAIClient.cache_max_temperature is None:
+            OpenAIClient.cache_max_temperature = float(os.environ.get("LLM_CACHE_MAX_TEMPERATURE", 0.7))
+        if OpenAIClient.cache_ttl_hours is None:
+            OpenAIClient.cache_ttl_hours = float(os.environ.get("LLM_CACHE_TTL_HOURS", 24 * 7))
+        if OpenAIClient.base_url is None:
+            OpenAIClient.base_url = os.environ.get("OPENAI_BASE_URL") or None
+
         if self.mock_mode:
             logger.info("\n*** MODO MOCK ACTIVADO (sin API key) ***\n")
             self.client = None
         else:
+            if OpenAIClient.base_url:
+                logger.info(f"Endpoint de OpenAI: {OpenAIClient.base_url}")
             try:
-                self.client = OpenAI(api_key=self.api_key, timeout=90.0)
+                self.client = self.create_client()
             except Exception as e:
                 logger.error(f"Error al inicializar el cliente de OpenAI: {e}")
                 sys.exit(1)
-    
-    def call_openai(self, messages, model="gpt-4o-mini", max_tokens=1000, temperature=0.7):
-        
-        for attempt in range(1,4):           
-            try:    
-                completion = self.client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=temperature
-                )            
-                response_text = completion.choices[0].message.content
-
-                metrics_tracker.add_tokens(
-                    model,
-                    completion.usage.prompt_tokens,
-                    completion.usage.completion_tokens
-                )
-                
-                return {
-                    "response": response_text,
-                    "model": completion.model,
-                    "tokens": {
-                        "total": completion.usage.total_tokens,
-                        "prompt": completion.usage.prompt_tokens,
-                        "completion": completion.usage.completion_tokens
-                    }
-                }
+
+    def create_client(self):
+        # Los reintentos los gestiona call_openai para respetar las cuotas compartidas
+        return OpenAI(api_key=self.api_key, base_url=OpenAIClient.base_url, timeout=90.0, max_retries=0)
+
+    def use_response_cache(self, temperature, force_cache=False):
+        # Con temperatura alta se espera variedad: solo se cachea si se fuerza
+        if not self.response_cache:
+            return False
+        return force_cache or temperature <= OpenAIClient.cache_max_temperature
+
+    def lookup_cache(self, messages, model, max_tokens, temperature, force_cache, response_format=None):
+        # Devuelve (clave, respuesta cacheada); clave None si la cache no aplica
+        if not self.use_response_cache(temperature, force_cache):
+            return None, None
+
+        cache_key = CacheManager.get_response_key(model, messages, temperature, max_tokens, prompt_registry.get_version(),
+                                                  response_format, endpoint=OpenAIClient.base_url)
+        cached = CacheManager.load_response(cache_key, OpenAIClient.cache_ttl_hours)
+        if cached is not None:
+            metrics_tracker.record_llm_cache(True, cached["tokens"]["total"], model=model)
+            CacheManager.record_lookup("response_hits")
+            CacheManager.record_lookup("response_tokens_saved", cached["tokens"]["total"])
+        else:
+            metrics_tracker.record_llm_cache(False, model=model)
+            CacheManager.record_lookup("response_misses")
+        return cache_key, cached
+
+    def reserve_call(self, messages, model, max_tokens):
+        # Cuota (tokens estimados) y presupuesto (coste maximo); el presupuesto puede cambiar el modelo
+        reserved_tokens = estimate_tokens(messages, max_tokens)
+        model, reserved_cost = metrics_tracker.authorize_llm_call(model, reserved_tokens - max_tokens, max_tokens)
+        return model, reserved_tokens, reserved_cost
+
+    def build_result(self, completion, model, cache_key, reserved_tokens, reserved_cost=0.0):
+        return self.record_result(completion.choices[0].message.content, completion.model, completion.usage,
+                                  completion.choices[0].finish_reason, model, cache_key, reserved_tokens, reserved_cost)
+
+    def record_result(self, response_text, response_model, usage, finish_reason, model, cache_key, reserved_tokens,
+                      reserved_cost=0.0):
+        rate_limiter.settle(model, reserved_tokens, usage.total_tokens)
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        cost = metrics_tracker.add_tokens(
+            model,
+            usage.prompt_tokens,
+            usage.completion_tokens,
+            cached_tokens=getattr(details, "cached_tokens", None) or 0
+        )
+        metrics_tracker.settle_llm_call(reserved_cost, cost)
+
+        result = {
+            "response": response_text,
+            "model": response_model,
+            "tokens": {
+                "total": usage.total_tokens,
+                "prompt": usage.prompt_tokens,
+                "completion": usage.completion_tokens
+            }
+        }
+
+        # Solo se guardan respuestas completas
+        if cache_key and response_text and finish_reason != "length":
+            CacheManager.save_response(cache_key, result, model=model)
+
+        return result
+
+    def handle_api_error(self, error, attempt, model, reserved_tokens, reserved_cost=0.0):
+        # Devuelve la espera antes del siguiente intento, o None si no quedan intentos
+        logger.warning(f"Intento {attempt}/{self.max_attempts} falló por error de API: {type(error).__name__}")
+        logger.warning(f"   Codigo: {error.status_code if hasattr(error, 'status_code') else 'N/A'}")
+        logger.warning(f"   Mensaje: {error}")
+
+        # La peticion fallida no consume tokens de la cuota ni presupuesto
+        rate_limiter.settle(model, reserved_tokens, 0)
+        metrics_tracker.settle_llm_call(reserved_cost)
+        retry_after = get_retry_after(error)
+        delay = backoff_delay(attempt, retry_after)
+
+        if isinstance(error, RateLimitError):
+            # Frenar a todas las llamadas al mismo modelo, no solo a esta
+            rate_limiter.penalize(model, delay)
+
+        if attempt < self.max_attempts:
+            logger.warning(f"   Reintentando en {delay:.1f}s" + (f" (Retry-After: {retry_after:.1f}s)" if retry_after is not None else ""))
+            return delay
+
+        logger.error("Todos los intentos fallaron debido a errores de API. Devolviendo fallo genérico.")
+        return None
+
+    @staticmethod
+    def get_request_options(response_format):
+        # response_format solo se envia si se pide, para no cambiar las peticiones de texto libre
+        return {"response_format": response_format} if response_format else {}
+
+    @staticmethod
+    def failed_result(model):
+        # failed marca el fallo: el modelo puede no ser el pedido si el presupuesto lo sustituyo
+        return {"response": "Error irrecuperable", "model": model, "tokens": {"total": 0, "prompt": 0, "completion": 0},
+                "failed": True}
+
+    def call_openai(self, messages, model="gpt-4o-mini", max_tokens=1000, temperature=0.7, force_cache=False,
+                    response_format=None):
+
+        cache_key, cached = self.lookup_cache(messages, model, max_tokens, temperature, force_cache, response_format)
+        if cached is not None:
+            return cached
+
+        for attempt in range(1, self.max_attempts + 1):
+            requested_model = model
+            model, reserved_tokens, reserved_cost = self.reserve_call(messages, model, max_tokens)
+            if model != requested_model:
+                # La respuesta del modelo sustituto no se guarda como si fuera la del pedido
+                cache_key = None
+            metrics_tracker.record_queue_wait(rate_limiter.acquire(model, reserved_tokens), model=model)
+            try:
+                with metrics_tracker.llm_request(model):
+                    completion = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        **self.get_request_options(response_format)
+                    )
+                return self.build_result(completion, model, cache_key, reserved_tokens, reserved_cost)
             except AuthenticationError as e:
                 logger.error(f"Error de autenticacion: API key invalida o incorrecta")
                 logger.error(f"   Detalles: {e}")
                 sys.exit(1)
 
             except (RateLimitError, APIConnectionError, APIError) as e:
-                logger.warning(f"Intento {attempt}/3 falló por error de API: {type(e).__name__}")
-                logger.warning(f"   Codigo: {e.status_code if hasattr(e, 'status_code') else 'N/A'}") 
-                logger.warning(f"   Mensaje: {e}")
-                
-                if attempt < 3:
-                    time.sleep(2) 
-                    continue
+                delay = self.handle_api_error(e, attempt, model, reserved_tokens, reserved_cost)
+                if delay is None:
+                    return self.failed_result(model)
+                time.sleep(delay)
+
+            except Exception as e:
+                logger.error(f"Error inesperado: {e}")
+                logger.error(f"   Tipo de error: {type(e).__name__}")
+                sys.exit(1)
+
+    def stream_openai(self, messages, model="gpt-4o-mini", max_tokens=1000, temperature=0.7, force_cache=False):
+        # Generador de fragmentos de texto a medida que llegan; misma cache, cuotas y reintentos que call_openai.
+        # Si el flujo no se completa lanza StreamInterruptedError en lugar de terminar como si estuviera entero
+        cache_key, cached = self.lookup_cache(messages, model, max_tokens, temperature, force_cache)
+        if cached is not None:
+            yield cached["response"]
+            return
+
+        for attempt in range(1, self.max_attempts + 1):
+            requested_model = model
+            model, reserved_tokens, reserved_cost = self.reserve_call(messages, model, max_tokens)
+            if model != requested_model:
+                cache_key = None
+            metrics_tracker.record_queue_wait(rate_limiter.acquire(model, reserved_tokens), model=model)
+            parts = []
+            try:
+                # La peticion dura hasta el ultimo fragmento del flujo
+                with metrics_tracker.llm_request(model):
+                    stream = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+
+                    usage = None
+                    finish_reason = None
+                    response_model = model
+                    for chunk in stream:
+                        response_model = getattr(chunk, "model", None) or response_model
+                        if getattr(chunk, "usage", None):
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        if chunk.choices[0].finish_reason:
+                            finish_reason = chunk.choices[0].finish_reason
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+
+                if usage is not None:
+                    self.record_result("".join(parts), response_model, usage, finish_reason, model, cache_key, reserved_tokens,
+                                       reserved_cost)
                 else:
-                    logger.error("Todos los intentos fallaron debido a errores de API. Devolviendo fallo genérico.")
-                    return {"response": "Error irrecuperable", "model": model, "tokens": {"total": 0, "prompt": 0, "completion": 0}}
-            
+                    # Sin usage no hay coste real: se da por gastado el maximo reservado
+                    metrics_tracker.settle_llm_call(reserved_cost, reserved_cost)
+                return
+            except AuthenticationError as e:
+                logger.error(f"Error de autenticacion: API key invalida o incorrecta")
+                logger.error(f"   Detalles: {e}")
+                sys.exit(1)
+
+            except (RateLimitError, APIConnectionError, APIError) as e:
+                if parts:
+                    # El texto ya entregado no puede retirarse: el llamante decide que hacer con el parcial
+                    message = f"El flujo de respuesta se interrumpio tras {len(parts)} fragmentos: {type(e).__name__}"
+                    logger.error(message)
+                    # Consumo aproximado: el prompt y un token por fragmento recibido; el coste, el maximo reservado
+                    rate_limiter.settle(model, reserved_tokens, reserved_tokens - max_tokens + len(parts))
+                    metrics_tracker.settle_llm_call(reserved_cost, reserved_cost)
+                    raise StreamInterruptedError(message, "".join(parts)) from e
+                delay = self.handle_api_error(e, attempt, model, reserved_tokens, reserved_cost)
+                if delay is None:
+                    raise StreamInterruptedError(f"Todos los intentos fallaron: {type(e).__name__}") from e
+                time.sleep(delay)
+
             except Exception as e:
                 logger.error(f"Error inesperado: {e}")
                 logger.error(f"   Tipo de error: {type(e).__name__}")
                 sys.exit(1)
-                
\ No newline at end of file
+
+
+class AsyncOpenAIClient(OpenAIClient):
+    """
+    Cliente asincrono con la misma interfaz y formato de respuesta que OpenAIClient.
+    Comparte con el cliente sincrono las cuotas RPM/TPM por modelo y la cache de
+    respuestas, y limita las peticiones en vuelo con un semaforo. Los errores
+    irrecuperables se lanzan como LLMClientError para que los gestione el llamante.
+    """
+
+    max_attempts = 5
+
+    def __init__(self, max_in_flight=8, response_cache=None):
+        self.max_in_flight = max_in_flight
+        self._semaphore = None
+        self._semaphore_loop = None
+        super().__init__(response_cache=response_cache)
+
+    def create_client(self):
+        return AsyncOpenAI(api_key=self.api_key, base_url=OpenAIClient.base_url, timeout=90.0, max_retries=0)
+
+    def get_semaphore(self):
+        # Las primitivas de asyncio pertenecen a un event loop: una por loop
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def call_openai(self, messages, model="gpt-4o-mini", max_tokens=1000, temperature=0.7, force_cache=False,
+                          response_format=None):
+
+        cache_key, cached = self.lookup_cache(messages, model, max_tokens, temperature, force_cache, response_format)
+        if cached is not None:
+            return cached
+
+        for attempt in range(1, self.max_attempts + 1):
+            queued_at = time.monotonic()
+            async with self.get_semaphore():
+                requested_model = model
+                model, reserved_tokens, reserved_cost = self.reserve_call(messages, model, max_tokens)
+                if model != requested_model:
+                    cache_key = None
+                await rate_limiter.acquire_async(model, reserved_tokens)
+                metrics_tracker.record_queue_wait(time.monotonic() - queued_at, model=model)
+                try:
+                    with metrics_tracker.llm_request(model):
+                        completion = await self.client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            **self.get_request_options(response_format)
+                        )
+                    return self.build_result(completion, model, cache_key, reserved_tokens, reserved_cost)
+                except AuthenticationError as e:
+                    rate_limiter.settle(model, reserved_tokens, 0)
+                    metrics_tracker.settle_llm_call(reserved_cost)
+                    logger.error(f"Error de autenticacion: API key invalida o incorrecta")
+                    logger.error(f"   Detalles: {e}")
+                    raise LLMClientError(f"Error de autenticacion: {e}") from e
+
+                except (RateLimitError, APIConnectionError, APIError) as e:
+                    delay = self.handle_api_error(e, attempt, model, reserved_tokens, reserved_cost)
+                    if delay is None:
+                        return self.failed_result(model)
+
+                except Exception as e:
+                    rate_limiter.settle(model, reserved_tokens, 0)
+                    metrics_tracker.settle_llm_call(reserved_cost)
+                    logger.error(f"Error inesperado: {e}")
+                    logger.error(f"   Tipo de error: {type(e).__name__}")
+                    raise LLMClientError(f"Error inesperado: {type(e).__name__}: {e}") from e
+
+            # Esperar fuera del semaforo para no ocupar un hueco en vuelo
+            await asyncio.sleep(delay)
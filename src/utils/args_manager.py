@@ -18,7 +18,7 @@ class ArgsManager:
                           help='URL del sitio web')
         parser.add_argument('--tone', type=str, choices=['formal', 'humoristico'], 
                           default='formal', help='Tono del folleto')
-        parser.add_argument('--language', type=str, default='', help = 'Idioma del folleto')
+        parser.add_argument('--language', type=str, nargs='+', default=[], help = 'Idiomas del folleto (uno o varios códigos)')
         parser.add_argument('--format', type=str, nargs='+', 
                     choices=['md', 'html', 'pdf'], 
                     default=['md'], 
@@ -28,6 +28,35 @@ class ArgsManager:
         parser.add_argument('--model_writer', type=str, default='gpt-4o-mini', help='Modelo para redacción del folleto (LLM 2)')
         parser.add_argument('--model_translator', type=str, default='gpt-4o-mini', help='Modelo para traducción (LLM 3)')
         
+        parser.add_argument('--compile_workers', type=int, default=4, help='Descargas simultaneas al compilar paginas')
+        parser.add_argument('--host_concurrency', type=int, default=1, help='Descargas simultaneas maximas contra un mismo host')
+        parser.add_argument('--delay', type=float, default=1.5, help='Espaciado minimo (segundos) entre peticiones a un mismo host')
+        parser.add_argument('--http_pool_size', type=int, default=8, help='Conexiones keep-alive maximas por host')
+        parser.add_argument('--http_timeout', type=float, default=30, help='Timeout de lectura HTTP (segundos)')
+        parser.add_argument('--browser_pages', type=int, default=2, help='Paginas de navegador dinamico simultaneas')
+        parser.add_argument('--extractor', type=str, choices=['bs4', 'lxml'], default='bs4', help='Motor de extraccion de texto HTML')
+        parser.add_argument('--streaming', action='store_true', help='Descargar las paginas por trozos y cortar al completar el texto necesario')
+        parser.add_argument('--browser_recycle', type=int, default=50, help='Navegaciones antes de reciclar el contexto del navegador')
+        parser.add_argument('--llm_cache', action='store_true', default=None, help='Reutilizar respuestas del LLM ya cacheadas (por defecto, LLM_CACHE en config/.env)')
+        parser.add_argument('--llm_cache_max_temp', type=float, default=None, help='Temperatura maxima de las llamadas que se cachean')
+        parser.add_argument('--translation_workers', type=int, default=4, help='Secciones del folleto traducidas en paralelo')
+        parser.add_argument('--stream', action='store_true', help='Mostrar el folleto y la traduccion segun los genera el modelo')
+        parser.add_argument('--llm_rpm', type=int, default=None, help='Peticiones por minuto permitidas por modelo (por defecto, cuota de la API)')
+        parser.add_argument('--llm_tpm', type=int, default=None, help='Tokens por minuto permitidos por modelo (por defecto, cuota de la API)')
+        parser.add_argument('--link_ranking', type=str, choices=['auto', 'llm', 'heuristic'], default='auto',
+                            help='Preseleccion local de enlaces: auto (omite el LLM si es clara), llm (siempre llama al LLM, solo con los mejores candidatos) o heuristic (sin LLM)')
+        parser.add_argument('--link_top_k', type=int, default=40, help='Enlaces candidatos que se envian al LLM tras la preseleccion')
+        parser.add_argument('--selection_cache_hours', type=float, default=24, help='Horas de validez de la seleccion de enlaces cacheada por dominio (0 = desactivada)')
+        parser.add_argument('--selection_overlap', type=float, default=0.8, help='Fraccion minima de enlaces ya evaluados para reutilizar en parte una seleccion previa')
+        parser.add_argument('--selection_output', type=str, choices=['structured', 'json'], default='structured', help='Formato de respuesta del LLM al seleccionar enlaces: salida estructurada con indices o JSON con URLs')
+        parser.add_argument('--openai_base_url', type=str, default=None, help='Endpoint compatible con OpenAI (por defecto, OPENAI_BASE_URL en config/.env o la API oficial)')
+        parser.add_argument('--max_run_cost', type=float, default=None, help='Gasto maximo de la ejecucion en el LLM (moneda de config/pricing.json)')
+        parser.add_argument('--budget_action', type=str, choices=['abort', 'downgrade'], default='abort', help='Al llegar al tope de gasto: abortar o pasar a un modelo mas barato')
+        parser.add_argument('--pricing_file', type=str, default=None, help='Tabla de precios por modelo (por defecto, config/pricing.json)')
+        parser.add_argument('--metrics_file', type=str, default=None, help='Fichero de metricas en formato Prometheus (por defecto, METRICS_FILE del entorno)')
+        parser.add_argument('--metrics_port', type=int, default=None, help='Puerto del endpoint /metrics de Prometheus (por defecto, METRICS_PORT del entorno)')
+        parser.add_argument('--max_prompt_tokens', type=int, default=12000, help='Tokens maximos de contenido web por llamada al LLM')
+        
         self._args = parser.parse_args()
         return self._args
     
@@ -0,0 +1,195 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from utils.http_client import USER_AGENT
+from utils.logger import logger
+
+
+class BrowserWorker:
+    """
+    Chromium de larga duracion atado a un hilo propio: la API sync de Playwright
+    solo puede usarse desde el hilo que la arranco, asi que todas las llamadas
+    se encolan en ese hilo.
+    """
+
+    def __init__(self, worker_id, max_navigations=50, settle_ms=3000):
+        self.worker_id = worker_id
+        self.max_navigations = max_navigations
+        self.settle_ms = settle_ms
+        self.navigations = 0
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.page = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"browser-{worker_id}")
+
+    def call(self, fn, *args):
+        return self._executor.submit(fn, *args).result()
+
+    def _ensure_ready(self):
+        if self.playwright is None:
+            self.playwright = sync_playwright().start()
+
+        # Health check: relanzar el navegador si se ha caido
+        if self.browser is None or not self.browser.is_connected():
+            if self.browser is not None:
+                logger.warning(f"Navegador {self.worker_id} desconectado, relanzando...")
+            self.browser = self.playwright.chromium.launch(headless=True)
+            self.context = None
+            self.page = None
+
+        if self.context is None:
+            self.context = self.browser.new_context(user_agent=USER_AGENT)
+            self.page = None
+
+        if self.page is None or self.page.is_closed():
+            self.page = self.context.new_page()
+
+    def _recycle(self):
+        # Cerrar el contexto libera la memoria acumulada por las navegaciones
+        try:
+            if self.context is not None:
+                self.context.close()
+        except Exception as e:
+            logger.warning(f"Error cerrando contexto del navegador {self.worker_id}: {e}")
+        self.context = None
+        self.page = None
+        self.navigations = 0
+
+    def _get_content(self, url, timeout):
+        self._ensure_ready()
+        try:
+            self.page.goto(url, timeout=timeout * 1000, wait_until="domcontentloaded")
+            # Esperar a que la red se calme en lugar de una pausa fija
+            try:
+                self.page.wait_for_load_state("networkidle", timeout=self.settle_ms)
+            except PlaywrightTimeoutError:
+                pass
+            return self.page.content()
+        except Exception:
+            # Una pagina rota no debe contaminar la siguiente navegacion
+            self._recycle()
+            raise
+        finally:
+            self.navigations += 1
+            if self.navigations >= self.max_navigations:
+                logger.info(f"Reciclando navegador {self.worker_id} tras {self.navigations} navegaciones")
+                self._recycle()
+
+    def get_content(self, url, timeout=30):
+        return self.call(self._get_content, url, timeout)
+
+    def _shutdown(self):
+        self._recycle()
+        try:
+            if self.browser is not None:
+                self.browser.close()
+            if self.playwright is not None:
+                self.playwright.stop()
+        except Exception as e:
+            logger.warning(f"Error cerrando navegador {self.worker_id}: {e}")
+        self.browser = None
+        self.playwright = None
+
+    def close(self):
+        self.call(self._shutdown)
+        self._executor.shutdown(wait=True)
+
+
+class PageLease:
+
+    def __init__(self, worker):
+        self._worker = worker
+
+    def get_content(self, url, timeout=30):
+        return self._worker.get_content(url, timeout)
+
+
+class BrowserPool:
+    """
+    Pool de navegadores reutilizables para el scraping dinamico. Los llamantes
+    alquilan una pagina con lease() y la devuelven al salir del bloque; como
+    maximo hay max_pages navegaciones simultaneas.
+    """
+
+    def __init__(self, max_pages=2, max_navigations=50, settle_ms=3000):
+        self.max_pages = max_pages
+        self.max_navigations = max_navigations
+        self.settle_ms = settle_ms
+        # Navegadores libres (el ultimo devuelto sale primero) y todos los del pool, bajo la misma condicion
+        self._idle = []
+        self._workers = []
+        self._available = threading.Condition()
+
+    def configure(self, max_pages=None, max_navigations=None, settle_ms=None):
+        self.close()
+        if max_pages is not None:
+            self.max_pages = max_pages
+        if max_navigations is not None:
+            self.max_navigations = max_navigations
+        if settle_ms is not None:
+            self.settle_ms = settle_ms
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._available:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._workers) < self.max_pages:
+                    worker = BrowserWorker(len(self._workers) + 1, self.max_navigations, self.settle_ms)
+                    self._workers.append(worker)
+                    return worker
+
+                # Todos los navegadores ocupados: esperar a que se devuelva uno o a que el pool se cierre
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._available.wait(remaining)
+
+    def _release(self, worker):
+        with self._available:
+            # Un navegador cerrado por close()/configure() mientras estaba alquilado no vuelve al pool
+            if worker in self._workers:
+                self._idle.append(worker)
+            self._available.notify()
+
+    @contextmanager
+    def lease(self, timeout=None):
+        worker = self._acquire(timeout)
+        try:
+            yield PageLease(worker)
+        finally:
+            self._release(worker)
+
+    def get_content(self, url, timeout=30):
+        with self.lease() as page:
+            return page.get_content(url, timeout)
+
+    def close(self):
+        with self._available:
+            workers = self._workers
+            self._workers = []
+            self._idle = []
+            self._available.notify_all()
+
+        # Un navegador en uso se cierra al terminar su navegacion: el cierre se encola en su hilo
+        for worker in workers:
+            try:
+                worker.close()
+            except Exception as e:
+                logger.warning(f"Error cerrando pool de navegadores: {e}")
+
+
+browser_pool = BrowserPool()
+
+# Cerrar antes de que el interprete apague los ThreadPoolExecutor: con atexit ya no admiten tareas
+# y Chromium quedaria sin cerrar
+if hasattr(threading, "_register_atexit"):
+    threading._register_atexit(browser_pool.close)
+else:
+    atexit.register(browser_pool.close)
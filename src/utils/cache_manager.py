@@ -1,65 +1,248 @@
+import glob
 import hashlib
+import json
 import os
-from datetime import datetime, timedelta
+import re
+import time
+from utils.cache_store import CacheStore
 from utils.utils import get_data_path
 from utils.logger import logger
+from utils.metrics import metrics_registry
 
 class CacheManager:
     
+    _store = None
+    
+    @classmethod
+    def get_store(cls):
+        if cls._store is None:
+            max_mb = float(os.environ.get("CACHE_MAX_MB", 512))
+            ttl_hours = float(os.environ.get("CACHE_TTL_HOURS", 24 * 30))
+            cls._store = CacheStore(get_data_path("cache.sqlite3"), max_bytes=int(max_mb * 1024 * 1024), ttl_hours=ttl_hours)
+        return cls._store
+    
+    @staticmethod
+    def get_cache_key(url):
+        return hashlib.md5(url.encode()).hexdigest()
+    
     @staticmethod
     def get_cache_filename(url):
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-        return f"{url_hash}.html"
+        # Nombre del formato antiguo de un archivo por URL (se conserva para migrar)
+        return f"{CacheManager.get_cache_key(url)}.html"
+    
+    @staticmethod
+    def parse_validators(headers):
+        # Validadores HTTP que permiten revalidar la entrada sin descargar el cuerpo
+        validators = {}
+        
+        if headers.get("ETag"):
+            validators["etag"] = headers["ETag"]
+        if headers.get("Last-Modified"):
+            validators["last_modified"] = headers["Last-Modified"]
+        
+        cache_control = headers.get("Cache-Control", "").lower()
+        match_max_age = re.search(r"max-age=(\d+)", cache_control)
+        if match_max_age:
+            validators["max_age"] = int(match_max_age.group(1))
+        if "no-cache" in cache_control:
+            validators["no_cache"] = True
+        
+        return validators
+    
+    @staticmethod
+    def _get_info(url):
+        try:
+            return CacheManager.get_store().get_info(CacheManager.get_cache_key(url))
+        except Exception as e:
+            logger.error(f"Error leyendo cache: {e}")
+            return None
+    
+    @staticmethod
+    def load_validators(url):
+        info = CacheManager._get_info(url)
+        return info["meta"] if info else {}
+    
+    @staticmethod
+    def has_validators(url):
+        validators = CacheManager.load_validators(url)
+        return bool(validators.get("etag") or validators.get("last_modified"))
     
     @staticmethod
     def is_cache_valid(url, max_age_hours=12):
-        cache_file = get_data_path(CacheManager.get_cache_filename(url))
+        info = CacheManager._get_info(url)
         
-        if not os.path.exists(cache_file):
+        if info is None:
             return False
         
-        file_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-        age = datetime.now() - file_time
+        validators = info["meta"]
+        if validators.get("no_cache"):
+            return False
         
-        return age < timedelta(hours=max_age_hours)
+        # Si el servidor indico un max-age menor, manda sobre el nuestro
+        max_age = max_age_hours * 3600
+        if "max_age" in validators:
+            max_age = min(max_age, validators["max_age"])
+        
+        return time.time() - info["stored_at"] < max_age
     
     @staticmethod
     def load_from_cache(url):
-        cache_file = get_data_path(CacheManager.get_cache_filename(url))
+        try:
+            entry = CacheManager.get_store().get(CacheManager.get_cache_key(url))
+            if entry:
+                return entry["content"]
+        except Exception as e:
+            logger.error(f"Error leyendo cache: {e}")
         
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return f.read()
-            except Exception as e:
-                logger.error(f"Error leyendo cache: {e}")
+        return None
+    
+    @staticmethod
+    def save_to_cache(url, html_content, validators=None):
+        try:
+            CacheManager.get_store().put(CacheManager.get_cache_key(url), html_content, url=url, meta=validators)
+        except Exception as e:
+            logger.error(f"Error guardando en cache: {e}")
+    
+    @staticmethod
+    def refresh_cache(url, validators=None):
+        # Respuesta 304: el contenido sigue vigente, solo se renueva su edad
+        try:
+            CacheManager.get_store().refresh(CacheManager.get_cache_key(url), validators)
+        except Exception as e:
+            logger.error(f"Error renovando cache: {e}")
+    
+    @staticmethod
+    def get_content_hash(html_content):
+        return hashlib.sha1(html_content.encode("utf-8", errors="replace")).hexdigest()
+    
+    @staticmethod
+    def load_parsed(content_hash, extractor_version):
+        # Segunda capa: resultado de clean_text para un HTML y una version del extractor
+        try:
+            store = CacheManager.get_store()
+            parsed = store.get_parsed(f"{content_hash}:{extractor_version}")
+            store.incr("parsed_hits" if parsed is not None else "parsed_misses")
+            return parsed
+        except Exception as e:
+            logger.error(f"Error leyendo contenido extraido de la cache: {e}")
+            return None
+    
+    @staticmethod
+    def save_parsed(content_hash, extractor_version, parsed):
+        try:
+            CacheManager.get_store().put_parsed(f"{content_hash}:{extractor_version}", parsed)
+        except Exception as e:
+            logger.error(f"Error guardando contenido extraido en cache: {e}")
+    
+    @staticmethod
+    def get_response_key(model, messages, temperature, max_tokens, prompts_version="", response_format=None, endpoint=None):
+        # Clave por contenido: cualquier cambio en modelo, mensajes, prompts o formato de salida invalida la entrada.
+        # Un endpoint distinto del de OpenAI (p. ej. el servidor local de pruebas) tiene sus propias entradas
+        request = {"model": model, "messages": messages, "temperature": temperature,
+                   "max_tokens": max_tokens, "prompts": prompts_version}
+        if response_format:
+            request["response_format"] = response_format
+        if endpoint:
+            request["endpoint"] = endpoint.rstrip("/")
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def load_response(key, max_age_hours=24 * 7):
+        try:
+            entry = CacheManager.get_store().get_response(key)
+            if entry and (not max_age_hours or time.time() - entry["stored_at"] < max_age_hours * 3600):
+                return entry["value"]
+        except Exception as e:
+            logger.error(f"Error leyendo respuesta del LLM de la cache: {e}")
         
         return None
     
     @staticmethod
-    def save_to_cache(url, html_content):
-        cache_file = get_data_path(CacheManager.get_cache_filename(url))
+    def save_response(key, value, model=None):
+        try:
+            CacheManager.get_store().put_response(key, value, model=model)
+        except Exception as e:
+            logger.error(f"Error guardando respuesta del LLM en cache: {e}")
+    
+    @staticmethod
+    def get_selection_key(domain, model, prompts_version="", endpoint=None):
+        # Una entrada por dominio, modelo, version de prompts y endpoint; el conjunto de enlaces va dentro
+        key = f"{domain}|{model}|{prompts_version}"
+        if endpoint:
+            key += f"|{endpoint.rstrip('/')}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def load_selection(key, max_age_hours=24):
+        try:
+            entry = CacheManager.get_store().get_selection(key)
+            if entry and (not max_age_hours or time.time() - entry["stored_at"] < max_age_hours * 3600):
+                return entry["value"]
+        except Exception as e:
+            logger.error(f"Error leyendo seleccion de enlaces de la cache: {e}")
         
+        return None
+    
+    @staticmethod
+    def save_selection(key, value, domain=None, model=None):
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            CacheManager.get_store().put_selection(key, value, domain=domain, model=model)
         except Exception as e:
-            logger.error(f"Error guardando en cache: {e}")
+            logger.error(f"Error guardando seleccion de enlaces en cache: {e}")
+    
+    @staticmethod
+    def record_lookup(result, amount=1):
+        # result: "hits", "revalidated", "misses" o un contador "response_*" / "selection_*"
+        metrics_registry.inc("brochure_cache_events_total", amount, event=result)
+        try:
+            CacheManager.get_store().incr(result, amount)
+        except Exception as e:
+            logger.debug(f"No se pudo registrar la estadistica de cache: {e}")
     
     @staticmethod
     def get_cache_age(url):
-        cache_file = get_data_path(CacheManager.get_cache_filename(url))
+        info = CacheManager._get_info(url)
         
-        if not os.path.exists(cache_file):
+        if info is None:
             return None
         
-        file_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-        age = datetime.now() - file_time
+        age = time.time() - info["stored_at"]
         
-        hours = int(age.total_seconds() / 3600)
-        minutes = int((age.total_seconds() % 3600) / 60)
+        hours = int(age / 3600)
+        minutes = int((age % 3600) / 60)
         
         return f"{hours}h {minutes}m"
+    
+    @staticmethod
+    def migrate_legacy_files(remove=True):
+        # Importa los <md5>.html del formato anterior conservando su antiguedad
+        migrated = 0
+        store = CacheManager.get_store()
+        
+        for html_file in glob.glob(get_data_path("*.html")):
+            key = os.path.basename(html_file)[:-len(".html")]
+            meta_file = get_data_path(f"{key}.meta.json")
+            
+            try:
+                with open(html_file, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                meta = {}
+                if os.path.exists(meta_file):
+                    with open(meta_file, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                
+                store.put(key, content, meta=meta, stored_at=os.path.getmtime(html_file))
+                migrated += 1
+                
+                if remove:
+                    os.remove(html_file)
+                    if os.path.exists(meta_file):
+                        os.remove(meta_file)
+            except Exception as e:
+                logger.error(f"Error migrando {html_file}: {e}")
+        
+        return migrated
 
 
 cache_manager = CacheManager()
\ No newline at end of file
@@ -0,0 +1,305 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from utils.logger import logger
+
+
+class CacheStore:
+    """
+    Almacen de la cache de paginas en SQLite (modo WAL). Cada pagina se guarda
+    comprimida con zlib junto a sus metadatos, el texto extraido de ella en una
+    segunda tabla, las respuestas del LLM en una tercera y las selecciones de
+    enlaces por dominio en una cuarta; el tamano total se acota con un
+    presupuesto de bytes (expulsion LRU) y un TTL. Las escrituras son
+    transacciones atomicas, seguras entre hilos y entre procesos.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            key TEXT PRIMARY KEY,
+            url TEXT,
+            body BLOB NOT NULL,
+            meta TEXT,
+            size INTEGER NOT NULL,
+            raw_size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages(accessed_at);
+        CREATE TABLE IF NOT EXISTS parsed (
+            key TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_parsed_accessed ON parsed(accessed_at);
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+        CREATE TABLE IF NOT EXISTS selections (
+            key TEXT PRIMARY KEY,
+            domain TEXT,
+            model TEXT,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_selections_accessed ON selections(accessed_at);
+        CREATE TABLE IF NOT EXISTS stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, db_path, max_bytes=512 * 1024 * 1024, ttl_hours=24 * 30, compression_level=6):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_hours = ttl_hours
+        self.compression_level = compression_level
+        self._local = threading.local()
+
+    def connection(self):
+        # sqlite3 no comparte conexiones entre hilos: una por hilo
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, statements):
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key):
+        row = self.connection().execute(
+            "SELECT body, meta, stored_at FROM pages WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        body, meta, stored_at = row
+        self.connection().execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return {
+            "content": zlib.decompress(body).decode("utf-8"),
+            "meta": json.loads(meta) if meta else {},
+            "stored_at": stored_at
+        }
+
+    def get_info(self, key):
+        # Metadatos sin descomprimir el cuerpo
+        row = self.connection().execute(
+            "SELECT meta, stored_at FROM pages WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        return {"meta": json.loads(row[0]) if row[0] else {}, "stored_at": row[1]}
+
+    def put(self, key, content, url=None, meta=None, stored_at=None):
+        raw = content.encode("utf-8")
+        body = zlib.compress(raw, self.compression_level)
+        now = time.time()
+
+        self._transaction([(
+            "INSERT OR REPLACE INTO pages (key, url, body, meta, size, raw_size, stored_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, url, body, json.dumps(meta or {}), len(body), len(raw), stored_at or now, now)
+        )])
+        self.evict()
+
+    def get_parsed(self, key):
+        row = self.connection().execute("SELECT data FROM parsed WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        self.connection().execute("UPDATE parsed SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put_parsed(self, key, value):
+        data = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), self.compression_level)
+
+        self._transaction([(
+            "INSERT OR REPLACE INTO parsed (key, data, size, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, data, len(data), time.time())
+        )])
+        self.evict()
+
+    def get_response(self, key):
+        row = self.connection().execute(
+            "SELECT data, stored_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        self.connection().execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return {"value": json.loads(zlib.decompress(row[0]).decode("utf-8")), "stored_at": row[1]}
+
+    def put_response(self, key, value, model=None):
+        data = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), self.compression_level)
+        now = time.time()
+
+        self._transaction([(
+            "INSERT OR REPLACE INTO responses (key, model, data, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, data, len(data), now, now)
+        )])
+        self.evict()
+
+    def get_selection(self, key):
+        row = self.connection().execute(
+            "SELECT data, stored_at FROM selections WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        self.connection().execute("UPDATE selections SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return {"value": json.loads(zlib.decompress(row[0]).decode("utf-8")), "stored_at": row[1]}
+
+    def put_selection(self, key, value, domain=None, model=None):
+        data = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), self.compression_level)
+        now = time.time()
+
+        self._transaction([(
+            "INSERT OR REPLACE INTO selections (key, domain, model, data, size, stored_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, domain, model, data, len(data), now, now)
+        )])
+        self.evict()
+
+    def refresh(self, key, meta=None):
+        now = time.time()
+        if meta is None:
+            self._transaction([("UPDATE pages SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))])
+        else:
+            self._transaction([(
+                "UPDATE pages SET stored_at = ?, accessed_at = ?, meta = ? WHERE key = ?",
+                (now, now, json.dumps(meta), key)
+            )])
+
+    def delete(self, key):
+        self._transaction([("DELETE FROM pages WHERE key = ?", (key,))])
+
+    def evict(self):
+        conn = self.connection()
+        removed = 0
+
+        if self.ttl_hours:
+            cutoff = time.time() - self.ttl_hours * 3600
+            removed += conn.execute("DELETE FROM pages WHERE stored_at < ?", (cutoff,)).rowcount
+            removed += conn.execute("DELETE FROM parsed WHERE accessed_at < ?", (cutoff,)).rowcount
+            removed += conn.execute("DELETE FROM responses WHERE stored_at < ?", (cutoff,)).rowcount
+            removed += conn.execute("DELETE FROM selections WHERE stored_at < ?", (cutoff,)).rowcount
+
+        # Todas las tablas comparten el mismo presupuesto de bytes
+        total = conn.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM pages) + (SELECT COALESCE(SUM(size), 0) FROM parsed) "
+            "+ (SELECT COALESCE(SUM(size), 0) FROM responses) + (SELECT COALESCE(SUM(size), 0) FROM selections)"
+        ).fetchone()[0]
+        if self.max_bytes and total > self.max_bytes:
+            # Expulsar las entradas menos usadas hasta volver al presupuesto
+            rows = conn.execute(
+                "SELECT 'pages', key, size, accessed_at FROM pages "
+                "UNION ALL SELECT 'parsed', key, size, accessed_at FROM parsed "
+                "UNION ALL SELECT 'responses', key, size, accessed_at FROM responses "
+                "UNION ALL SELECT 'selections', key, size, accessed_at FROM selections "
+                "ORDER BY accessed_at ASC"
+            ).fetchall()
+            victims = {"pages": [], "parsed": [], "responses": [], "selections": []}
+            for table, key, size, _ in rows:
+                if total <= self.max_bytes:
+                    break
+                victims[table].append((key,))
+                total -= size
+            conn.executemany("DELETE FROM pages WHERE key = ?", victims["pages"])
+            conn.executemany("DELETE FROM parsed WHERE key = ?", victims["parsed"])
+            conn.executemany("DELETE FROM responses WHERE key = ?", victims["responses"])
+            conn.executemany("DELETE FROM selections WHERE key = ?", victims["selections"])
+            removed += sum(len(keys) for keys in victims.values())
+
+        if removed:
+            logger.debug(f"Cache: {removed} entradas expulsadas")
+        return removed
+
+    def incr(self, name, amount=1):
+        self.connection().execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def stats(self):
+        conn = self.connection()
+        entries, size, raw_size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM pages"
+        ).fetchone()
+        parsed_entries, parsed_size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parsed"
+        ).fetchone()
+        response_entries, response_size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        selection_entries = conn.execute("SELECT COUNT(*) FROM selections").fetchone()[0]
+        counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+
+        hits = counters.get("hits", 0) + counters.get("revalidated", 0)
+        lookups = hits + counters.get("misses", 0)
+
+        return {
+            "entries": entries,
+            "bytes": size,
+            "raw_bytes": raw_size,
+            "parsed_entries": parsed_entries,
+            "parsed_bytes": parsed_size,
+            "parsed_hits": counters.get("parsed_hits", 0),
+            "parsed_misses": counters.get("parsed_misses", 0),
+            "response_entries": response_entries,
+            "response_bytes": response_size,
+            "response_hits": counters.get("response_hits", 0),
+            "response_misses": counters.get("response_misses", 0),
+            "response_tokens_saved": counters.get("response_tokens_saved", 0),
+            "selection_entries": selection_entries,
+            "selection_hits": counters.get("selection_hits", 0),
+            "selection_partial": counters.get("selection_partial", 0),
+            "selection_misses": counters.get("selection_misses", 0),
+            "max_bytes": self.max_bytes,
+            "hits": counters.get("hits", 0),
+            "revalidated": counters.get("revalidated", 0),
+            "misses": counters.get("misses", 0),
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        self._transaction([("DELETE FROM pages", ()), ("DELETE FROM parsed", ()), ("DELETE FROM responses", ()),
+                           ("DELETE FROM selections", ()),
+                           ("DELETE FROM stats", ())])
+        self.connection().execute("VACUUM")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
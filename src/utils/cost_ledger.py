@@ -0,0 +1,192 @@
+import json
+import multiprocessing
+import os
+import re
+import threading
+from utils.logger import logger
+from utils.utils import get_config_path
+
+# Precios (USD por millon de tokens) si no existe config/pricing.json
+DEFAULT_PRICING = {
+    "currency": "USD",
+    "unit_tokens": 1000000,
+    "models": {
+        "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.6},
+        "gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10.0},
+        "gpt-4.1-nano": {"input": 0.1, "cached_input": 0.025, "output": 0.4},
+        "gpt-4.1-mini": {"input": 0.4, "cached_input": 0.1, "output": 1.6},
+        "gpt-4.1": {"input": 2.0, "cached_input": 0.5, "output": 8.0},
+        "gpt-4-turbo": {"input": 10.0, "output": 30.0},
+        "gpt-4": {"input": 30.0, "output": 60.0},
+        "gpt-3.5-turbo": {"input": 0.5, "output": 1.5}
+    },
+    "downgrade": {
+        "gpt-4": "gpt-4o",
+        "gpt-4-turbo": "gpt-4o",
+        "gpt-4o": "gpt-4o-mini",
+        "gpt-4.1": "gpt-4.1-mini",
+        "gpt-4.1-mini": "gpt-4.1-nano",
+        "gpt-3.5-turbo": "gpt-4o-mini"
+    }
+}
+
+# Sufijos de version de un mismo modelo ("-2024-07-18", "-0613", "-preview"): comparten precio
+SNAPSHOT_SUFFIX = re.compile(r"-(\d{4}(-\d{2}-\d{2})?|preview)$")
+
+BUDGET_ACTIONS = ("abort", "downgrade")
+
+
+class BudgetExceededError(RuntimeError):
+    pass
+
+
+class CostLedger:
+    """
+    Tabla de precios por modelo y topes de gasto. Antes de cada llamada al LLM se
+    reserva su coste maximo (prompt estimado + max_tokens de salida); si no cabe
+    en el tope de la ejecucion o del lote, la llamada se aborta o se repite con
+    un modelo mas barato. Al terminar, la reserva se sustituye por el coste real.
+    """
+
+    def __init__(self, pricing_path=None):
+        self.pricing_path = pricing_path
+        self.max_run_cost = None
+        self.max_batch_cost = None
+        self.action = "abort"
+        self._pricing = None
+        self._batch_spend = None
+        self._lock = threading.Lock()
+        self._warned = set()
+
+    def configure(self, pricing_path=None, max_run_cost=None, max_batch_cost=None, action=None, batch_spend=None):
+        # batch_spend: multiprocessing.Value compartido por los procesos de un lote
+        if pricing_path:
+            self.pricing_path = pricing_path
+            self._pricing = None
+        if max_run_cost is not None:
+            self.max_run_cost = max_run_cost or None
+        if max_batch_cost is not None:
+            self.max_batch_cost = max_batch_cost or None
+        if action:
+            if action not in BUDGET_ACTIONS:
+                raise ValueError(f"Accion de presupuesto desconocida: {action}")
+            self.action = action
+        if batch_spend is not None:
+            self._batch_spend = batch_spend
+
+    def get_pricing(self):
+        if self._pricing is None:
+            path = self.pricing_path or get_config_path("pricing.json")
+            pricing = DEFAULT_PRICING
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        pricing = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"No se pudo leer la tabla de precios {path}: {e}. Se usan los precios por defecto")
+            self._pricing = {
+                "currency": pricing.get("currency", "USD"),
+                "unit_tokens": pricing.get("unit_tokens", 1000000),
+                "models": pricing.get("models", {}),
+                "downgrade": pricing.get("downgrade", {})
+            }
+        return self._pricing
+
+    @property
+    def currency(self):
+        return self.get_pricing()["currency"]
+
+    def get_price(self, model):
+        # Nombre exacto o una version fechada del modelo ("gpt-4o-mini-2024-07-18" -> "gpt-4o-mini").
+        # Otro modelo con el mismo prefijo ("gpt-4.1" frente a "gpt-4") no hereda su precio
+        models = self.get_pricing()["models"]
+        if model in models:
+            return models[model]
+        matches = [name for name in models if model and model.startswith(name) and SNAPSHOT_SUFFIX.fullmatch(model[len(name):])]
+        if matches:
+            return models[max(matches, key=len)]
+        if model not in self._warned:
+            self._warned.add(model)
+            logger.warning(f"Modelo sin precio en la tabla: {model}. Su coste se contabiliza como 0")
+        return None
+
+    def cost(self, model, prompt_tokens, completion_tokens, cached_tokens=0):
+        price = self.get_price(model)
+        if price is None:
+            return 0.0
+        cached = min(cached_tokens or 0, prompt_tokens)
+        # Los tokens de entrada servidos desde la cache de prompts de OpenAI tienen su propio precio
+        total = ((prompt_tokens - cached) * price["input"]
+                 + cached * price.get("cached_input", price["input"])
+                 + completion_tokens * price["output"])
+        return total / self.get_pricing()["unit_tokens"]
+
+    @property
+    def enabled(self):
+        return bool(self.max_run_cost or self.max_batch_cost)
+
+    def get_batch_spend(self):
+        # Gasto comprometido del lote (real + reservas en curso); local si no se comparte entre procesos
+        with self._lock:
+            if self._batch_spend is None:
+                self._batch_spend = multiprocessing.Value("d", 0.0)
+        return self._batch_spend
+
+    def reserve(self, estimate, run_spent):
+        if self.max_run_cost and run_spent + estimate > self.max_run_cost:
+            return False
+        if self.max_batch_cost:
+            spend = self.get_batch_spend()
+            with spend.get_lock():
+                if spend.value + estimate > self.max_batch_cost:
+                    return False
+                spend.value += estimate
+        return True
+
+    def authorize(self, model, prompt_tokens, max_tokens, run_spent=0.0):
+        # Devuelve (modelo a usar, coste reservado); BudgetExceededError si ningun modelo cabe
+        if not self.enabled:
+            return model, 0.0
+
+        candidate = model
+        tried = []
+        while candidate and candidate not in tried:
+            tried.append(candidate)
+            estimate = self.cost(candidate, prompt_tokens, max_tokens)
+            if self.reserve(estimate, run_spent):
+                if candidate != model:
+                    logger.warning(f"Presupuesto: {model} sustituido por {candidate} (coste maximo {estimate:.6f} {self.currency})")
+                return candidate, estimate
+            if self.action != "downgrade":
+                break
+            candidate = self.get_pricing()["downgrade"].get(candidate)
+
+        raise BudgetExceededError(
+            f"La llamada a {model} superaria el presupuesto (ejecucion: {run_spent:.4f}/{self.max_run_cost or '-'}, "
+            f"lote: {self.get_batch_spent():.4f}/{self.max_batch_cost or '-'} {self.currency}; probados: {', '.join(tried)})"
+        )
+
+    def settle(self, reserved, actual):
+        # Sustituye la reserva por el coste real en el contador del lote
+        if not self.max_batch_cost or (not reserved and not actual):
+            return
+        spend = self.get_batch_spend()
+        with spend.get_lock():
+            spend.value += actual - reserved
+
+    def get_batch_spent(self):
+        if self._batch_spend is None:
+            return 0.0
+        return self._batch_spend.value
+
+    def get_budget(self):
+        return {
+            "currency": self.currency,
+            "max_run_cost": self.max_run_cost,
+            "max_batch_cost": self.max_batch_cost,
+            "action": self.action,
+            "batch_spent": self.get_batch_spent()
+        }
+
+
+cost_ledger = CostLedger()
@@ -0,0 +1,48 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class HostScheduler:
+    """
+    Planificador de cortesia por host: limita las descargas simultaneas contra
+    un mismo dominio y garantiza un espaciado minimo entre peticiones sucesivas.
+    Hosts distintos no se bloquean entre si.
+    """
+
+    def __init__(self, per_host_concurrency=1, min_interval=1.5):
+        self.per_host_concurrency = max(1, int(per_host_concurrency))
+        self.min_interval = max(0.0, float(min_interval))
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+
+    @staticmethod
+    def get_host(url):
+        return urlparse(url).netloc.lower()
+
+    def _get_semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host_concurrency)
+            return self._semaphores[host]
+
+    def _wait_turn(self, host):
+        # Reservar el siguiente hueco libre del host dentro del lock y dormir fuera de el
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + self.min_interval
+
+        wait = start - now
+        if wait > 0:
+            time.sleep(wait)
+
+    @contextmanager
+    def slot(self, url):
+        host = self.get_host(url)
+        semaphore = self._get_semaphore(host)
+        with semaphore:
+            self._wait_turn(host)
+            yield
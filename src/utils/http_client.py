@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import requests
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.logger import logger
+
+USER_AGENT = "BrochureBot/1.0 (Educational Project)"
+
+# Solo anunciamos brotli si urllib3 puede descomprimirlo
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+
+class HttpClient:
+    """
+    Transporte HTTP compartido por scraping, robots.txt y la revalidacion de la cache.
+    Mantiene un pool de conexiones keep-alive por host para que las paginas de un mismo
+    dominio reutilicen conexiones TCP/TLS ya abiertas.
+    """
+
+    def __init__(self, pool_connections=20, pool_maxsize=8, connect_timeout=10, read_timeout=30, max_retries=2):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        # pool_block=True acota el numero de conexiones por host aunque haya mas hilos
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+            pool_block=True
+        )
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Connection": "keep-alive"
+        })
+        logger.debug(f"Sesion HTTP creada (pool={self.pool_connections}x{self.pool_maxsize}, encoding={ACCEPT_ENCODING})")
+        return session
+
+    def configure(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name) or name.startswith("_"):
+                raise AttributeError(f"Parametro HTTP desconocido: {name}")
+            setattr(self, name, value)
+        # La siguiente peticion reconstruye la sesion con los nuevos valores
+        self.close()
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        return self.session.get(url, headers=headers, stream=stream, timeout=timeout or self.timeout)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class AsyncHttpClient:
+    """
+    Variante asincrona que comparte el pool y los limites del cliente sincrono: cada
+    peticion se ejecuta en un hilo sobre la misma sesion, con un maximo de peticiones
+    en vuelo y, por host, no mas que las conexiones que admite el pool (pool_maxsize).
+    """
+
+    def __init__(self, client=None, max_in_flight=16):
+        self.client = client or http_client
+        self.max_in_flight = max_in_flight
+        self._loop = None
+        self._semaphore = None
+        self._host_semaphores = {}
+
+    def _get_semaphores(self, host):
+        # Las primitivas de asyncio pertenecen a un event loop: se recrean al cambiar de loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._host_semaphores = {}
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.client.pool_maxsize)
+        return self._semaphore, self._host_semaphores[host]
+
+    async def get(self, url, headers=None, timeout=None):
+        # Sin esperar en el loop, los hilos quedarian bloqueados en el pool (pool_block=True)
+        semaphore, host_semaphore = self._get_semaphores(urlparse(url).netloc)
+        async with semaphore, host_semaphore:
+            return await asyncio.to_thread(self._get_loaded, url, headers, timeout)
+
+    def _get_loaded(self, url, headers, timeout):
+        response = self.client.get(url, headers=headers, timeout=timeout)
+        # Leer el cuerpo dentro del hilo para no bloquear el event loop
+        response.content
+        return response
+
+
+http_client = HttpClient()
@@ -1,72 +1,589 @@
+import contextvars
+import json
+import os
+import threading
 import time
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from utils.cost_ledger import cost_ledger
 from utils.logger import logger
 
+# Etapa a la que se imputan los tokens de las llamadas al LLM en curso (por hilo/tarea)
+_llm_stage = contextvars.ContextVar("llm_stage", default=None)
+
+# Limites (segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Muestras recientes por serie para calcular percentiles sin crecer sin limite
+MAX_SAMPLES = 1000
+
+METRIC_HELP = {
+    "brochure_runs_total": "Ejecuciones del pipeline iniciadas",
+    "brochure_run_seconds": "Duracion de cada ejecucion del pipeline",
+    "brochure_stage_seconds": "Duracion de cada etapa del pipeline",
+    "brochure_first_token_seconds": "Tiempo hasta el primer token en las etapas con streaming",
+    "brochure_llm_request_seconds": "Duracion de cada peticion a la API del LLM",
+    "brochure_llm_in_flight": "Peticiones al LLM en curso",
+    "brochure_llm_queue_wait_seconds": "Espera de las llamadas al LLM por cuotas RPM/TPM o huecos en vuelo",
+    "brochure_llm_tokens_total": "Tokens consumidos por el LLM",
+    "brochure_llm_cost_total": "Coste estimado de las llamadas al LLM",
+    "brochure_llm_cache_total": "Consultas a la cache de respuestas del LLM",
+    "brochure_http_request_seconds": "Duracion de las descargas HTTP por host",
+    "brochure_cache_events_total": "Eventos de la cache persistente (paginas, respuestas y selecciones)"
+}
+
+
+def percentile(values, q):
+    # Percentil con interpolacion lineal (q entre 0 y 100)
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def describe(values):
+    # Resumen de una lista de duraciones: numero, total, percentiles y maximo
+    return {
+        "count": len(values),
+        "total": sum(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None
+    }
+
+
+class Histogram:
+    """
+    Histograma acumulativo con los cubos de Prometheus y una ventana de
+    muestras recientes para los percentiles.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=MAX_SAMPLES)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+    def to_dict(self):
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "count": self.count,
+                "sum": self.sum, "samples": list(self.samples)}
+
+    def merge(self, data):
+        self.counts = [a + b for a, b in zip(self.counts, data["counts"])]
+        self.count += data["count"]
+        self.sum += data["sum"]
+        self.samples.extend(data["samples"])
+
+
+class MetricsRegistry:
+    """
+    Contadores, indicadores e histogramas con etiquetas (etapa, modelo, host,
+    cache...). Un solo cerrojo protege todas las series: las actualizaciones son
+    cortas y nunca esperan, asi que sirve igual para hilos que para tareas de
+    asyncio. Los valores son acumulativos durante toda la vida del proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._server = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._histograms = {}
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def add_gauge(self, name, amount, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def get(self, name, **labels):
+        # Valor de un contador o indicador (0 si la serie no existe)
+        key = self._key(labels)
+        with self._lock:
+            for kind in (self._counters, self._gauges):
+                if key in kind.get(name, {}):
+                    return kind[name][key]
+        return 0
+
+    def describe(self, name, by):
+        # Percentiles de un histograma agrupados por el valor de una etiqueta
+        grouped = {}
+        with self._lock:
+            for key, histogram in self._histograms.get(name, {}).items():
+                group = dict(key).get(by)
+                if group is not None:
+                    grouped.setdefault(group, []).extend(histogram.samples)
+        return {group: describe(values) for group, values in grouped.items()}
+
+    def snapshot(self):
+        # Copia serializable (JSON/pickle) para combinar registros de varios procesos
+        with self._lock:
+            return {
+                "counters": {name: [[list(key), value] for key, value in series.items()] for name, series in self._counters.items()},
+                "gauges": {name: [[list(key), value] for key, value in series.items()] for name, series in self._gauges.items()},
+                "histograms": {name: [[list(key), histogram.to_dict()] for key, histogram in series.items()]
+                               for name, series in self._histograms.items()}
+            }
+
+    def load_snapshots(self, snapshots):
+        # Sustituye el contenido por la suma de varias instantaneas (p. ej. una por proceso del lote).
+        # Se combina aparte y se cambia de golpe: el endpoint nunca ve el registro a medio cargar
+        counters, gauges, histograms = {}, {}, {}
+        for snapshot in snapshots:
+            for target, kind in ((counters, "counters"), (gauges, "gauges")):
+                for name, series in snapshot.get(kind, {}).items():
+                    merged = target.setdefault(name, {})
+                    for key, value in series:
+                        key = tuple(tuple(pair) for pair in key)
+                        merged[key] = merged.get(key, 0) + value
+            for name, series in snapshot.get("histograms", {}).items():
+                merged = histograms.setdefault(name, {})
+                for key, data in series:
+                    key = tuple(tuple(pair) for pair in key)
+                    if key not in merged:
+                        merged[key] = Histogram(data["buckets"])
+                    merged[key].merge(data)
+        with self._lock:
+            self._counters, self._gauges, self._histograms = counters, gauges, histograms
+
+    @staticmethod
+    def _escape(value):
+        return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    def _format_labels(self, key, extra=None):
+        pairs = list(key) + (extra or [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{self._escape(value)}"' for name, value in pairs) + "}"
+
+    @staticmethod
+    def _format_value(value):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+    def to_prometheus(self):
+        # Formato de texto de exposicion de Prometheus
+        lines = []
+        with self._lock:
+            for kind, source in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(source):
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in sorted(source[name].items()):
+                        lines.append(f"{name}{self._format_labels(key)} {self._format_value(value)}")
+            for name in sorted(self._histograms):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{self._format_labels(key, [('le', self._format_value(float(bound)))])} {count}")
+                    lines.append(f"{name}_bucket{self._format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{self._format_labels(key)} {self._format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{self._format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Escritura atomica: el recolector (node_exporter textfile) nunca lee un fichero a medias
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        # Endpoint /metrics en un hilo aparte; una sola vez por proceso
+        if self._server is not None:
+            return self._server.server_address[1]
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Metricas Prometheus en http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server.server_address[1]
+
+    def stop_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class RunMetrics:
+    """
+    Datos de una ejecucion del pipeline (lo que muestra el resumen final). Cada
+    ejecucion tiene los suyos, de modo que varias en paralelo no se mezclan.
+    """
 
-class MetricsTracker:
-    
     def __init__(self):
         self.start_time = None
         self.stage_times = {}
+        self.stage_durations = {}
+        self.first_token_times = {}
+        self.stage_costs = {}
         self.total_tokens = 0
-        self.token_costs = {
-            "gpt-4o-mini": {"input": 0.00015 / 1000, "output": 0.0006 / 1000},
-            "gpt-4o": {"input": 0.0025 / 1000, "output": 0.01 / 1000},
-            "gpt-4": {"input": 0.03 / 1000, "output": 0.06 / 1000}
-        }
-    
+        self.total_cost = 0.0
+        self.tokens = {"prompt": 0, "completion": 0, "cached": 0}
+        # Coste maximo de las llamadas en curso (aun sin usage) y cambios de modelo por presupuesto
+        self.reserved_cost = 0.0
+        self.downgrades = []
+        self.llm_cache = {"hits": 0, "misses": 0, "tokens_saved": 0}
+        self.queue_wait = {"count": 0, "total": 0.0, "max": 0.0}
+        self.llm_latency = {}
+        self.http_latency = {}
+
+
+class MetricsTracker:
+
+    def __init__(self, registry=None):
+        self.registry = registry or metrics_registry
+        self._lock = threading.Lock()
+        # Ejecucion en curso por hilo/tarea; sin ella, la ultima iniciada en el proceso
+        self._run = contextvars.ContextVar(f"metrics_run_{id(self)}", default=None)
+        self._default_run = RunMetrics()
+        self.export_path = None
+
+    @property
+    def current(self):
+        return self._run.get() or self._default_run
+
+    # Accesos directos a la ejecucion en curso
+    stage_times = property(lambda self: self.current.stage_times)
+    first_token_times = property(lambda self: self.current.first_token_times)
+    stage_costs = property(lambda self: self.current.stage_costs)
+    total_tokens = property(lambda self: self.current.total_tokens)
+    total_cost = property(lambda self: self.current.total_cost)
+    llm_cache = property(lambda self: self.current.llm_cache)
+    queue_wait = property(lambda self: self.current.queue_wait)
+    start_time = property(lambda self: self.current.start_time)
+
+    def reset(self):
+        # Objetos nuevos: los resumenes ya entregados conservan sus datos
+        run = RunMetrics()
+        self._run.set(run)
+        self._default_run = run
+        return run
+
     def start(self):
-        self.start_time = time.time()
+        self.reset().start_time = time.time()
+        self.registry.inc("brochure_runs_total")
         logger.info("Metricas iniciadas")
-    
+
+    def finish(self, report_path=None):
+        # Cierra la ejecucion: su duracion entra en el histograma, se exportan las metricas
+        # y, si se indica, se guarda el informe de costes de la ejecucion
+        run = self.current
+        if run.start_time:
+            self.registry.observe("brochure_run_seconds", time.time() - run.start_time)
+        self.export()
+        if report_path:
+            self.write_cost_report(report_path)
+
+    def get_cost_report(self):
+        summary = self.get_summary() or {}
+        return {
+            "timestamp": summary.get("timestamp"),
+            "total_time": summary.get("total_time"),
+            "currency": cost_ledger.currency,
+            "total_cost": self.current.total_cost,
+            "tokens": dict(self.current.tokens),
+            "stages": summary.get("stage_costs", {}),
+            "budget": cost_ledger.get_budget(),
+            "downgrades": list(self.current.downgrades)
+        }
+
+    def write_cost_report(self, path):
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.get_cost_report(), f, indent=2, ensure_ascii=False)
+            logger.info(f"Informe de costes guardado en {path}")
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el informe de costes en {path}: {e}")
+
+    def configure_export(self, path=None, port=None):
+        # Fichero y/o puerto de exportacion Prometheus (por defecto, METRICS_FILE y METRICS_PORT del entorno)
+        self.export_path = path or os.environ.get("METRICS_FILE") or self.export_path
+        port = port or os.environ.get("METRICS_PORT")
+        if port:
+            try:
+                self.registry.serve(int(port))
+            except OSError as e:
+                logger.warning(f"No se pudo abrir el endpoint de metricas en el puerto {port}: {e}")
+
+    def export(self):
+        if not self.export_path:
+            return
+        try:
+            self.registry.write_prometheus(self.export_path)
+        except OSError as e:
+            logger.warning(f"No se pudieron exportar las metricas a {self.export_path}: {e}")
+
+    @contextmanager
+    def llm_stage(self, stage_name):
+        token = _llm_stage.set(stage_name)
+        try:
+            yield
+        finally:
+            _llm_stage.reset(token)
+
     def record_stage(self, stage_name, duration):
-        self.stage_times[stage_name] = duration
+        # Una etapa repetida acumula su tiempo en lugar de sustituir el anterior
+        run = self.current
+        with self._lock:
+            run.stage_durations.setdefault(stage_name, []).append(duration)
+            run.stage_times[stage_name] = run.stage_times.get(stage_name, 0.0) + duration
+        self.registry.observe("brochure_stage_seconds", duration, stage=stage_name)
         logger.info(f"Etapa '{stage_name}': {duration:.2f}s")
-    
-    def add_tokens(self, model, prompt_tokens, completion_tokens):
-        self.total_tokens += prompt_tokens + completion_tokens
-        
-        if model in self.token_costs:
-            costs = self.token_costs[model]
-            input_cost = prompt_tokens * costs["input"]
-            output_cost = completion_tokens * costs["output"]
-            total_cost = input_cost + output_cost
-            
-            logger.info(f"Tokens usados - Entrada: {prompt_tokens}, Salida: {completion_tokens}")
-            logger.info(f"Coste estimado: {total_cost:.6f}€")
-            
-            return total_cost
-        return 0
-    
+
+    def record_streaming(self, stage_name, first_token, duration):
+        # En streaming importan por separado el primer token (lo que percibe el usuario) y el total
+        self.record_stage(stage_name, duration)
+        if first_token is not None:
+            self.current.first_token_times[stage_name] = first_token
+            self.registry.observe("brochure_first_token_seconds", first_token, stage=stage_name)
+            logger.info(f"Etapa '{stage_name}': primer token en {first_token:.2f}s")
+
+    def add_tokens(self, model, prompt_tokens, completion_tokens, cached_tokens=0):
+        total_cost = cost_ledger.cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        logger.info(f"Tokens usados - Entrada: {prompt_tokens} ({cached_tokens} en cache), Salida: {completion_tokens}")
+        logger.info(f"Coste estimado: {total_cost:.6f} {cost_ledger.currency}")
+
+        # Las llamadas concurrentes (traducciones en paralelo) suman desde varios hilos
+        run = self.current
+        stage_name = _llm_stage.get()
+        with self._lock:
+            run.total_tokens += prompt_tokens + completion_tokens
+            run.total_cost += total_cost
+            run.tokens["prompt"] += prompt_tokens
+            run.tokens["completion"] += completion_tokens
+            run.tokens["cached"] += cached_tokens
+            if stage_name:
+                entry = run.stage_costs.setdefault(stage_name, {"calls": 0, "tokens": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                                "cached_tokens": 0, "cost": 0.0, "models": {}})
+                entry["calls"] += 1
+                entry["tokens"] += prompt_tokens + completion_tokens
+                entry["prompt_tokens"] += prompt_tokens
+                entry["completion_tokens"] += completion_tokens
+                entry["cached_tokens"] += cached_tokens
+                entry["cost"] += total_cost
+                entry["models"][model] = entry["models"].get(model, 0) + 1
+
+        self.registry.inc("brochure_llm_tokens_total", prompt_tokens, model=model, stage=stage_name, kind="prompt")
+        self.registry.inc("brochure_llm_tokens_total", completion_tokens, model=model, stage=stage_name, kind="completion")
+        self.registry.inc("brochure_llm_tokens_total", cached_tokens, model=model, stage=stage_name, kind="cached")
+        self.registry.inc("brochure_llm_cost_total", total_cost, model=model, stage=stage_name)
+        return total_cost
+
+    def authorize_llm_call(self, model, prompt_tokens, max_tokens):
+        # Reserva el coste maximo de la llamada frente a los topes; devuelve (modelo, coste reservado)
+        run = self.current
+        with self._lock:
+            allowed, reserved = cost_ledger.authorize(model, prompt_tokens, max_tokens, run.total_cost + run.reserved_cost)
+            run.reserved_cost += reserved
+            if allowed != model:
+                run.downgrades.append({"stage": _llm_stage.get(), "from": model, "to": allowed})
+        return allowed, reserved
+
+    def settle_llm_call(self, reserved, cost=0.0):
+        run = self.current
+        with self._lock:
+            run.reserved_cost -= reserved
+        cost_ledger.settle(reserved, cost)
+
+    def record_llm_cache(self, hit, tokens_saved=0, model=None):
+        run = self.current
+        with self._lock:
+            if hit:
+                run.llm_cache["hits"] += 1
+                run.llm_cache["tokens_saved"] += tokens_saved
+            else:
+                run.llm_cache["misses"] += 1
+        self.registry.inc("brochure_llm_cache_total", model=model, stage=_llm_stage.get(), cache="hit" if hit else "miss")
+        if hit:
+            logger.info(f"Respuesta del LLM servida desde cache ({tokens_saved} tokens ahorrados)")
+
+    def record_queue_wait(self, seconds, model=None):
+        # Tiempo que una llamada al LLM espera por las cuotas RPM/TPM o por un hueco en vuelo
+        run = self.current
+        with self._lock:
+            run.queue_wait["count"] += 1
+            run.queue_wait["total"] += seconds
+            run.queue_wait["max"] = max(run.queue_wait["max"], seconds)
+        self.registry.observe("brochure_llm_queue_wait_seconds", seconds, model=model)
+        if seconds >= 1:
+            logger.info(f"Llamada al LLM en cola durante {seconds:.2f}s por limite de cuota")
+
+    @contextmanager
+    def llm_request(self, model):
+        # Mide una peticion a la API: latencia por modelo y etapa, resultado y peticiones en vuelo
+        outcome = {"status": "ok"}
+        self.registry.add_gauge("brochure_llm_in_flight", 1, model=model)
+        start = time.monotonic()
+        try:
+            yield outcome
+        except BaseException as e:
+            outcome["status"] = type(e).__name__
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            self.registry.add_gauge("brochure_llm_in_flight", -1, model=model)
+            self.registry.observe("brochure_llm_request_seconds", elapsed, model=model, stage=_llm_stage.get(),
+                                  status=outcome["status"])
+            run = self.current
+            with self._lock:
+                run.llm_latency.setdefault(model, []).append(elapsed)
+
+    def record_http(self, url, status, seconds):
+        host = urlparse(url).hostname or "desconocido"
+        self.registry.observe("brochure_http_request_seconds", seconds, host=host, status=status)
+        run = self.current
+        with self._lock:
+            run.http_latency.setdefault(host, []).append(seconds)
+
     def get_summary(self):
-        if not self.start_time:
+        run = self.current
+        if not run.start_time:
             return None
-        
-        total_time = time.time() - self.start_time
-        
-        summary = {
-            "total_time": total_time,
-            "stages": self.stage_times,
-            "total_tokens": self.total_tokens,
-            "timestamp": datetime.now().isoformat()
-        }
-        
+
+        total_time = time.time() - run.start_time
+
+        with self._lock:
+            summary = {
+                "total_time": total_time,
+                "stages": dict(run.stage_times),
+                "stage_stats": {stage: describe(values) for stage, values in run.stage_durations.items()},
+                "first_token": dict(run.first_token_times),
+                "total_tokens": run.total_tokens,
+                "total_cost": run.total_cost,
+                "currency": cost_ledger.currency,
+                "tokens": dict(run.tokens),
+                "stage_costs": {stage: dict(entry, models=dict(entry["models"])) for stage, entry in run.stage_costs.items()},
+                "downgrades": list(run.downgrades),
+                "llm_cache": dict(run.llm_cache),
+                "llm_queue_wait": dict(run.queue_wait),
+                "llm_latency": {model: describe(values) for model, values in run.llm_latency.items()},
+                "http_latency": {host: describe(values) for host, values in run.http_latency.items()},
+                "timestamp": datetime.now().isoformat()
+            }
+
         return summary
-    
+
     def print_summary(self):
         summary = self.get_summary()
         if not summary:
             return
-        
+
         print("\n" + "=" * 60)
         print("METRICAS DEL PROCESO")
         print("=" * 60)
         print(f"\nTiempo total: {summary['total_time']:.2f}s")
         print(f"\nTiempos por etapa:")
         for stage, duration in summary['stages'].items():
-            print(f"  - {stage}: {duration:.2f}s")
-        print(f"\nTokens totales usados: {summary['total_tokens']}")
+            count = summary['stage_stats'][stage]['count']
+            repeated = f" en {count} veces" if count > 1 else ""
+            if stage in summary['first_token']:
+                print(f"  - {stage}: {duration:.2f}s{repeated} (primer token: {summary['first_token'][stage]:.2f}s)")
+            else:
+                print(f"  - {stage}: {duration:.2f}s{repeated}")
+        currency = summary['currency']
+        tokens = summary['tokens']
+        print(f"\nTokens totales usados: {summary['total_tokens']} (entrada {tokens['prompt']}, {tokens['cached']} en cache; "
+              f"salida {tokens['completion']}); coste estimado: {summary['total_cost']:.6f} {currency}")
+        if summary['stage_costs']:
+            print(f"\nConsumo por etapa:")
+            for stage, entry in summary['stage_costs'].items():
+                print(f"  - {stage} ({', '.join(entry['models'])}): {entry['calls']} llamadas, entrada {entry['prompt_tokens']} "
+                      f"({entry['cached_tokens']} en cache), salida {entry['completion_tokens']}, {entry['cost']:.6f} {currency}")
+        for downgrade in summary['downgrades']:
+            print(f"  Presupuesto: {downgrade['stage'] or 'llamada'} paso de {downgrade['from']} a {downgrade['to']}")
+        if summary['llm_latency']:
+            print(f"\nLatencia de la API del LLM:")
+            for model, stats in summary['llm_latency'].items():
+                print(f"  - {model}: {stats['count']} peticiones, p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s, "
+                      f"maximo {stats['max']:.2f}s")
+        if summary['http_latency']:
+            print(f"\nDescargas HTTP:")
+            for host, stats in summary['http_latency'].items():
+                print(f"  - {host}: {stats['count']} peticiones, p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s")
+        llm_cache = summary['llm_cache']
+        if llm_cache['hits'] or llm_cache['misses']:
+            print(f"Cache de respuestas LLM: {llm_cache['hits']} aciertos, {llm_cache['misses']} fallos, "
+                  f"{llm_cache['tokens_saved']} tokens ahorrados")
+        queue_wait = summary['llm_queue_wait']
+        if queue_wait['total'] > 0:
+            print(f"Espera en cola del LLM: {queue_wait['total']:.2f}s en {queue_wait['count']} llamadas "
+                  f"(maximo {queue_wait['max']:.2f}s)")
         print("=" * 60)
 
 
-metrics_tracker = MetricsTracker()
\ No newline at end of file
+# Registro del proceso: acumula todas las ejecuciones para la exportacion Prometheus
+metrics_registry = MetricsRegistry()
+
+metrics_tracker = MetricsTracker()
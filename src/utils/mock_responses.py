@@ -18,4 +18,4 @@ def get_mock_compiled_content(tone="formal"):
         return {}
     except Exception as e:
         logger.error(f"Error cargando mock data: {e}")
-        return {}
\ No newline at end of file
+        return {}
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+from utils.utils import get_project_root
+from utils.logger import logger
+
+
+class PromptRegistry:
+    """
+    Plantillas de prompts/ cargadas una sola vez por proceso. Cada acceso
+    comprueba la fecha y el tamano del fichero y solo lo relee si ha cambiado,
+    de modo que editar un prompt tiene efecto sin reiniciar. Los prefijos
+    (system + ejemplos few-shot) se montan una vez y se reutilizan identicos
+    byte a byte, para que la cache de prompts del proveedor pueda acertar.
+    """
+
+    def __init__(self, prompts_dir=None):
+        self.prompts_dir = prompts_dir or os.path.join(get_project_root(), "prompts")
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._prefixes = {}
+
+    def _load(self, filename):
+        # Devuelve la entrada vigente del fichero, o None si no existe
+        path = os.path.join(self.prompts_dir, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry and entry["signature"] == signature:
+                return entry
+
+            with open(path, 'rb') as f:
+                raw = f.read()
+            entry = {
+                "signature": signature,
+                "text": raw.decode("utf-8"),
+                "hash": hashlib.sha256(raw).hexdigest()[:12],
+                "messages": None
+            }
+            if filename.endswith(".json"):
+                try:
+                    entry["messages"] = self.compile_messages(json.loads(entry["text"]))
+                except (ValueError, KeyError, AttributeError) as e:
+                    logger.error(f"Prompt multi-shot invalido en {filename}: {e}")
+            if filename in self._entries:
+                logger.info(f"Prompt '{filename}' recargado (version {entry['hash']})")
+            self._entries[filename] = entry
+            return entry
+
+    @staticmethod
+    def compile_messages(data):
+        # El contenido del assistant (JSON) se pasa a texto una vez, para que el LLM no lo vea como objeto
+        messages = []
+        for message in data:
+            content = message.get("content")
+            if message.get("role") == "assistant" and not isinstance(content, str):
+                content = json.dumps(content)
+            messages.append({"role": message["role"], "content": content})
+        return tuple(messages)
+
+    def get_text(self, filename):
+        entry = self._load(filename)
+        if entry is None:
+            logger.error(f"Error: No se encontro el prompt {filename}")
+            return None
+        return entry["text"]
+
+    def get_messages(self, filename):
+        # Mensajes few-shot ya compilados; copias para que el llamante pueda modificarlos
+        entry = self._load(filename)
+        if entry is None or entry["messages"] is None:
+            logger.error(f"Error cargando prompts multi-shot desde {filename}")
+            return []
+        return [dict(message) for message in entry["messages"]]
+
+    def get_hash(self, filename):
+        entry = self._load(filename)
+        return entry["hash"] if entry else None
+
+    def get_prefix(self, system_files, few_shot_file=None):
+        """
+        Mensajes iniciales estables: un system con los ficheros indicados unidos por
+        una linea en blanco, seguido de los ejemplos few-shot. Se memoiza por la
+        version de cada fichero. Devuelve (mensajes, hash del prefijo) o (None, None)
+        si falta algun fichero.
+        """
+        files = tuple(system_files) + ((few_shot_file,) if few_shot_file else ())
+        hashes = tuple(self.get_hash(filename) for filename in files)
+        if None in hashes:
+            for filename, file_hash in zip(files, hashes):
+                if file_hash is None:
+                    logger.error(f"Error: No se encontro el prompt {filename}")
+            return None, None
+
+        key = (files, hashes)
+        if key not in self._prefixes:
+            system_prompt = "\n\n".join(self.get_text(filename) for filename in system_files)
+            messages = [{"role": "system", "content": system_prompt}]
+            if few_shot_file:
+                messages.extend(self.get_messages(few_shot_file))
+            prefix_hash = hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+            self._prefixes[key] = (tuple(messages), prefix_hash)
+
+        messages, prefix_hash = self._prefixes[key]
+        return [dict(message) for message in messages], prefix_hash
+
+    def get_version(self):
+        # Huella de todo prompts/: cambia al editar cualquier prompt (forma parte de la clave de la cache del LLM)
+        try:
+            filenames = sorted(name for name in os.listdir(self.prompts_dir)
+                               if os.path.isfile(os.path.join(self.prompts_dir, name)))
+        except OSError:
+            return None
+
+        digest = hashlib.sha1()
+        for filename in filenames:
+            digest.update(filename.encode("utf-8"))
+            digest.update((self.get_hash(filename) or "").encode("utf-8"))
+        return digest.hexdigest()[:12]
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,153 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Cuotas por minuto de la API por modelo (nivel 1 de OpenAI); configurables con configure()
+DEFAULT_LIMITS = {
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "gpt-4-turbo": {"rpm": 500, "tpm": 30000},
+    "gpt-4": {"rpm": 500, "tpm": 10000},
+    "gpt-3.5-turbo": {"rpm": 3500, "tpm": 200000}
+}
+FALLBACK_LIMITS = {"rpm": 500, "tpm": 30000}
+
+
+class TokenBucket:
+    """
+    Cubo de fichas que se rellena de forma continua hasta su capacidad. reserve()
+    descuenta las fichas al momento aunque el saldo quede negativo y devuelve la
+    espera necesaria: las reservas se atienden en orden de llegada sin sondeo.
+    """
+
+    def __init__(self, capacity, per_second, now=None):
+        self.capacity = float(capacity)
+        self.per_second = float(per_second)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        self._refill(now)
+        # Una peticion mayor que el cubo nunca cabria: se limita a la capacidad
+        self.tokens -= min(float(amount), self.capacity)
+        return max(0.0, -self.tokens / self.per_second)
+
+    def refund(self, amount, now):
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    Limitador compartido de peticiones (RPM) y tokens (TPM) por modelo. Cada
+    llamada reserva una peticion y una estimacion de tokens; al terminar se
+    corrige con el consumo real. Un 429 bloquea el modelo durante el tiempo que
+    indique el servidor.
+    """
+
+    def __init__(self, limits=None, scale=1.0):
+        self.limits = {model: dict(values) for model, values in (limits or DEFAULT_LIMITS).items()}
+        self.default_limits = dict(FALLBACK_LIMITS)
+        self.scale = scale
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._blocked_until = {}
+
+    def configure(self, model=None, rpm=None, tpm=None, scale=None):
+        # Sin modelo, los limites se aplican a todos; scale reparte la cuota entre procesos
+        with self._lock:
+            targets = [self.limits.setdefault(model, dict(self.get_limits(model)))] if model else \
+                list(self.limits.values()) + [self.default_limits]
+            for target in targets:
+                if rpm:
+                    target["rpm"] = rpm
+                if tpm:
+                    target["tpm"] = tpm
+            if scale:
+                self.scale = scale
+            self._buckets = {}
+
+    def get_limits(self, model):
+        return self.limits.get(model, self.default_limits)
+
+    def _get_buckets(self, model, now):
+        if model not in self._buckets:
+            limits = self.get_limits(model)
+            rpm = max(1.0, limits["rpm"] * self.scale)
+            tpm = max(1.0, limits["tpm"] * self.scale)
+            self._buckets[model] = (TokenBucket(rpm, rpm / 60, now), TokenBucket(tpm, tpm / 60, now))
+        return self._buckets[model]
+
+    def reserve(self, model, tokens):
+        with self._lock:
+            now = time.monotonic()
+            requests_bucket, tokens_bucket = self._get_buckets(model, now)
+            wait = max(requests_bucket.reserve(1, now), tokens_bucket.reserve(tokens, now))
+            return max(wait, self._blocked_until.get(model, now) - now)
+
+    def acquire(self, model, tokens):
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, model, tokens):
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def settle(self, model, reserved, used):
+        # Devolver al cubo los tokens reservados de mas (o cobrar los que faltaron)
+        with self._lock:
+            now = time.monotonic()
+            self._get_buckets(model, now)[1].refund(reserved - used, now)
+
+    def penalize(self, model, seconds):
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._blocked_until[model] = max(until, self._blocked_until.get(model, 0.0))
+
+
+def estimate_tokens(messages, max_tokens):
+    # Aproximacion de ~4 caracteres por token; la API descuenta max_tokens del TPM al recibir la peticion
+    chars = sum(len(str(message.get("content", ""))) for message in messages)
+    return chars // 4 + 4 * len(messages) + max_tokens
+
+
+def get_retry_after(error):
+    # Pista del servidor en las cabeceras de la respuesta de error (segundos)
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def backoff_delay(attempt, retry_after=None, base=1.0, cap=30.0):
+    # Backoff exponencial con jitter completo; nunca por debajo de lo que pide el servidor
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, base / 2))
+    return delay
+
+
+rate_limiter = RateLimiter()
@@ -1,5 +1,7 @@
+import threading
 from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
+from utils.http_client import http_client
 from utils.logger import logger
 
 
@@ -7,22 +9,48 @@ class RobotsChecker:
     
     def __init__(self):
         self.parsers = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+    
+    def _get_host_lock(self, base_url):
+        with self._lock:
+            if base_url not in self._locks:
+                self._locks[base_url] = threading.Lock()
+            return self._locks[base_url]
+    
+    @staticmethod
+    def fetch_parser(robots_url):
+        parser = RobotFileParser()
+        parser.set_url(robots_url)
+        
+        response = http_client.get(robots_url)
+        
+        # Mismo criterio que RobotFileParser.read()
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif 400 <= response.status_code < 500:
+            parser.allow_all = True
+        elif response.status_code >= 500:
+            parser.disallow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        
+        return parser
     
     def can_fetch(self, url, user_agent="BrochureBot/1.0"):
         parsed = urlparse(url)
         base_url = f"{parsed.scheme}://{parsed.netloc}"
         robots_url = f"{base_url}/robots.txt"
         
-        if base_url not in self.parsers:
-            parser = RobotFileParser()
-            parser.set_url(robots_url)
-            try:
-                parser.read()
-                self.parsers[base_url] = parser
-                logger.info(f"robots.txt leido de {base_url}")
-            except Exception as e:
-                logger.warning(f"No se pudo leer robots.txt de {base_url}: {e}")
-                self.parsers[base_url] = None
+        # Un solo hilo descarga el robots.txt de cada host
+        with self._get_host_lock(base_url):
+            if base_url not in self.parsers:
+                try:
+                    self.parsers[base_url] = self.fetch_parser(robots_url)
+                    logger.info(f"robots.txt leido de {base_url}")
+                except Exception as e:
+                    logger.warning(f"No se pudo leer robots.txt de {base_url}: {e}")
+                    self.parsers[base_url] = None
         
         parser = self.parsers[base_url]
         
@@ -0,0 +1,176 @@
+import re
+from utils.logger import logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Ventana de contexto (entrada + salida) de cada modelo, en tokens
+CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385
+}
+FALLBACK_CONTEXT_WINDOW = 8192
+
+# Peso de cada tipo de pagina al repartir el presupuesto (por palabra clave en el tipo)
+PAGE_PRIORITIES = {
+    "home": 3, "about": 3, "product": 3, "service": 3,
+    "customer": 2, "case": 2, "client": 2, "career": 2, "job": 2, "culture": 2,
+    "contact": 1, "blog": 1, "news": 1
+}
+
+# Margen para la plantilla de los mensajes y el error de la estimacion
+SAFETY_MARGIN = 256
+
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenBudget:
+    """
+    Cuenta tokens en local (tiktoken si esta instalado; si no, una estimacion por
+    palabras) y reparte el presupuesto de entrada de cada modelo entre los trozos
+    del prompt, recortando siempre por parrafos, lineas o palabras completas.
+    """
+
+    def __init__(self, max_prompt_tokens=12000):
+        # Tope de tokens de contenido por llamada (coste); la ventana del modelo manda si es menor
+        self.max_prompt_tokens = max_prompt_tokens
+        self._encodings = {}
+
+    def configure(self, max_prompt_tokens=None):
+        if max_prompt_tokens:
+            self.max_prompt_tokens = max(1, int(max_prompt_tokens))
+
+    @staticmethod
+    def get_context_window(model):
+        return CONTEXT_WINDOWS.get(model, FALLBACK_CONTEXT_WINDOW)
+
+    def get_encoding(self, model):
+        if tiktoken is None:
+            return None
+        if model not in self._encodings:
+            try:
+                self._encodings[model] = tiktoken.encoding_for_model(model)
+            except Exception:
+                # Modelo desconocido o sin acceso a los ficheros BPE: estimacion heuristica
+                try:
+                    self._encodings[model] = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    self._encodings[model] = None
+        return self._encodings[model]
+
+    def count(self, text, model=None):
+        if not text:
+            return 0
+        encoding = self.get_encoding(model)
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        # Cada signo de puntuacion es un token y las palabras largas se parten cada ~4 caracteres
+        return sum(1 + (len(word) - 1) // 4 for word in WORD_PATTERN.findall(text))
+
+    def count_messages(self, messages, model=None):
+        # ~4 tokens de envoltorio por mensaje, como cuenta la API
+        return sum(self.count(str(message.get("content", "")), model) + 4 for message in messages)
+
+    def input_budget(self, model, max_tokens, fixed_messages=()):
+        # Tokens disponibles para el contenido variable una vez descontados salida, plantilla y margen
+        available = self.get_context_window(model) - max_tokens - self.count_messages(fixed_messages, model) - SAFETY_MARGIN
+        return max(0, min(available, self.max_prompt_tokens))
+
+    def trim(self, text, max_tokens, model=None, separators=("\n\n", "\n", " ")):
+        if max_tokens <= 0:
+            return ""
+        if self.count(text, model) <= max_tokens:
+            return text
+        if not separators:
+            # Una sola "palabra" mayor que el presupuesto: corte por caracteres
+            return text[:max_tokens * 4]
+
+        separator = separators[0]
+        kept = []
+        used = 0
+        for piece in text.split(separator):
+            cost = self.count(piece, model) + (1 if kept else 0)
+            if used + cost > max_tokens:
+                if not kept:
+                    kept.append(self.trim(piece, max_tokens, model, separators[1:]))
+                break
+            kept.append(piece)
+            used += cost
+        return separator.join(kept)
+
+    @staticmethod
+    def get_priority(name):
+        name = name.lower()
+        return max((weight for keyword, weight in PAGE_PRIORITIES.items() if keyword in name), default=1)
+
+    @staticmethod
+    def allocate(sizes, budget, weights):
+        # Reparto ponderado: los trozos que caben en su parte se quedan enteros y lo que sobra pasa al resto
+        allocation = {}
+        pending = {name for name, size in sizes.items() if size > 0}
+        remaining = budget
+
+        while pending:
+            total_weight = sum(weights[name] for name in pending)
+            fitting = {name for name in pending if sizes[name] <= remaining * weights[name] / total_weight}
+            if not fitting:
+                for name in pending:
+                    allocation[name] = int(remaining * weights[name] / total_weight)
+                break
+            for name in fitting:
+                allocation[name] = sizes[name]
+                remaining -= sizes[name]
+            pending -= fitting
+
+        return {name: allocation.get(name, 0) for name in sizes}
+
+    def pack(self, sections, budget, model=None):
+        """
+        Ajusta un diccionario {nombre: texto} a `budget` tokens en total. Devuelve
+        las secciones recortadas (en el mismo orden, sin las que quedan vacias) y
+        un informe {nombre: (tokens originales, tokens empaquetados)}.
+        """
+        sizes = {name: self.count(text, model) for name, text in sections.items()}
+        weights = {name: self.get_priority(name) for name in sections}
+        allocation = self.allocate(sizes, budget, weights)
+
+        packed = {}
+        report = {}
+        for name, text in sections.items():
+            packed_text = text if allocation[name] >= sizes[name] else self.trim(text, allocation[name], model)
+            if packed_text:
+                packed[name] = packed_text
+            report[name] = (sizes[name], self.count(packed_text, model))
+
+        original = sum(size for size, _ in report.values())
+        kept = sum(size for _, size in report.values())
+        logger.info(f"Presupuesto de contenido: {budget} tokens. Empaquetados {kept} de {original} tokens")
+        for name, (size, packed_size) in report.items():
+            if packed_size < size:
+                logger.info(f"   - {name}: recortado de {size} a {packed_size} tokens")
+        return packed, report
+
+    def pack_lines(self, lines, budget, model=None):
+        # Prefijo de lineas (en orden) que cabe en el presupuesto
+        used = 0
+        for index, line in enumerate(lines):
+            used += self.count(line, model) + 1
+            if used > budget:
+                return lines[:index]
+        return list(lines)
+
+    def report(self, messages, model, max_tokens):
+        prompt_tokens = self.count_messages(messages, model)
+        window = self.get_context_window(model)
+        logger.info(f"Prompt para {model}: {prompt_tokens} tokens + {max_tokens} de salida (ventana {window})")
+        if prompt_tokens + max_tokens > window:
+            logger.warning(f"El prompt excede la ventana de contexto de {model}")
+        return prompt_tokens
+
+
+token_budget = TokenBudget()
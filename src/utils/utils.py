@@ -19,7 +19,20 @@ def get_prompts_path(filename):
     return os.path.join(get_project_root(), "prompts", filename)
 
 
+# Subcarpeta de outputs/ activa (modo batch: una carpeta aislada por trabajo)
+_outputs_subdir = None
+
+
+def set_outputs_subdir(subdir):
+    global _outputs_subdir
+    _outputs_subdir = subdir
+    if subdir:
+        os.makedirs(os.path.join(get_project_root(), "outputs", subdir), exist_ok=True)
+
+
 def get_outputs_path(filename):
+    if _outputs_subdir:
+        return os.path.join(get_project_root(), "outputs", _outputs_subdir, filename)
     return os.path.join(get_project_root(), "outputs", filename)
 
 
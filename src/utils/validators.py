@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import BaseModel, Field, ValidationError, create_model
 from typing import List
 from utils.logger import logger
 
@@ -12,6 +12,77 @@ class SelectedLink(BaseModel):
 class SelectedLinksResponse(BaseModel):
     links: List[SelectedLink] = Field(default_factory=list, description="Lista de enlaces seleccionados")
     
+
+# Variante compacta para salida estructurada: el modelo devuelve el numero del enlace en la lista en vez de la URL
+IndexedLink = create_model(
+    "IndexedLink",
+    index=(int, Field(..., description="Numero del enlace en la lista recibida")),
+    **{name: (field.annotation, field) for name, field in SelectedLink.model_fields.items() if name != "url"}
+)
+
+IndexedLinksResponse = create_model(
+    "IndexedLinksResponse",
+    links=(List[IndexedLink], Field(..., description="Lista de enlaces seleccionados"))
+)
+
+
+def get_strict_schema(model):
+    """
+    Esquema JSON de un modelo pydantic en el formato estricto de response_format
+    (json_schema): todos los campos obligatorios, sin propiedades adicionales y
+    sin las restricciones numericas, que se validan despues en local.
+    """
+    def strict(node):
+        if isinstance(node, dict):
+            node = {key: strict(value) for key, value in node.items()
+                    if key not in ("default", "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum")}
+            if node.get("type") == "object" and "properties" in node:
+                node["required"] = list(node["properties"])
+                node["additionalProperties"] = False
+            return node
+        if isinstance(node, list):
+            return [strict(value) for value in node]
+        return node
+
+    return {"name": model.__name__, "strict": True, "schema": strict(model.model_json_schema())}
+
+
+def validate_indexed_links(data, urls):
+    """
+    Valida una respuesta por indices elemento a elemento y traduce cada indice a
+    su URL. Devuelve (enlaces validos, errores) donde cada error es
+    {"item": elemento recibido, "fields": [campos a corregir]}; los indices
+    fuera de la lista o repetidos se descartan porque no se pueden corregir.
+    """
+    links = []
+    errors = []
+    seen = set()
+
+    for item in (data or {}).get("links", []) if isinstance(data, dict) else []:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index")
+        # bool es subclase de int: true/false no son indices
+        if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < len(urls) or index in seen:
+            logger.warning(f"Indice de enlace descartado: {index}")
+            continue
+        # Los textos vacios se piden en la misma reparacion que los errores de pydantic
+        blank = [name for name in ("type", "rationale") if isinstance(item.get(name), str) and not item[name].strip()]
+        try:
+            validated = IndexedLink(**item)
+        except ValidationError as e:
+            fields = {str(error["loc"][0]) for error in e.errors() if error["loc"]}
+            errors.append({"item": item, "fields": sorted(fields.union(blank))})
+            continue
+        if blank:
+            errors.append({"item": item, "fields": blank})
+            continue
+        seen.add(index)
+        links.append({"type": validated.type, "url": urls[index], "score": validated.score, "rationale": validated.rationale})
+
+    return links, errors
+
+
 class CompiledPage(BaseModel):
     url: str = Field(..., description="URL de la pagina")
     title: str = Field(default="", description="Titulo de la pagina")
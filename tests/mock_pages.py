@@ -0,0 +1,53 @@
+# Paginas HTML sinteticas para tests y benchmarks, construidas con los datos offline.
+import html
+import re
+from utils.mock_responses import get_mock_compiled_content
+
+
+def split_compiled_pages(consolidated_text):
+    # El contenido consolidado separa cada pagina con una linea "--- url ---"
+    pages = []
+    for match in re.finditer(r"^--- (\S+) ---\n(.*?)(?=^--- \S+ ---$|\Z)", consolidated_text, re.S | re.M):
+        pages.append((match.group(1), match.group(2).strip()))
+    return pages
+
+
+def build_mock_html(url, text, repeat=1):
+    lines = [line for line in text.split("\n") if line.strip()] * repeat
+    title = html.escape(lines[0]) if lines else "Sin título"
+    
+    body = []
+    for i, line in enumerate(lines):
+        escaped = html.escape(line)
+        if i % 7 == 0:
+            body.append(f"<h2>{escaped}</h2>")
+        elif i % 5 == 0:
+            body.append(f"<ul><li>{escaped}</li></ul>")
+        elif i % 3 == 0:
+            body.append(f'<p>{escaped} <a href="/page-{i}">Ver mas</a></p>')
+        else:
+            body.append(f"<p>{escaped}</p>")
+    
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head><title>{title}</title><style>body {{ margin: 0; }}</style><script>var tracking = "<b>no</b>";</script></head>
+<body>
+<nav><a href="/">Home</a><a href="/about">About</a><a href="/careers">Careers</a></nav>
+<!-- contenido principal de {html.escape(url)} -->
+<main>
+{chr(10).join(body)}
+<img src="/logo.png" alt="logo"><noscript>Activa JavaScript</noscript>
+</main>
+<aside>Banner lateral</aside>
+<footer><a href="/privacy">Privacy</a> &copy; 2025 <a href="https://twitter.com/example">Twitter</a></footer>
+</body>
+</html>"""
+
+
+def get_mock_html_pages(tone="formal", repeat=1):
+    # Paginas HTML sinteticas reconstruidas a partir de los datos offline
+    pages = []
+    for page_type, consolidated_text in get_mock_compiled_content(tone).items():
+        for url, text in split_compiled_pages(consolidated_text):
+            pages.append((url, build_mock_html(url, text, repeat=repeat)))
+    return pages
@@ -0,0 +1,77 @@
+import pytest
+import json
+import batch
+
+
+class TestManifest:
+    
+    def test_load_csv_manifest(self, tmp_path):
+        manifest = tmp_path / "jobs.csv"
+        manifest.write_text("company,url,tone,language\nACME Corp,https://acme.com,humoristico,fr\nSin Tono,https://sintono.com,,\n", encoding="utf-8")
+        
+        jobs = batch.load_manifest(str(manifest))
+        
+        assert jobs[0] == {"id": "acme_corp", "company": "ACME Corp", "url": "https://acme.com", "tone": "humoristico", "language": "fr"}
+        assert jobs[1]["tone"] == "formal"
+        assert jobs[1]["language"] == "es"
+    
+    def test_load_jsonl_manifest_with_duplicate_ids(self, tmp_path):
+        manifest = tmp_path / "jobs.jsonl"
+        rows = [{"company": "Dup", "url": "https://a.com"}, {"company": "Dup", "url": "https://b.com"}]
+        manifest.write_text("\n".join(json.dumps(r) for r in rows), encoding="utf-8")
+        
+        jobs = batch.load_manifest(str(manifest))
+        
+        assert [job["id"] for job in jobs] == ["dup", "dup_2"]
+    
+    def test_missing_url_is_rejected(self, tmp_path):
+        manifest = tmp_path / "jobs.csv"
+        manifest.write_text("company,url\nSin URL,\n", encoding="utf-8")
+        
+        with pytest.raises(ValueError):
+            batch.load_manifest(str(manifest))
+
+
+class TestProgressAndSummary:
+    
+    def test_load_progress_keeps_last_record(self, tmp_path):
+        progress = tmp_path / "progress.jsonl"
+        progress.write_text(
+            json.dumps({"id": "a", "status": "failed"}) + "\n" + json.dumps({"id": "a", "status": "ok"}) + "\n",
+            encoding="utf-8"
+        )
+        
+        assert batch.load_progress(str(progress))["a"]["status"] == "ok"
+    
+    def test_summary_percentiles_and_throughput(self):
+        results = [{"id": str(i), "status": "ok", "latency": float(i)} for i in range(1, 21)]
+        results.append({"id": "x", "status": "failed", "latency": 0.0, "error": "boom"})
+        
+        summary = batch.summarize(results, elapsed=60.0)
+        
+        assert summary["jobs_per_minute"] == 21
+        assert summary["latency_p50"] == 10.0
+        assert summary["latency_p95"] == 19.0
+        assert summary["failures"] == [{"id": "x", "error": "boom"}]
+
+
+class TestRunJob:
+    
+    def test_mock_job_writes_isolated_outputs(self, monkeypatch):
+        from utils.utils import get_outputs_path
+        import os
+        import shutil
+        
+        monkeypatch.setattr(batch, "_worker_state", {"mock_mode": True})
+        settings = {"batch_dir": os.path.join("batch", "pytest"), "formats": ["md"],
+                    "model_writer": "gpt-4o-mini", "model_translator": "gpt-4o-mini"}
+        job = {"id": "mock_job", "company": "Mock", "url": "https://mock.com", "tone": "formal", "language": "en"}
+        
+        try:
+            result = batch.run_job(job, settings)
+            
+            assert result["status"] == "ok"
+            files = os.listdir(get_outputs_path(os.path.join("batch", "pytest", "mock_job")))
+            assert any(name.endswith("_brochure_original.md") for name in files)
+        finally:
+            shutil.rmtree(get_outputs_path(os.path.join("batch", "pytest")), ignore_errors=True)
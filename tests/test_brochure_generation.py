@@ -58,6 +58,86 @@ class TestBrochureGeneration:
         assert has_contact, "Falta seccion Contacto/Contact"
 
 
+class TestStreaming:
+    
+    BODY = "## Resumen\nTexto con `codigo` en linea.\n\n```python\nprint(1)\n```\n\n## Contacto\nFin."
+    
+    def strip_in_chunks(self, text, size):
+        from core.brochure import MarkdownFenceStripper
+        stripper = MarkdownFenceStripper()
+        parts = [stripper.feed(text[i:i + size]) for i in range(0, len(text), size)]
+        parts.append(stripper.finish())
+        return "".join(parts)
+    
+    def test_fence_stripper_any_chunking(self):
+        for wrapped in ["```markdown\n" + self.BODY + "\n```\n", "```\n" + self.BODY + "\n```", "\n" + self.BODY + "\n\n"]:
+            for size in [1, 2, 3, 7, 50, 1000]:
+                assert self.strip_in_chunks(wrapped, size) == self.BODY
+    
+    def test_stream_writes_file_and_records_first_token(self, tmp_path):
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+        from utils.metrics import metrics_tracker
+        
+        def chunk(content=None, usage=None):
+            choices = [SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=None)] if content else []
+            return SimpleNamespace(model="gpt-4o-mini", choices=choices, usage=usage)
+        
+        wrapped = "```markdown\n" + self.BODY + "\n```"
+        chunks = [chunk(wrapped[i:i + 5]) for i in range(0, len(wrapped), 5)]
+        chunks.append(chunk(usage=SimpleNamespace(prompt_tokens=10, completion_tokens=20, total_tokens=30)))
+        
+        generator = BrochureGenerator()
+        generator.openai_client.mock_mode = False
+        generator.openai_client.response_cache = False
+        generator.openai_client.client = MagicMock()
+        generator.openai_client.client.chat.completions.create.return_value = iter(chunks)
+        output_path = tmp_path / "folleto.md"
+        
+        streamed = list(generator.stream_brochure("Test", {"about page": "Texto"}, output_path=str(output_path)))
+        
+        assert len(streamed) > 1
+        assert "".join(streamed) == self.BODY
+        assert output_path.read_text(encoding="utf-8") == self.BODY
+        assert "Generar folleto con IA" in metrics_tracker.first_token_times
+        kwargs = generator.openai_client.client.chat.completions.create.call_args.kwargs
+        assert kwargs["stream"] is True
+    
+    def test_interrupted_stream_raises_and_marks_file(self, tmp_path, monkeypatch):
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+        from openai import APIConnectionError
+        from utils import api_openai
+        from utils.api_openai import StreamInterruptedError
+        limiter = MagicMock()
+        limiter.acquire.return_value = 0
+        monkeypatch.setattr(api_openai, "rate_limiter", limiter)
+        
+        def broken_stream():
+            for text in ("## Resumen\n", "Texto a medias"):
+                yield SimpleNamespace(model="gpt-4o-mini", usage=None,
+                                      choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=None)])
+            raise APIConnectionError(request=None)
+        
+        generator = BrochureGenerator()
+        generator.openai_client.mock_mode = False
+        generator.openai_client.response_cache = False
+        generator.openai_client.client = MagicMock()
+        generator.openai_client.client.chat.completions.create.return_value = broken_stream()
+        output_path = tmp_path / "folleto.md"
+        
+        streamed = []
+        with pytest.raises(StreamInterruptedError) as error:
+            for text in generator.stream_brochure("Test", {"about page": "Texto"}, max_tokens=1000, output_path=str(output_path)):
+                streamed.append(text)
+        
+        assert error.value.partial == "## Resumen\nTexto a medias"
+        assert not output_path.exists()
+        assert (tmp_path / "folleto.incomplete.md").read_text(encoding="utf-8") == "".join(streamed)
+        # La reserva de la cuota se liquida: solo queda cobrado el prompt y lo recibido
+        model, reserved, used = limiter.settle.call_args.args
+        assert used == reserved - 1000 + 2
+
 class TestExporters:
     
     def test_markdown_to_html(self):
@@ -0,0 +1,154 @@
+import pytest
+import queue
+import threading
+import time
+from utils.browser_pool import BrowserPool, BrowserWorker
+
+
+class FakePage:
+
+    def __init__(self):
+        self.closed = False
+        self.url = None
+
+    def goto(self, url, timeout=None, wait_until=None):
+        if "fail" in url:
+            raise RuntimeError("fallo de navegacion")
+        self.url = url
+
+    def wait_for_load_state(self, state, timeout=None):
+        pass
+
+    def content(self):
+        return f"<html><body>{self.url}</body></html>"
+
+    def is_closed(self):
+        return self.closed
+
+
+class FakeContext:
+    created = 0
+
+    def __init__(self):
+        FakeContext.created += 1
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_browser(monkeypatch):
+    FakeContext.created = 0
+
+    def fake_ensure_ready(self):
+        if self.context is None:
+            self.context = FakeContext()
+            self.page = None
+        if self.page is None:
+            self.page = FakePage()
+
+    monkeypatch.setattr(BrowserWorker, "_ensure_ready", fake_ensure_ready)
+    monkeypatch.setattr(BrowserWorker, "_shutdown", lambda self: self._recycle())
+
+
+class TestBrowserPool:
+
+    def test_get_content_reuses_worker(self, fake_browser):
+        pool = BrowserPool(max_pages=2)
+        try:
+            assert "https://a.com/1" in pool.get_content("https://a.com/1")
+            assert "https://a.com/2" in pool.get_content("https://a.com/2")
+            assert len(pool._workers) == 1
+            assert FakeContext.created == 1
+        finally:
+            pool.close()
+
+    def test_recycles_after_max_navigations(self, fake_browser):
+        pool = BrowserPool(max_pages=1, max_navigations=2)
+        try:
+            for i in range(5):
+                pool.get_content(f"https://a.com/{i}")
+            # Contextos: navegaciones 1-2, 3-4 y 5
+            assert FakeContext.created == 3
+        finally:
+            pool.close()
+
+    def test_failed_navigation_recycles_context(self, fake_browser):
+        pool = BrowserPool(max_pages=1)
+        try:
+            with pytest.raises(RuntimeError):
+                pool.get_content("https://a.com/fail")
+            pool.get_content("https://a.com/ok")
+            assert FakeContext.created == 2
+        finally:
+            pool.close()
+
+    def test_concurrent_leases_are_capped(self, fake_browser):
+        pool = BrowserPool(max_pages=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def work(i):
+            with pool.lease() as page:
+                with lock:
+                    active.append(i)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                page.get_content(f"https://a.com/{i}")
+                with lock:
+                    active.remove(i)
+
+        try:
+            threads = [threading.Thread(target=work, args=(i,)) for i in range(6)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            assert max(peak) <= 2
+            assert len(pool._workers) == 2
+        finally:
+            pool.close()
+
+    def test_worker_leased_during_close_is_not_reused(self, fake_browser):
+        pool = BrowserPool(max_pages=1)
+        try:
+            with pool.lease() as page:
+                leased = page._worker
+                pool.configure(max_pages=1)
+            assert pool._idle == []
+            pool.get_content("https://a.com/1")
+            assert pool._workers[0] is not leased
+        finally:
+            pool.close()
+
+    def test_close_wakes_waiting_leases(self, fake_browser):
+        pool = BrowserPool(max_pages=1)
+        results = []
+
+        def wait_for_page():
+            results.append(pool.get_content("https://a.com/espera"))
+
+        try:
+            with pool.lease():
+                waiter = threading.Thread(target=wait_for_page)
+                waiter.start()
+                time.sleep(0.05)
+                pool.close()
+                waiter.join(timeout=2)
+            assert not waiter.is_alive()
+            assert "https://a.com/espera" in results[0]
+        finally:
+            pool.close()
+
+    def test_lease_timeout(self, fake_browser):
+        pool = BrowserPool(max_pages=1)
+        try:
+            with pool.lease():
+                with pytest.raises(queue.Empty):
+                    with pool.lease(timeout=0.05):
+                        pass
+        finally:
+            pool.close()
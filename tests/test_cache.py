@@ -1,10 +1,18 @@
+import json
 import pytest
 import os
+import time
+import responses
 from utils.cache_manager import CacheManager
+from utils.cache_store import CacheStore
 
 
 class TestCacheManager:
     
+    @pytest.fixture(autouse=True)
+    def store(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(CacheManager, "_store", CacheStore(str(tmp_path / "cache.sqlite3")))
+    
     def test_get_cache_filename(self):
         url = "https://example.com/page"
         filename = CacheManager.get_cache_filename(url)
@@ -30,6 +38,122 @@ class TestCacheManager:
         # Recién guardado, debe ser válido
         assert CacheManager.is_cache_valid(test_url, max_age_hours=1)
 
+    def test_cache_age(self):
+        test_url = "https://test-age.com"
+        CacheManager.save_to_cache(test_url, "<html>x</html>")
+        
+        assert CacheManager.get_cache_age(test_url) == "0h 0m"
+        assert CacheManager.get_cache_age("https://never-cached.com") is None
+
+
+class TestCacheStore:
+    
+    def test_roundtrip_is_compressed(self, tmp_path):
+        store = CacheStore(str(tmp_path / "cache.sqlite3"))
+        content = "<html><body>" + "Contenido repetido " * 500 + "</body></html>"
+        
+        store.put("k1", content, url="https://a.com", meta={"etag": '"x"'})
+        entry = store.get("k1")
+        stats = store.stats()
+        
+        assert entry["content"] == content
+        assert entry["meta"] == {"etag": '"x"'}
+        assert stats["bytes"] < stats["raw_bytes"] / 10
+    
+    def test_lru_eviction_respects_budget(self, tmp_path):
+        store = CacheStore(str(tmp_path / "cache.sqlite3"), max_bytes=1500, ttl_hours=0)
+        # Contenido aleatorio para que la compresion no lo reduzca
+        blobs = {key: os.urandom(600).hex() for key in ["a", "b", "c"]}
+        
+        store.put("a", blobs["a"])
+        store.put("b", blobs["b"])
+        store.get("a")  # "a" pasa a ser la mas reciente
+        store.put("c", blobs["c"])
+        
+        assert store.get("b") is None
+        assert store.get("a") is not None
+        assert store.get("c") is not None
+        assert store.stats()["bytes"] <= 1500
+    
+    def test_ttl_eviction(self, tmp_path):
+        store = CacheStore(str(tmp_path / "cache.sqlite3"), ttl_hours=1)
+        
+        store.put("old", "viejo", stored_at=time.time() - 2 * 3600)
+        store.put("new", "nuevo")
+        
+        assert store.get("old") is None
+        assert store.get("new")["content"] == "nuevo"
+    
+    def test_hit_rate(self, tmp_path):
+        store = CacheStore(str(tmp_path / "cache.sqlite3"))
+        
+        store.incr("hits", 3)
+        store.incr("revalidated")
+        store.incr("misses", 4)
+        
+        assert store.stats()["hit_rate"] == 0.5
+
+
+class TestParsedContentCache:
+    
+    HTML = "<html><head><title>Parsed</title></head><body><p>Texto de prueba para la cache de contenido</p><a href='/about'>About</a></body></html>"
+    
+    @pytest.fixture(autouse=True)
+    def store(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(CacheManager, "_store", CacheStore(str(tmp_path / "cache.sqlite3")))
+    
+    def test_unchanged_html_skips_parsing(self, monkeypatch):
+        from core.scraping import Web
+        calls = []
+        original_extract = Web.extract.__func__
+        
+        def counting_extract(cls, text, extractor=None):
+            calls.append(text)
+            return original_extract(cls, text, extractor=extractor)
+        
+        monkeypatch.setattr(Web, "extract", classmethod(counting_extract))
+        html = self.HTML.replace("prueba", f"prueba {time.time()}")
+        
+        first = Web.clean_text(html, use_cache=True)
+        second = Web.clean_text(html, use_cache=True)
+        
+        assert len(calls) == 1
+        assert first == second
+        assert second[2] == ["/about"]
+    
+    def test_new_extractor_version_invalidates(self, monkeypatch):
+        from core.scraping import Web
+        html = self.HTML.replace("prueba", f"version {time.time()}")
+        
+        Web.clean_text(html, use_cache=True)
+        monkeypatch.setattr(Web, "_extractor_versions", {Web.extractor.name: "otra-version"})
+        content_hash = CacheManager.get_content_hash(html)
+        
+        assert CacheManager.load_parsed(content_hash, "otra-version") is None
+        Web.clean_text(html, use_cache=True)
+        assert CacheManager.load_parsed(content_hash, "otra-version") is not None
+    
+    def test_cache_is_opt_in(self):
+        from core.scraping import Web
+        html = self.HTML.replace("prueba", f"sin cache {time.time()}")
+        
+        Web.clean_text(html)
+        
+        assert CacheManager.get_store().stats()["parsed_misses"] == 0
+        assert CacheManager.load_parsed(CacheManager.get_content_hash(html), Web.get_extractor_version()) is None
+    
+    def test_extractor_per_call_does_not_change_default(self):
+        from core.scraping import Web
+        html = self.HTML.replace("prueba", f"extractor {time.time()}")
+        default = Web.extractor
+        
+        parsed = Web.clean_text(html, use_cache=True, extractor="lxml")
+        
+        assert Web.extractor is default
+        assert parsed == Web.clean_text(html, use_cache=True)
+        assert Web.get_extractor_version("lxml").startswith("lxml-")
+        assert CacheManager.load_parsed(CacheManager.get_content_hash(html), Web.get_extractor_version("lxml")) is not None
+
 
 class TestLanguageDetector:
     
@@ -55,4 +179,250 @@ class TestLanguageDetector:
         text = "Hi"
         lang = detect_language(text)
         
-        assert lang == "en"
\ No newline at end of file
+        assert lang == "en"
+
+class TestConditionalRevalidation:
+    
+    @pytest.fixture(autouse=True)
+    def store(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(CacheManager, "_store", CacheStore(str(tmp_path / "cache.sqlite3")))
+    
+    def make_stale(self, url):
+        CacheManager.get_store().connection().execute(
+            "UPDATE pages SET stored_at = ? WHERE key = ?",
+            (time.time() - 48 * 3600, CacheManager.get_cache_key(url))
+        )
+    
+    def test_parse_validators(self):
+        headers = {
+            "ETag": '"abc123"',
+            "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+            "Cache-Control": "public, max-age=600"
+        }
+        
+        validators = CacheManager.parse_validators(headers)
+        
+        assert validators == {
+            "etag": '"abc123"',
+            "last_modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+            "max_age": 600
+        }
+    
+    def test_server_max_age_shortens_validity(self):
+        test_url = "https://test-max-age.com"
+        CacheManager.save_to_cache(test_url, "<html>x</html>", {"etag": '"v1"', "max_age": 0})
+        
+        assert not CacheManager.is_cache_valid(test_url, max_age_hours=12)
+        assert CacheManager.has_validators(test_url)
+    
+    @responses.activate
+    def test_not_modified_refreshes_entry(self, monkeypatch):
+        from core.scraping import Web
+        from utils.robots_checker import robots_checker
+        monkeypatch.setattr(robots_checker, "can_fetch", lambda url: True)
+        
+        test_url = "https://test-revalidate-304.com/"
+        CacheManager.save_to_cache(test_url, "<html>Cached</html>", {"etag": '"v1"'})
+        self.make_stale(test_url)
+        
+        responses.add(
+            responses.GET, test_url, status=304,
+            match=[responses.matchers.header_matcher({"If-None-Match": '"v1"'})]
+        )
+        
+        html = Web.get_data_with_cache(test_url, use_cache=True)
+        
+        assert html == "<html>Cached</html>"
+        assert len(responses.calls) == 1
+        assert CacheManager.is_cache_valid(test_url, max_age_hours=1)
+    
+    @responses.activate
+    def test_modified_replaces_entry(self, monkeypatch):
+        from core.scraping import Web
+        from utils.robots_checker import robots_checker
+        monkeypatch.setattr(robots_checker, "can_fetch", lambda url: True)
+        
+        test_url = "https://test-revalidate-200.com/"
+        CacheManager.save_to_cache(test_url, "<html>Old</html>", {"last_modified": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        self.make_stale(test_url)
+        
+        responses.add(responses.GET, test_url, body="<html>New</html>", headers={"ETag": '"v2"'})
+        
+        html = Web.get_data_with_cache(test_url, use_cache=True)
+        
+        assert html == "<html>New</html>"
+        assert responses.calls[0].request.headers["If-Modified-Since"] == "Wed, 21 Oct 2015 07:28:00 GMT"
+        assert CacheManager.load_from_cache(test_url) == "<html>New</html>"
+        assert CacheManager.load_validators(test_url)["etag"] == '"v2"'
+
+
+class TestLlmResponseCache:
+    
+    MESSAGES = [{"role": "user", "content": "Describe la empresa"}]
+    
+    def make_client(self, monkeypatch, tmp_path, max_temperature=0.5):
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+        from utils.api_openai import OpenAIClient
+        
+        monkeypatch.setattr(CacheManager, "_store", CacheStore(str(tmp_path / "cache.sqlite3")))
+        monkeypatch.setattr(OpenAIClient, "response_cache", True)
+        monkeypatch.setattr(OpenAIClient, "cache_max_temperature", max_temperature)
+        monkeypatch.setattr(OpenAIClient, "cache_ttl_hours", 24)
+        monkeypatch.setattr(OpenAIClient, "base_url", None)
+        
+        completion = SimpleNamespace(
+            model="gpt-4o-mini",
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Folleto"), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=50, total_tokens=150)
+        )
+        client = OpenAIClient.__new__(OpenAIClient)
+        client.mock_mode = False
+        client.client = MagicMock()
+        client.client.chat.completions.create.return_value = completion
+        return client
+    
+    def test_repeated_call_is_served_from_cache(self, monkeypatch, tmp_path):
+        from utils.metrics import metrics_tracker
+        client = self.make_client(monkeypatch, tmp_path)
+        saved_before = metrics_tracker.llm_cache["tokens_saved"]
+        
+        first = client.call_openai(self.MESSAGES, temperature=0.3)
+        second = client.call_openai(self.MESSAGES, temperature=0.3)
+        
+        assert second == first
+        assert client.client.chat.completions.create.call_count == 1
+        assert metrics_tracker.llm_cache["tokens_saved"] - saved_before == 150
+        stats = CacheManager.get_store().stats()
+        assert (stats["response_hits"], stats["response_misses"], stats["response_tokens_saved"]) == (1, 1, 150)
+    
+    def test_key_depends_on_request(self, monkeypatch, tmp_path):
+        client = self.make_client(monkeypatch, tmp_path)
+        
+        client.call_openai(self.MESSAGES, temperature=0.3)
+        client.call_openai(self.MESSAGES, temperature=0.3, max_tokens=500)
+        client.call_openai(self.MESSAGES, model="gpt-4o", temperature=0.3)
+        
+        assert client.client.chat.completions.create.call_count == 3
+    
+    def test_other_endpoint_does_not_share_entries(self, monkeypatch, tmp_path):
+        from utils.api_openai import OpenAIClient
+        client = self.make_client(monkeypatch, tmp_path)
+        
+        monkeypatch.setattr(OpenAIClient, "base_url", "http://127.0.0.1:8800/v1")
+        client.call_openai(self.MESSAGES, temperature=0.3)
+        monkeypatch.setattr(OpenAIClient, "base_url", None)
+        client.call_openai(self.MESSAGES, temperature=0.3)
+        
+        assert client.client.chat.completions.create.call_count == 2
+    
+    def test_opt_out_is_per_client(self, monkeypatch, tmp_path):
+        from unittest.mock import MagicMock
+        from utils.api_openai import OpenAIClient
+        shared = self.make_client(monkeypatch, tmp_path)
+        session = OpenAIClient(response_cache=False)
+        session.mock_mode = False
+        session.client = MagicMock()
+        session.client.chat.completions.create.return_value = shared.client.chat.completions.create.return_value
+        
+        shared.call_openai(self.MESSAGES, temperature=0.3)
+        session.call_openai(self.MESSAGES, temperature=0.3)
+        
+        # Otra sesion sin cache no la lee ni cambia el valor de los demas clientes
+        assert session.client.chat.completions.create.call_count == 1
+        assert OpenAIClient.response_cache is True
+        shared.call_openai(self.MESSAGES, temperature=0.3)
+        assert shared.client.chat.completions.create.call_count == 1
+    
+    def test_high_temperature_bypasses_cache_unless_forced(self, monkeypatch, tmp_path):
+        client = self.make_client(monkeypatch, tmp_path, max_temperature=0.5)
+        
+        client.call_openai(self.MESSAGES, temperature=0.7)
+        client.call_openai(self.MESSAGES, temperature=0.7)
+        assert client.client.chat.completions.create.call_count == 2
+        
+        client.call_openai(self.MESSAGES, temperature=0.7, force_cache=True)
+        client.call_openai(self.MESSAGES, temperature=0.7, force_cache=True)
+        assert client.client.chat.completions.create.call_count == 3
+    
+    def test_expired_response_is_ignored(self, monkeypatch, tmp_path):
+        client = self.make_client(monkeypatch, tmp_path)
+        
+        client.call_openai(self.MESSAGES, temperature=0.3)
+        CacheManager.get_store().connection().execute("UPDATE responses SET stored_at = ?", (time.time() - 48 * 3600,))
+        client.call_openai(self.MESSAGES, temperature=0.3)
+        
+        assert client.client.chat.completions.create.call_count == 2
+
+
+class TestLinkSelectionCache:
+    
+    BASE = "https://acme.com"
+    LINKS = [f"https://acme.com/pagina-{i}" for i in range(10)]
+    
+    class FakeClient:
+        
+        def __init__(self):
+            self.calls = []
+        
+        def call_openai(self, messages, **kwargs):
+            # Selecciona todos los enlaces del mensaje de usuario
+            urls = [line.strip()[2:] for line in messages[-1]["content"].split("\n") if line.strip().startswith("- ")]
+            self.calls.append(urls)
+            links = [{"type": "about page", "url": url, "score": 70, "rationale": "Prueba"} for url in urls]
+            return {"response": json.dumps({"links": links}), "tokens": {"total": 10}}
+    
+    def make_selector(self, monkeypatch, tmp_path):
+        from core.link_ranker import link_ranker
+        from core.link_selector import LinkSelector
+        from utils.api_openai import OpenAIClient
+        monkeypatch.setattr(CacheManager, "_store", CacheStore(str(tmp_path / "cache.sqlite3")))
+        monkeypatch.setattr(OpenAIClient, "base_url", None)
+        monkeypatch.setattr(link_ranker, "mode", "llm")
+        monkeypatch.setattr(LinkSelector, "cache_ttl_hours", 24)
+        monkeypatch.setattr(LinkSelector, "min_overlap", 0.8)
+        monkeypatch.setattr(LinkSelector, "output_mode", "json")
+        selector = LinkSelector.__new__(LinkSelector)
+        selector.openai_client = self.FakeClient()
+        return selector
+    
+    def test_same_link_set_is_served_from_cache(self, monkeypatch, tmp_path):
+        selector = self.make_selector(monkeypatch, tmp_path)
+        
+        first = selector.select_relevant_links(self.BASE, self.LINKS)
+        second = selector.select_relevant_links(self.BASE, list(reversed(self.LINKS)))
+        
+        assert second == first
+        assert len(selector.openai_client.calls) == 1
+        assert CacheManager.get_store().stats()["selection_hits"] == 1
+    
+    def test_other_endpoint_does_not_share_selection(self, monkeypatch, tmp_path):
+        from utils.api_openai import OpenAIClient
+        selector = self.make_selector(monkeypatch, tmp_path)
+        
+        monkeypatch.setattr(OpenAIClient, "base_url", "http://127.0.0.1:8800/v1")
+        selector.select_relevant_links(self.BASE, self.LINKS)
+        monkeypatch.setattr(OpenAIClient, "base_url", None)
+        selector.select_relevant_links(self.BASE, self.LINKS)
+        
+        assert len(selector.openai_client.calls) == 2
+    
+    def test_partial_overlap_only_judges_new_links(self, monkeypatch, tmp_path):
+        selector = self.make_selector(monkeypatch, tmp_path)
+        selector.select_relevant_links(self.BASE, self.LINKS[:9])
+        
+        result = selector.select_relevant_links(self.BASE, self.LINKS)
+        
+        assert selector.openai_client.calls[1] == [self.LINKS[9]]
+        assert self.LINKS[9] in [link["url"] for link in result["links"]]
+        assert CacheManager.get_store().stats()["selection_partial"] == 1
+    
+    def test_changed_link_set_invalidates(self, monkeypatch, tmp_path):
+        selector = self.make_selector(monkeypatch, tmp_path)
+        selector.select_relevant_links(self.BASE, self.LINKS)
+        
+        other_links = [f"https://acme.com/nueva-{i}" for i in range(10)]
+        result = selector.select_relevant_links(self.BASE, other_links)
+        
+        assert selector.openai_client.calls[1] == other_links
+        assert {link["url"] for link in result["links"]} == set(other_links)
@@ -0,0 +1,185 @@
+import pytest
+import threading
+import time
+from core import scraping
+from core.compiler import Compiler
+from utils.host_scheduler import HostScheduler
+
+
+def fake_clean_text(html, use_cache=False, extractor=None):
+    return ["Titulo", html, []]
+
+
+class TestCompilePages:
+
+    def test_keeps_original_link_order(self, monkeypatch):
+        # Las paginas mas lentas van primero para forzar que terminen las ultimas
+        delays = {"https://a.com/about": 0.2, "https://b.com/careers": 0.1, "https://c.com/about-team": 0.0}
+
+        def fake_get(url, use_cache=False):
+            time.sleep(delays[url])
+            return f"contenido de {url} " * 10
+
+        monkeypatch.setattr(scraping.Web, "get_data_with_cache", fake_get)
+        monkeypatch.setattr(scraping.Web, "clean_text", fake_clean_text)
+
+        selected = {"links": [
+            {"type": "about", "url": "https://a.com/about", "score": 90},
+            {"type": "careers", "url": "https://b.com/careers", "score": 80},
+            {"type": "about", "url": "https://c.com/about-team", "score": 70}
+        ]}
+
+        compiled = Compiler.compile_pages(selected, delay=0, max_workers=3)
+
+        assert list(compiled.keys()) == ["about", "careers"]
+        assert [p["url"] for p in compiled["about"]] == ["https://a.com/about", "https://c.com/about-team"]
+
+    def test_skipped_links_do_not_wait(self, monkeypatch):
+        fetched = []
+
+        def fake_get(url, use_cache=False):
+            fetched.append(url)
+            return "x" * 200
+
+        monkeypatch.setattr(scraping.Web, "get_data_with_cache", fake_get)
+        monkeypatch.setattr(scraping.Web, "clean_text", fake_clean_text)
+
+        selected = {"links": [
+            {"type": "legal", "url": "https://a.com/terms", "score": 10},
+            {"type": "blog", "url": "https://a.com/blog", "score": 20},
+            {"type": "about", "url": "https://a.com/about", "score": 95}
+        ]}
+
+        start = time.time()
+        compiled = Compiler.compile_pages(selected, delay=1.0)
+
+        assert time.time() - start < 0.5
+        assert fetched == ["https://a.com/about"]
+        assert list(compiled.keys()) == ["about"]
+
+    def test_failed_download_is_omitted(self, monkeypatch):
+        monkeypatch.setattr(scraping.Web, "get_data_with_cache", lambda url, use_cache=False: None)
+
+        selected = {"links": [{"type": "about", "url": "https://a.com/about", "score": 95}]}
+
+        assert Compiler.compile_pages(selected, delay=0) == {}
+
+
+class TestHostScheduler:
+
+    def test_min_interval_per_host(self):
+        scheduler = HostScheduler(per_host_concurrency=2, min_interval=0.1)
+        starts = []
+
+        for _ in range(3):
+            with scheduler.slot("https://a.com/page"):
+                starts.append(time.monotonic())
+
+        assert starts[1] - starts[0] >= 0.09
+        assert starts[2] - starts[1] >= 0.09
+
+    def test_different_hosts_do_not_wait(self):
+        scheduler = HostScheduler(min_interval=1.0)
+
+        start = time.monotonic()
+        with scheduler.slot("https://a.com/"):
+            pass
+        with scheduler.slot("https://b.com/"):
+            pass
+
+        assert time.monotonic() - start < 0.5
+
+    def test_per_host_concurrency_limit(self):
+        scheduler = HostScheduler(per_host_concurrency=1, min_interval=0)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def work():
+            with scheduler.slot("https://a.com/"):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert max(peak) == 1
+
+
+class TestDeduplication:
+
+    BOILERPLATE = "Aceptar cookies\nInicio | Productos | Contacto\n(c) 2024 Ejemplo S.A."
+
+    def make_page(self, url, body):
+        return {"url": url, "title": "Titulo", "content": f"{self.BOILERPLATE}\n{body}"}
+
+    def test_repeated_lines_are_kept_once(self):
+        from core.dedup import Deduplicator
+        compiled = {
+            "about": [self.make_page("https://a.com/about", "Somos una empresa de analitica fundada en 2010.")],
+            "careers": [self.make_page("https://a.com/careers", "Buscamos ingenieros de datos con experiencia.")],
+            "products": [self.make_page("https://a.com/products", "Nuestra plataforma procesa millones de eventos.")]
+        }
+
+        result, stats = Deduplicator().deduplicate(compiled)
+
+        assert result["about"][0]["content"].count("Aceptar cookies") == 1
+        assert "Aceptar cookies" not in result["careers"][0]["content"]
+        assert "Buscamos ingenieros" in result["careers"][0]["content"]
+        assert stats["boilerplate_lines"] == 3
+        assert stats["chars_removed"] > 0 and stats["tokens_removed"] > 0
+
+    def test_near_duplicate_pages_are_collapsed(self):
+        from core.dedup import Deduplicator
+        text = " ".join(f"frase numero {i} sobre la mision de la empresa y sus valores." for i in range(60))
+        compiled = {
+            "about": [
+                {"url": "https://a.com/about", "title": "", "content": text},
+                {"url": "https://a.com/en/about", "title": "", "content": text + " Ultima actualizacion: ayer."}
+            ],
+            "careers": [{"url": "https://a.com/careers", "title": "", "content": "Trabaja con nosotros en remoto. " * 20}]
+        }
+
+        result, stats = Deduplicator().deduplicate(compiled)
+
+        assert [p["url"] for p in result["about"]] == ["https://a.com/about"]
+        assert len(result["careers"]) == 1
+        assert stats["duplicate_pages"] == 1
+
+    def test_short_pages_are_not_all_candidates(self):
+        import random
+        from core.dedup import Deduplicator
+        rng = random.Random(7)
+        vocabulary = [f"palabra{i}" for i in range(5000)]
+        pages = [{"url": f"https://a.com/{i}", "title": "", "content": " ".join(rng.choices(vocabulary, k=15))}
+                 for i in range(1000)]
+        pages.append(dict(pages[0], url="https://a.com/copia"))
+        dedup = Deduplicator()
+        comparisons = []
+        estimate = dedup.similarity_estimate
+        dedup.similarity_estimate = lambda first, second: comparisons.append(1) or estimate(first, second)
+
+        duplicates = dedup.find_near_duplicates(pages)
+
+        assert duplicates == {1000: 0}
+        # Sin bandas vacias en los cubos las comparaciones no crecen con el cuadrado de las paginas
+        assert len(comparisons) < len(pages)
+
+    def test_consolidate_uses_deduplicated_pages(self):
+        compiled = {
+            "about": [self.make_page("https://a.com/about", "Somos una empresa de analitica.")],
+            "careers": [self.make_page("https://a.com/careers", "Buscamos ingenieros.")],
+            "contact": [self.make_page("https://a.com/contact", "Escribenos a hola@a.com.")]
+        }
+
+        consolidated = Compiler.consolidate_by_type(compiled)
+
+        assert sum(text.count("Aceptar cookies") for text in consolidated.values()) == 1
+        assert "--- https://a.com/careers ---" in consolidated["careers"]
@@ -0,0 +1,140 @@
+import pytest
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from utils.cost_ledger import CostLedger, BudgetExceededError
+from utils.metrics import MetricsRegistry, MetricsTracker
+
+
+def make_completion(model="gpt-4o-mini", cached_tokens=0):
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(message=SimpleNamespace(content="Respuesta"), finish_reason="stop")],
+        usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=500, total_tokens=1500,
+                              prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens))
+    )
+
+
+class TestCostLedger:
+
+    def test_pricing_table_covers_ui_models(self):
+        ledger = CostLedger()
+
+        for model in ("gpt-4o-mini", "gpt-4-turbo", "gpt-3.5-turbo"):
+            assert ledger.cost(model, 1000, 1000) > 0
+        assert ledger.cost("gpt-3.5-turbo", 1000000, 0) == pytest.approx(0.5)
+
+    def test_dated_snapshot_uses_longest_prefix(self):
+        ledger = CostLedger()
+
+        assert ledger.cost("gpt-4o-mini-2024-07-18", 1000, 0) == ledger.cost("gpt-4o-mini", 1000, 0)
+        assert ledger.cost("gpt-4-turbo-2024-04-09", 1000, 0) == ledger.cost("gpt-4-turbo", 1000, 0)
+        assert ledger.cost("modelo-inventado", 1000, 1000) == 0
+
+    def test_default_table_does_not_price_other_models_by_prefix(self, tmp_path):
+        ledger = CostLedger(pricing_path=str(tmp_path / "sin-tabla.json"))
+
+        assert ledger.cost("gpt-4.1", 1000000, 0) == pytest.approx(2.0)
+        assert ledger.cost("gpt-4.1-mini-2025-04-14", 1000000, 0) == pytest.approx(0.4)
+        assert ledger.cost("gpt-4-turbo-preview", 1000000, 0) == pytest.approx(10.0)
+        assert ledger.cost("gpt-4-0613", 1000000, 0) == pytest.approx(30.0)
+        # Modelo desconocido con prefijo conocido: aviso y coste 0, no el precio de gpt-4
+        assert ledger.get_price("gpt-4.5-preview") is None
+        assert "gpt-4.5-preview" in ledger._warned
+
+    def test_cached_prompt_tokens_are_cheaper(self, tmp_path):
+        path = tmp_path / "pricing.json"
+        path.write_text(json.dumps({"unit_tokens": 1000, "models": {"m": {"input": 1.0, "cached_input": 0.25, "output": 2.0}}}))
+        ledger = CostLedger(pricing_path=str(path))
+
+        assert ledger.cost("m", 1000, 500, cached_tokens=400) == pytest.approx(0.6 + 0.1 + 1.0)
+
+    def test_run_ceiling_aborts(self):
+        ledger = CostLedger()
+        ledger.configure(max_run_cost=0.01)
+
+        assert ledger.authorize("gpt-4o-mini", 1000, 1000, run_spent=0.0)[0] == "gpt-4o-mini"
+        with pytest.raises(BudgetExceededError):
+            ledger.authorize("gpt-4", 1000, 1000, run_spent=0.0)
+
+    def test_downgrade_picks_cheaper_model(self):
+        ledger = CostLedger()
+        ledger.configure(max_run_cost=0.01, action="downgrade")
+
+        model, reserved = ledger.authorize("gpt-4", 1000, 1000)
+
+        assert model == "gpt-4o-mini"
+        assert reserved == pytest.approx(ledger.cost("gpt-4o-mini", 1000, 1000))
+
+    def test_batch_ceiling_counts_reservations_until_settled(self):
+        ledger = CostLedger()
+        ledger.configure(max_batch_cost=0.001)
+        estimate = ledger.cost("gpt-4o-mini", 1000, 1000)
+
+        _, first = ledger.authorize("gpt-4o-mini", 1000, 1000)
+        assert ledger.get_batch_spent() == pytest.approx(estimate)
+        with pytest.raises(BudgetExceededError):
+            ledger.authorize("gpt-4o-mini", 1000, 1000)
+
+        ledger.settle(first, 0.0)
+        assert ledger.get_batch_spent() == pytest.approx(0.0)
+        assert ledger.authorize("gpt-4o-mini", 1000, 1000)[0] == "gpt-4o-mini"
+
+
+class TestCostTracking:
+
+    @pytest.fixture
+    def ledger(self, monkeypatch):
+        from utils import metrics
+        ledger = CostLedger()
+        monkeypatch.setattr(metrics, "cost_ledger", ledger)
+        return ledger
+
+    def test_stage_ledger_and_report(self, ledger, tmp_path):
+        tracker = MetricsTracker(registry=MetricsRegistry())
+        tracker.start()
+
+        with tracker.llm_stage("Traduccion (fr)"):
+            tracker.add_tokens("gpt-4-turbo", 1000, 200, cached_tokens=0)
+            tracker.add_tokens("gpt-4-turbo", 500, 100)
+        with tracker.llm_stage("Seleccion de enlaces con IA"):
+            tracker.add_tokens("gpt-4o-mini", 2000, 100, cached_tokens=1024)
+
+        entry = tracker.stage_costs["Traduccion (fr)"]
+        assert entry["calls"] == 2
+        assert entry["prompt_tokens"] == 1500
+        assert entry["completion_tokens"] == 300
+        assert entry["models"] == {"gpt-4-turbo": 2}
+        assert entry["cost"] == pytest.approx(ledger.cost("gpt-4-turbo", 1500, 300))
+        assert tracker.stage_costs["Seleccion de enlaces con IA"]["cached_tokens"] == 1024
+
+        path = tmp_path / "costs.json"
+        tracker.finish(report_path=str(path))
+        report = json.loads(path.read_text(encoding="utf-8"))
+        assert report["currency"] == "USD"
+        assert report["tokens"] == {"prompt": 3500, "completion": 400, "cached": 1024}
+        assert set(report["stages"]) == {"Traduccion (fr)", "Seleccion de enlaces con IA"}
+        assert report["total_cost"] == pytest.approx(tracker.total_cost)
+
+    def test_client_downgrades_before_calling_api(self, ledger, monkeypatch):
+        from utils.api_openai import OpenAIClient
+        from utils import api_openai
+        from utils.rate_limiter import RateLimiter
+        monkeypatch.setattr(api_openai, "rate_limiter", RateLimiter())
+        monkeypatch.setattr(OpenAIClient, "response_cache", False)
+        ledger.configure(max_run_cost=0.01, action="downgrade")
+        tracker = MetricsTracker(registry=MetricsRegistry())
+        monkeypatch.setattr(api_openai, "metrics_tracker", tracker)
+        tracker.start()
+
+        client = OpenAIClient.__new__(OpenAIClient)
+        client.mock_mode = False
+        client.client = MagicMock()
+        client.client.chat.completions.create.return_value = make_completion(cached_tokens=512)
+
+        client.call_openai([{"role": "user", "content": "Hola " * 2000}], model="gpt-4", max_tokens=1000)
+
+        assert client.client.chat.completions.create.call_args.kwargs["model"] == "gpt-4o-mini"
+        assert tracker.get_summary()["downgrades"] == [{"stage": None, "from": "gpt-4", "to": "gpt-4o-mini"}]
+        assert tracker.current.reserved_cost == pytest.approx(0.0)
+        assert tracker.current.tokens["cached"] == 512
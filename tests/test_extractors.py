@@ -0,0 +1,43 @@
+import pytest
+from core.extractors import get_extractor, EXTRACTORS, MAX_TEXT_CHARS
+from mock_pages import get_mock_html_pages
+
+
+def as_plain(result):
+    title, text, links = result
+    return [str(title) if title is not None else None, text, links]
+
+
+class TestExtractorEquivalence:
+    
+    @pytest.mark.parametrize("tone", ["formal", "humoristico"])
+    def test_backends_match_on_offline_fixtures(self, tone):
+        reference = get_extractor("bs4")
+        pages = get_mock_html_pages(tone)
+        assert pages
+        
+        for name in EXTRACTORS:
+            extractor = get_extractor(name)
+            for url, html in pages:
+                assert as_plain(extractor.extract(html)) == as_plain(reference.extract(html)), f"{name} difiere en {url}"
+    
+    @pytest.mark.parametrize("html", [
+        "<html><head><title>T &amp; C</title></head><body>a<!-- oculto --> b<p>x<nav>menu</nav>cola</p></body></html>",
+        "<html><body><div>Uno<script>var x = 1;</script>Dos</div><a href=''>vacio</a><a>sin href</a></body></html>",
+        "<html><head><title></title></head><body><p>  espacios  </p><svg><text>no</text></svg><footer><a href='/f'>pie</a></footer></body></html>"
+    ])
+    def test_backends_match_on_edge_cases(self, html):
+        reference = as_plain(get_extractor("bs4").extract(html))
+        
+        for name in EXTRACTORS:
+            assert as_plain(get_extractor(name).extract(html)) == reference
+    
+    def test_text_is_truncated(self):
+        html = "<html><body>" + "<p>linea de texto</p>" * 4000 + "</body></html>"
+        
+        for name in EXTRACTORS:
+            assert len(get_extractor(name).extract(html)[1]) == MAX_TEXT_CHARS
+    
+    def test_unknown_extractor(self):
+        with pytest.raises(ValueError):
+            get_extractor("desconocido")
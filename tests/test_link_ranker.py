@@ -0,0 +1,192 @@
+import json
+import pytest
+from core.link_ranker import LinkRanker
+from core.extractors import extract_anchors
+
+BASE = "https://acme.com"
+
+OBVIOUS_LINKS = [
+    "https://acme.com/",
+    "https://acme.com/about-us",
+    "https://acme.com/products",
+    "https://acme.com/customers",
+    "https://www.acme.com/es/carreras",
+    "https://acme.com/contact",
+    "https://acme.com/login",
+    "https://acme.com/privacy-policy",
+    "https://twitter.com/acme",
+    "https://acme.com/blog/2023/05/una-noticia"
+]
+
+
+class TestLinkRanker:
+
+    def test_obvious_pages_rank_first_and_noise_is_dropped(self):
+        ranked = LinkRanker().rank(BASE, OBVIOUS_LINKS)
+        urls = [link["url"] for link in ranked]
+
+        assert urls[0] == "https://acme.com/about-us"
+        assert "https://acme.com/login" not in urls
+        assert "https://acme.com/privacy-policy" not in urls
+        assert "https://twitter.com/acme" not in urls
+        assert {link["type"] for link in ranked[:4]} == {"about page", "products page", "customers page", "careers page"}
+
+    def test_anchor_text_classifies_opaque_paths(self):
+        ranked = LinkRanker().rank(BASE, ["https://acme.com/p/123"], {"/p/123": "Trabaja con nosotros"})
+
+        assert ranked[0]["type"] == "careers page"
+        assert "Trabaja con nosotros" in ranked[0]["rationale"]
+
+    def test_confident_selection_has_validated_shape(self):
+        ranker = LinkRanker()
+
+        selected = ranker.select(ranker.rank(BASE, OBVIOUS_LINKS))
+
+        assert selected is not None and 5 <= len(selected) <= 10
+        assert all(set(link) == {"type", "url", "score", "rationale"} for link in selected)
+        assert all(link["score"] >= 60 for link in selected)
+
+    def test_ambiguous_site_needs_the_llm(self):
+        ranker = LinkRanker(top_k=3)
+        links = [f"https://acme.com/seccion-{i}" for i in range(10)] + ["https://acme.com/about"]
+        ranked = ranker.rank(BASE, links)
+
+        assert ranker.select(ranked) is None
+        candidates = ranker.top_candidates(ranked, len(links))
+        assert candidates[0] == "https://acme.com/about"
+        assert len(candidates) == 3
+
+    def test_article_under_news_section_is_not_a_product_page(self):
+        ranker = LinkRanker()
+
+        score, page_type, _ = ranker.score_link(BASE, "https://acme.com/blog/our-new-products-launch", "Our new products launch")
+
+        assert page_type == "news page"
+        assert score < 60
+
+    def test_locale_variants_are_selected_once(self):
+        ranker = LinkRanker()
+        links = ["https://acme.com/about", "https://acme.com/sobre", "https://acme.com/es/sobre-nosotros",
+                 "https://acme.com/about/history", "https://acme.com/es/about/history"]
+
+        selected = ranker.select(ranker.rank(BASE, links), require_confidence=False)
+
+        assert [link["url"] for link in selected] == ["https://acme.com/about", "https://acme.com/about/history"]
+
+    def test_extract_anchors(self):
+        html = '<html><body><a href="/about"> Sobre\n nosotros </a><a href="/x" aria-label="Empleo"></a></body></html>'
+
+        assert extract_anchors(html) == {"/about": "Sobre nosotros", "/x": "Empleo"}
+
+
+class TestSelectorShortcut:
+
+    @pytest.fixture(autouse=True)
+    def store(self, monkeypatch, tmp_path):
+        # Cache en un directorio temporal: los tests no escriben en data/
+        from utils.cache_manager import CacheManager
+        from utils.cache_store import CacheStore
+        monkeypatch.setattr(CacheManager, "_store", CacheStore(str(tmp_path / "cache.sqlite3")))
+
+    def test_confident_ranking_skips_the_llm(self, monkeypatch):
+        from core import link_selector
+        from core.link_ranker import link_ranker
+        selector = link_selector.LinkSelector.__new__(link_selector.LinkSelector)
+        selector.openai_client = None  # Cualquier llamada al LLM fallaria
+        monkeypatch.setattr(link_ranker, "mode", "auto")
+
+        result = selector.select_relevant_links(BASE, OBVIOUS_LINKS)
+
+        assert len(result["links"]) >= 5
+
+    def test_llm_mode_always_calls_the_llm_with_candidates_only(self, monkeypatch):
+        from core import link_selector
+        from core.link_ranker import link_ranker
+        monkeypatch.setattr(link_ranker, "mode", "llm")
+        monkeypatch.setattr(link_selector.LinkSelector, "output_mode", "json")
+        monkeypatch.setattr(link_selector.LinkSelector, "cache_ttl_hours", 0)
+        calls = []
+
+        class FakeClient:
+            def call_openai(self, messages, **kwargs):
+                calls.append(messages[-1]["content"])
+                links = [{"type": "about page", "url": "https://acme.com/about-us", "score": 90, "rationale": "Empresa"}]
+                return {"response": json.dumps({"links": links}), "tokens": {"total": 10}}
+
+        selector = link_selector.LinkSelector.__new__(link_selector.LinkSelector)
+        selector.openai_client = FakeClient()
+
+        result = selector.select_relevant_links(BASE, OBVIOUS_LINKS)
+
+        assert len(calls) == 1
+        assert "https://acme.com/products" in calls[0]
+        assert "login" not in calls[0] and "twitter.com" not in calls[0]
+        assert result["links"][0]["url"] == "https://acme.com/about-us"
+
+
+class TestStructuredSelection:
+
+    LINKS = [f"https://acme.com/pagina-{i}" for i in range(6)] + ["https://blog.acme.com/post"]
+
+    class FakeClient:
+
+        def __init__(self, responses):
+            self.responses = responses
+            self.calls = []
+
+        def call_openai(self, messages, **kwargs):
+            self.calls.append({"messages": messages, **kwargs})
+            return {"response": json.dumps(self.responses.pop(0)), "tokens": {"total": 10}}
+
+    def make_selector(self, monkeypatch, responses):
+        from core import link_selector
+        from core.link_ranker import link_ranker
+        monkeypatch.setattr(link_ranker, "mode", "llm")
+        monkeypatch.setattr(link_selector.LinkSelector, "output_mode", "structured")
+        selector = link_selector.LinkSelector.__new__(link_selector.LinkSelector)
+        selector.openai_client = self.FakeClient(responses)
+        return selector
+
+    def test_compact_list_and_index_mapping(self, monkeypatch):
+        selector = self.make_selector(monkeypatch, [{"links": [
+            {"index": 1, "type": "about page", "score": 90, "rationale": "Empresa"},
+            {"index": 6, "type": "news page", "score": 60, "rationale": "Blog"}
+        ]}])
+
+        result = selector.query_llm(BASE, self.LINKS)
+
+        call = selector.openai_client.calls[0]
+        assert call["response_format"]["type"] == "json_schema"
+        assert "1 /pagina-1" in call["messages"][-1]["content"]
+        assert "6 https://blog.acme.com/post" in call["messages"][-1]["content"]
+        assert [link["url"] for link in result["links"]] == [self.LINKS[1], self.LINKS[6]]
+
+    def test_repair_only_asks_for_failed_items(self, monkeypatch):
+        selector = self.make_selector(monkeypatch, [
+            {"links": [
+                {"index": 0, "type": "about page", "score": 90, "rationale": "Empresa"},
+                {"index": 3, "type": "careers page", "score": 150, "rationale": "Empleo"}
+            ]},
+            {"links": [
+                {"index": 3, "type": "careers page", "score": 85, "rationale": "Empleo"},
+                {"index": 4, "type": "other", "score": 70, "rationale": "No pedido"}
+            ]}
+        ])
+
+        result = selector.query_llm(BASE, self.LINKS)
+
+        repair_message = selector.openai_client.calls[1]["messages"][-1]["content"]
+        assert len(selector.openai_client.calls[1]["messages"]) == 2
+        assert "3 /pagina-3 -> corrige score" in repair_message
+        assert "/pagina-0" not in repair_message
+        assert {link["url"]: link["score"] for link in result["links"]} == {self.LINKS[0]: 90, self.LINKS[3]: 85}
+
+    def test_models_without_structured_output_use_json(self, monkeypatch):
+        selector = self.make_selector(monkeypatch, [{"links": [
+            {"type": "about page", "url": self.LINKS[1], "score": 90, "rationale": "Empresa"}
+        ]}])
+
+        result = selector.query_llm(BASE, self.LINKS, model="gpt-3.5-turbo")
+
+        assert "response_format" not in selector.openai_client.calls[0]
+        assert result["links"][0]["url"] == self.LINKS[1]
@@ -0,0 +1,182 @@
+import pytest
+import asyncio
+import contextvars
+import threading
+from utils.metrics import MetricsRegistry, MetricsTracker, percentile
+
+
+def make_tracker():
+    return MetricsTracker(registry=MetricsRegistry())
+
+
+class TestMetricsRegistry:
+
+    def test_counters_from_threads_and_tasks(self):
+        registry = MetricsRegistry()
+
+        def work():
+            for _ in range(1000):
+                registry.inc("calls_total", model="gpt-4o-mini")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        async def task():
+            for _ in range(100):
+                registry.inc("calls_total", model="gpt-4o")
+                await asyncio.sleep(0)
+
+        async def run_tasks():
+            await asyncio.gather(*(task() for _ in range(10)))
+
+        asyncio.run(run_tasks())
+
+        assert registry.get("calls_total", model="gpt-4o-mini") == 8000
+        assert registry.get("calls_total", model="gpt-4o") == 1000
+
+    def test_prometheus_exposition(self, tmp_path):
+        registry = MetricsRegistry()
+        registry.inc("brochure_llm_cache_total", cache="hit", stage='Traduccion "fr"')
+        registry.set_gauge("brochure_llm_in_flight", 2, model="gpt-4o")
+        for value in (0.03, 0.2, 400):
+            registry.observe("brochure_stage_seconds", value, stage="Scraping")
+
+        text = registry.to_prometheus()
+
+        assert "# TYPE brochure_llm_cache_total counter" in text
+        assert 'brochure_llm_cache_total{cache="hit",stage="Traduccion \\"fr\\""} 1' in text
+        assert 'brochure_llm_in_flight{model="gpt-4o"} 2' in text
+        assert "# TYPE brochure_stage_seconds histogram" in text
+        assert 'brochure_stage_seconds_bucket{stage="Scraping",le="0.05"} 1' in text
+        assert 'brochure_stage_seconds_bucket{stage="Scraping",le="0.25"} 2' in text
+        assert 'brochure_stage_seconds_bucket{stage="Scraping",le="300.0"} 2' in text
+        assert 'brochure_stage_seconds_bucket{stage="Scraping",le="+Inf"} 3' in text
+        assert 'brochure_stage_seconds_count{stage="Scraping"} 3' in text
+
+        path = tmp_path / "metrics.prom"
+        registry.write_prometheus(str(path))
+        assert path.read_text(encoding="utf-8") == text
+
+    def test_snapshots_from_several_processes_are_summed(self):
+        workers = [MetricsRegistry(), MetricsRegistry()]
+        for i, worker in enumerate(workers):
+            worker.inc("brochure_runs_total", 2)
+            worker.observe("brochure_stage_seconds", i + 1, stage="Seleccion")
+
+        combined = MetricsRegistry()
+        combined.load_snapshots([worker.snapshot() for worker in workers])
+
+        assert combined.get("brochure_runs_total") == 4
+        stats = combined.describe("brochure_stage_seconds", by="stage")["Seleccion"]
+        assert stats["count"] == 2
+        assert stats["max"] == 2
+        assert 'brochure_stage_seconds_sum{stage="Seleccion"} 3.0' in combined.to_prometheus()
+
+    def test_percentile(self):
+        assert percentile([], 50) is None
+        assert percentile([3, 1, 2], 50) == 2
+        assert percentile([1, 2, 3, 4], 95) == pytest.approx(3.85)
+
+
+class TestMetricsTracker:
+
+    def test_repeated_stages_accumulate(self):
+        tracker = make_tracker()
+        tracker.start()
+
+        tracker.record_stage("Compilacion", 1.0)
+        tracker.record_stage("Compilacion", 3.0)
+
+        summary = tracker.get_summary()
+        assert summary["stages"]["Compilacion"] == 4.0
+        assert summary["stage_stats"]["Compilacion"]["count"] == 2
+        assert summary["stage_stats"]["Compilacion"]["p50"] == 2.0
+        assert tracker.registry.describe("brochure_stage_seconds", by="stage")["Compilacion"]["count"] == 2
+
+    def test_llm_requests_are_labelled_by_stage_and_model(self):
+        tracker = make_tracker()
+        tracker.start()
+
+        with tracker.llm_stage("Seleccion de enlaces"):
+            with tracker.llm_request("gpt-4o-mini"):
+                pass
+            with pytest.raises(RuntimeError):
+                with tracker.llm_request("gpt-4o-mini"):
+                    raise RuntimeError("fallo")
+            tracker.record_llm_cache(True, 100, model="gpt-4o-mini")
+
+        summary = tracker.get_summary()
+        assert summary["llm_latency"]["gpt-4o-mini"]["count"] == 2
+        assert summary["llm_cache"]["hits"] == 1
+        text = tracker.registry.to_prometheus()
+        assert 'model="gpt-4o-mini",stage="Seleccion de enlaces",status="RuntimeError"' in text
+        assert 'brochure_llm_cache_total{cache="hit",model="gpt-4o-mini",stage="Seleccion de enlaces"} 1' in text
+        assert tracker.registry.get("brochure_llm_in_flight", model="gpt-4o-mini") == 0
+
+    def test_concurrent_runs_do_not_mix(self):
+        tracker = make_tracker()
+        barrier = threading.Barrier(2)
+        summaries = {}
+
+        def pipeline(name, tokens):
+            tracker.start()
+            barrier.wait()
+            tracker.record_stage("Scraping", 1.0)
+            tracker.add_tokens("gpt-4o-mini", tokens, 0)
+            barrier.wait()
+            summaries[name] = tracker.get_summary()
+
+        threads = [threading.Thread(target=contextvars.Context().run, args=(pipeline, name, tokens))
+                   for name, tokens in (("a", 100), ("b", 300))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert summaries["a"]["total_tokens"] == 100
+        assert summaries["b"]["total_tokens"] == 300
+        assert summaries["a"]["stages"] == {"Scraping": 1.0}
+        assert tracker.registry.get("brochure_runs_total") == 2
+
+    def test_pool_threads_record_into_their_run(self, monkeypatch):
+        from core.compiler import Compiler
+        tracker = make_tracker()
+        barrier = threading.Barrier(2)
+        summaries = {}
+
+        def fake_fetch(link_info, **kwargs):
+            tracker.record_http(link_info["url"], 200, 0.1)
+            tracker.add_tokens("gpt-4o-mini", 10, 0)
+            return {"url": link_info["url"], "title": "", "content": "texto"}
+
+        monkeypatch.setattr(Compiler, "fetch_page", staticmethod(fake_fetch))
+
+        def pipeline(host):
+            tracker.start()
+            barrier.wait()
+            links = {"links": [{"url": f"https://{host}/{path}", "type": "about", "score": 90} for path in ("a", "b")]}
+            Compiler.compile_pages(links, delay=0, max_workers=2)
+            summaries[host] = tracker.get_summary()
+
+        threads = [threading.Thread(target=contextvars.Context().run, args=(pipeline, host))
+                   for host in ("a.example", "b.example")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for host in ("a.example", "b.example"):
+            assert set(summaries[host]["http_latency"]) == {host}
+            assert summaries[host]["http_latency"][host]["count"] == 2
+            assert summaries[host]["total_tokens"] == 20
+
+    def test_finish_exports_file(self, tmp_path):
+        tracker = make_tracker()
+        tracker.configure_export(path=str(tmp_path / "run.prom"))
+        tracker.start()
+        tracker.finish()
+
+        assert "brochure_run_seconds_count 1" in (tmp_path / "run.prom").read_text(encoding="utf-8")
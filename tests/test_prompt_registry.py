@@ -0,0 +1,74 @@
+import json
+import os
+import pytest
+from utils.prompt_registry import PromptRegistry
+
+
+@pytest.fixture
+def prompts_dir(tmp_path):
+    (tmp_path / "system.md").write_text("Eres un asistente.", encoding="utf-8")
+    (tmp_path / "tone.md").write_text("Tono formal.", encoding="utf-8")
+    shots = [{"role": "user", "content": "Ejemplo"}, {"role": "assistant", "content": {"links": []}}]
+    (tmp_path / "shots.json").write_text(json.dumps(shots), encoding="utf-8")
+    return tmp_path
+
+
+def touch(path, text):
+    # Forzar un mtime distinto aunque la escritura caiga en el mismo tick del reloj
+    path.write_text(text, encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+class TestPromptRegistry:
+
+    def test_files_are_read_once(self, prompts_dir, monkeypatch):
+        registry = PromptRegistry(str(prompts_dir))
+        reads = []
+        real_open = open
+        monkeypatch.setattr("builtins.open", lambda path, *args, **kwargs: reads.append(path) or real_open(path, *args, **kwargs))
+
+        for _ in range(5):
+            registry.get_text("system.md")
+            registry.get_messages("shots.json")
+
+        assert len(reads) == 2
+
+    def test_few_shot_assistant_content_is_serialized(self, prompts_dir):
+        registry = PromptRegistry(str(prompts_dir))
+
+        messages = registry.get_messages("shots.json")
+
+        assert messages[1] == {"role": "assistant", "content": '{"links": []}'}
+
+    def test_prefix_is_stable_until_a_file_changes(self, prompts_dir):
+        registry = PromptRegistry(str(prompts_dir))
+
+        first, first_hash = registry.get_prefix(["system.md", "tone.md"], "shots.json")
+        second, second_hash = registry.get_prefix(["system.md", "tone.md"], "shots.json")
+        touch(prompts_dir / "tone.md", "Tono humoristico.")
+        third, third_hash = registry.get_prefix(["system.md", "tone.md"], "shots.json")
+
+        assert first == second and first_hash == second_hash
+        assert first[0]["content"] == "Eres un asistente.\n\nTono formal."
+        assert third[0]["content"].endswith("Tono humoristico.")
+        assert third_hash != first_hash
+
+    def test_callers_cannot_alter_the_cached_prefix(self, prompts_dir):
+        registry = PromptRegistry(str(prompts_dir))
+
+        messages, _ = registry.get_prefix(["system.md"])
+        messages.append({"role": "user", "content": "Hola"})
+        messages[0]["content"] = "otro"
+
+        assert registry.get_prefix(["system.md"])[0] == [{"role": "system", "content": "Eres un asistente."}]
+
+    def test_version_changes_on_edit_and_missing_files(self, prompts_dir):
+        registry = PromptRegistry(str(prompts_dir))
+        version = registry.get_version()
+
+        touch(prompts_dir / "system.md", "Eres otro asistente.")
+
+        assert registry.get_version() != version
+        assert registry.get_text("no_existe.md") is None
+        assert registry.get_prefix(["no_existe.md"]) == (None, None)
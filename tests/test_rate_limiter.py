@@ -0,0 +1,229 @@
+import pytest
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from openai import RateLimitError
+from utils.rate_limiter import RateLimiter, TokenBucket, backoff_delay, estimate_tokens, get_retry_after
+
+
+def make_completion(text="Respuesta"):
+    return SimpleNamespace(
+        model="gpt-4o-mini",
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text), finish_reason="stop")],
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+    )
+
+
+def make_rate_limit_error(retry_after="2"):
+    response = SimpleNamespace(status_code=429, headers={"retry-after": retry_after}, request=None)
+    return RateLimitError("Rate limit reached", response=response, body=None)
+
+
+class TestTokenBucket:
+
+    def test_reservations_queue_in_order(self):
+        bucket = TokenBucket(capacity=2, per_second=1, now=0)
+
+        assert bucket.reserve(1, now=0) == 0
+        assert bucket.reserve(1, now=0) == 0
+        assert bucket.reserve(1, now=0) == pytest.approx(1)
+        assert bucket.reserve(1, now=0) == pytest.approx(2)
+
+    def test_refill_is_capped(self):
+        bucket = TokenBucket(capacity=2, per_second=1, now=0)
+        bucket.reserve(2, now=0)
+
+        bucket.refund(0, now=100)
+
+        assert bucket.tokens == 2
+
+
+class TestRateLimiter:
+
+    def test_rpm_limit_delays_extra_requests(self):
+        limiter = RateLimiter(limits={"m": {"rpm": 60, "tpm": 10 ** 6}})
+
+        waits = [limiter.reserve("m", 10) for _ in range(62)]
+
+        assert waits[59] == 0
+        assert waits[60] == pytest.approx(1, abs=0.05)
+        assert waits[61] == pytest.approx(2, abs=0.05)
+
+    def test_tpm_settle_refunds_overestimate(self):
+        limiter = RateLimiter(limits={"m": {"rpm": 10 ** 6, "tpm": 6000}})
+
+        assert limiter.reserve("m", 6000) == 0
+        limiter.settle("m", 6000, 1000)
+
+        assert limiter.reserve("m", 4000) == 0
+        assert limiter.reserve("m", 2000) > 0
+
+    def test_scale_splits_quota(self):
+        limiter = RateLimiter(limits={"m": {"rpm": 60, "tpm": 10 ** 6}})
+        limiter.configure(scale=0.5)
+
+        waits = [limiter.reserve("m", 1) for _ in range(31)]
+
+        assert waits[29] == 0
+        assert waits[30] > 0
+
+    def test_penalize_blocks_model(self):
+        limiter = RateLimiter()
+        limiter.penalize("gpt-4o-mini", 5)
+
+        assert limiter.reserve("gpt-4o-mini", 1) == pytest.approx(5, abs=0.1)
+        assert limiter.reserve("gpt-4o", 1) == 0
+
+    def test_acquire_async_waits_without_blocking_loop(self):
+        limiter = RateLimiter(limits={"m": {"rpm": 60, "tpm": 10 ** 6}})
+        limiter.penalize("m", 0.05)
+        ticks = []
+
+        async def ticker():
+            for _ in range(3):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def run():
+            return (await asyncio.gather(limiter.acquire_async("m", 1), ticker()))[0]
+
+        wait = asyncio.run(run())
+
+        assert wait == pytest.approx(0.05, abs=0.02)
+        assert len(ticks) == 3
+
+
+class TestBackoff:
+
+    def test_retry_after_header(self):
+        assert get_retry_after(make_rate_limit_error("7")) == 7
+        ms_error = SimpleNamespace(response=SimpleNamespace(headers={"retry-after-ms": "1500"}))
+        assert get_retry_after(ms_error) == 1.5
+        assert get_retry_after(Exception("sin respuesta")) is None
+
+    def test_backoff_respects_server_hint(self):
+        for attempt in range(1, 6):
+            assert backoff_delay(attempt, retry_after=4) >= 4
+            assert backoff_delay(attempt, cap=3) <= 3
+
+    def test_estimate_includes_max_tokens(self):
+        messages = [{"role": "user", "content": "x" * 400}]
+
+        assert estimate_tokens(messages, 1000) == 100 + 4 + 1000
+
+
+class TestClientRetries:
+
+    @pytest.fixture
+    def limiter(self, monkeypatch):
+        from utils import api_openai
+        limiter = RateLimiter()
+        monkeypatch.setattr(api_openai, "rate_limiter", limiter)
+        return limiter
+
+    def make_client(self, client_class):
+        client = client_class.__new__(client_class)
+        client.mock_mode = False
+        client.client = MagicMock()
+        return client
+
+    def test_sync_retry_waits_for_retry_after(self, monkeypatch, limiter):
+        from utils.api_openai import OpenAIClient
+        sleeps = []
+        monkeypatch.setattr(OpenAIClient, "response_cache", False)
+        monkeypatch.setattr(time, "sleep", lambda seconds: sleeps.append(seconds))
+        client = self.make_client(OpenAIClient)
+        client.client.chat.completions.create.side_effect = [make_rate_limit_error("3"), make_completion()]
+
+        result = client.call_openai([{"role": "user", "content": "Hola"}])
+
+        assert result["response"] == "Respuesta"
+        assert result["tokens"] == {"total": 15, "prompt": 10, "completion": 5}
+        assert sleeps and sleeps[0] >= 3
+
+    def test_sync_gives_up_after_max_attempts(self, monkeypatch, limiter):
+        from utils.api_openai import OpenAIClient
+        monkeypatch.setattr(OpenAIClient, "response_cache", False)
+        monkeypatch.setattr(time, "sleep", lambda seconds: None)
+        client = self.make_client(OpenAIClient)
+        client.client.chat.completions.create.side_effect = make_rate_limit_error("0")
+
+        result = client.call_openai([{"role": "user", "content": "Hola"}])
+
+        assert result["response"] == "Error irrecuperable"
+        assert result["failed"] is True
+        assert client.client.chat.completions.create.call_count == OpenAIClient.max_attempts
+
+    def test_async_client_caps_in_flight(self, monkeypatch, limiter):
+        from utils.api_openai import AsyncOpenAIClient
+        monkeypatch.setattr(AsyncOpenAIClient, "response_cache", False)
+        client = self.make_client(AsyncOpenAIClient)
+        client.max_in_flight = 2
+        client._semaphore_loop = None
+        active = []
+        peak = []
+
+        async def fake_create(**kwargs):
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.pop()
+            return make_completion(kwargs["messages"][0]["content"])
+
+        client.client.chat.completions.create = fake_create
+
+        async def run():
+            calls = [client.call_openai([{"role": "user", "content": str(i)}]) for i in range(6)]
+            return await asyncio.gather(*calls)
+
+        results = asyncio.run(run())
+
+        assert [r["response"] for r in results] == [str(i) for i in range(6)]
+        assert max(peak) == 2
+
+    def test_async_client_retries_rate_limit(self, monkeypatch, limiter):
+        from utils import api_openai
+        from utils.api_openai import AsyncOpenAIClient
+        monkeypatch.setattr(AsyncOpenAIClient, "response_cache", False)
+        monkeypatch.setattr(api_openai, "backoff_delay", lambda attempt, retry_after=None: 0.01)
+        client = self.make_client(AsyncOpenAIClient)
+        client.max_in_flight = 4
+        client._semaphore_loop = None
+        outcomes = [make_rate_limit_error("0"), make_completion()]
+
+        async def fake_create(**kwargs):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        client.client.chat.completions.create = fake_create
+
+        result = asyncio.run(client.call_openai([{"role": "user", "content": "Hola"}]))
+
+        assert result["response"] == "Respuesta"
+
+    def test_async_client_raises_instead_of_exiting(self, monkeypatch, limiter):
+        from utils.api_openai import AsyncOpenAIClient, LLMClientError
+        monkeypatch.setattr(AsyncOpenAIClient, "response_cache", False)
+        client = self.make_client(AsyncOpenAIClient)
+        client.max_in_flight = 1
+        client._semaphore_loop = None
+        outcomes = [ValueError("respuesta corrupta"), make_completion()]
+
+        async def fake_create(**kwargs):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        client.client.chat.completions.create = fake_create
+
+        async def run():
+            with pytest.raises(LLMClientError):
+                await client.call_openai([{"role": "user", "content": "Hola"}])
+            # El hueco del semaforo se libera y el loop sigue vivo
+            return await asyncio.wait_for(client.call_openai([{"role": "user", "content": "Hola"}]), timeout=1)
+
+        assert asyncio.run(run())["response"] == "Respuesta"
@@ -0,0 +1,188 @@
+import pytest
+import asyncio
+import threading
+import time
+import responses
+from core.scraping import Web
+from utils.http_client import AsyncHttpClient, HttpClient, http_client
+from utils.robots_checker import RobotsChecker, robots_checker
+
+
+class TestHttpClient:
+
+    def test_session_is_reused(self):
+        client = HttpClient()
+        assert client.session is client.session
+
+    def test_default_headers(self):
+        client = HttpClient()
+        headers = client.session.headers
+
+        assert headers["User-Agent"].startswith("BrochureBot/1.0")
+        assert "gzip" in headers["Accept-Encoding"]
+
+    def test_configure_rebuilds_session(self):
+        client = HttpClient()
+        first = client.session
+        client.configure(pool_maxsize=2, read_timeout=5)
+
+        assert client.session is not first
+        assert client.timeout == (client.connect_timeout, 5)
+
+    def test_configure_rejects_unknown_setting(self):
+        with pytest.raises(AttributeError):
+            HttpClient().configure(unknown=1)
+
+
+class TestAsyncHttpClient:
+
+    @responses.activate
+    def test_uses_shared_session(self):
+        responses.add(responses.GET, "https://async-shared.com/", body="<html>ok</html>")
+        client = HttpClient()
+
+        response = asyncio.run(AsyncHttpClient(client).get("https://async-shared.com/"))
+
+        assert response.text == "<html>ok</html>"
+        assert responses.calls[0].request.headers["User-Agent"] == client.session.headers["User-Agent"]
+
+    def test_in_flight_is_capped_per_host_by_pool_size(self):
+        active = {}
+        peak = {}
+        lock = threading.Lock()
+
+        class FakeClient:
+            pool_maxsize = 2
+
+            def get(self, url, headers=None, timeout=None):
+                host = url.split("/")[2]
+                with lock:
+                    active[host] = active.get(host, 0) + 1
+                    peak[host] = max(peak.get(host, 0), active[host])
+                time.sleep(0.02)
+                with lock:
+                    active[host] -= 1
+                return type("Response", (), {"content": b"", "url": url})()
+
+        client = AsyncHttpClient(FakeClient(), max_in_flight=3)
+
+        async def run():
+            urls = [f"https://{host}/{i}" for host in ("a.com", "b.com") for i in range(5)]
+            return await asyncio.gather(*(client.get(url) for url in urls))
+
+        responses_ = asyncio.run(run())
+        # Un segundo event loop recrea los semaforos en lugar de reutilizar los del primero
+        asyncio.run(run())
+
+        assert len(responses_) == 10
+        assert peak == {"a.com": 2, "b.com": 2}
+
+
+class TestRobotsChecker:
+
+    @responses.activate
+    def test_rules_are_applied(self):
+        responses.add(responses.GET, "https://robots-rules.com/robots.txt",
+                      body="User-agent: *\nDisallow: /private\n")
+        checker = RobotsChecker()
+
+        assert checker.can_fetch("https://robots-rules.com/about")
+        assert not checker.can_fetch("https://robots-rules.com/private/page")
+        # robots.txt se descarga una unica vez por host
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_forbidden_robots_disallows_all(self):
+        responses.add(responses.GET, "https://robots-forbidden.com/robots.txt", status=403)
+
+        assert not RobotsChecker().can_fetch("https://robots-forbidden.com/about")
+
+    @responses.activate
+    def test_missing_robots_allows_all(self):
+        responses.add(responses.GET, "https://robots-missing.com/robots.txt", status=404)
+
+        assert RobotsChecker().can_fetch("https://robots-missing.com/about")
+
+
+class TestWebGetData:
+
+    @responses.activate
+    def test_get_data_uses_shared_session(self, monkeypatch):
+        monkeypatch.setattr(robots_checker, "can_fetch", lambda url: True)
+        responses.add(responses.GET, "https://shared-session.com/", body="<html>ok</html>")
+
+        assert Web.get_data("https://shared-session.com/") == "<html>ok</html>"
+        assert responses.calls[0].request.headers["User-Agent"] == http_client.session.headers["User-Agent"]
+
+    @responses.activate
+    def test_get_data_http_error_returns_none(self, monkeypatch):
+        monkeypatch.setattr(robots_checker, "can_fetch", lambda url: True)
+        responses.add(responses.GET, "https://http-error.com/", status=404)
+
+        assert Web.get_data("https://http-error.com/") is None
+
+
+class TestStreaming:
+
+    @pytest.fixture(autouse=True)
+    def store(self, monkeypatch, tmp_path):
+        # Cache en un directorio temporal: los tests no escriben en data/
+        from utils.cache_manager import CacheManager
+        from utils.cache_store import CacheStore
+        monkeypatch.setattr(CacheManager, "_store", CacheStore(str(tmp_path / "cache.sqlite3")))
+
+    def page(self, paragraphs, footer=True):
+        body = "".join(f"<p>Parrafo numero {i} con texto de relleno</p>" for i in range(paragraphs))
+        footer_html = "<footer><a href='/contact'>Contacto</a></footer>" if footer else ""
+        tail = "<p>contenido posterior</p>" * 5000
+        return f"<html><head><title>Stream</title></head><body><a href='/about'>About</a>{body}{footer_html}{tail}</body></html>"
+
+    def test_streaming_extractor_matches_bs4_in_small_chunks(self):
+        from core.extractors import StreamingExtractor, get_extractor
+        from mock_pages import get_mock_html_pages
+
+        for url, html in get_mock_html_pages("formal"):
+            extractor = StreamingExtractor(text_budget=10 ** 9)
+            for i in range(0, len(html), 13):
+                extractor.feed(html[i:i + 13])
+            extractor.close()
+
+            expected = get_extractor("bs4").extract(html)
+            assert extractor.result() == [str(expected[0]), expected[1], expected[2]]
+
+    @responses.activate
+    def test_stops_after_budget_and_footer(self, monkeypatch):
+        monkeypatch.setattr(robots_checker, "can_fetch", lambda url: True)
+        html = self.page(200)
+        responses.add(responses.GET, "https://stream-cut.com/", body=html)
+
+        result = Web.get_data_streaming("https://stream-cut.com/", text_budget=2000, chunk_size=1024)
+        title, text, links = result["parsed"]
+
+        assert not result["complete"]
+        assert len(result["html"]) < len(html) / 2
+        assert title == "Stream"
+        assert links == ["/about", "/contact"]
+        assert "contenido posterior" not in text
+
+    @responses.activate
+    def test_max_bytes_guard(self, monkeypatch):
+        monkeypatch.setattr(robots_checker, "can_fetch", lambda url: True)
+        responses.add(responses.GET, "https://stream-huge.com/", body=self.page(10, footer=False))
+
+        result = Web.get_data_streaming("https://stream-huge.com/", text_budget=10 ** 9, max_bytes=4096, chunk_size=1024)
+
+        assert not result["complete"]
+        assert len(result["html"]) <= 4096
+
+    @responses.activate
+    def test_small_page_is_complete_and_cached(self, monkeypatch):
+        from utils.cache_manager import CacheManager
+        monkeypatch.setattr(robots_checker, "can_fetch", lambda url: True)
+        html = "<html><head><title>Corta</title></head><body><p>Hola</p></body></html>"
+        responses.add(responses.GET, "https://stream-small.com/", body=html)
+
+        parsed = Web.get_page_text("https://stream-small.com/", streaming=True)
+
+        assert parsed == ["Corta", "Hola", []]
+        assert CacheManager.load_from_cache("https://stream-small.com/") == html
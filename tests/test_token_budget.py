@@ -0,0 +1,65 @@
+import pytest
+from utils.token_budget import TokenBudget
+
+
+PARAGRAPHS = "\n\n".join(f"Parrafo {i}: " + "texto de relleno " * 20 for i in range(10))
+
+
+class TestTokenBudget:
+
+    def test_trim_keeps_whole_paragraphs(self):
+        budget = TokenBudget()
+        limit = budget.count(PARAGRAPHS) // 3
+
+        trimmed = budget.trim(PARAGRAPHS, limit)
+
+        assert budget.count(trimmed) <= limit
+        assert PARAGRAPHS.startswith(trimmed)
+        assert all(paragraph in PARAGRAPHS.split("\n\n") for paragraph in trimmed.split("\n\n"))
+
+    def test_trim_falls_back_to_words(self):
+        budget = TokenBudget()
+        text = "palabra " * 500
+
+        trimmed = budget.trim(text, 50)
+
+        assert 0 < budget.count(trimmed) <= 50
+        assert set(trimmed.split()) == {"palabra"}
+
+    def test_small_sections_stay_whole_and_large_ones_share_the_rest(self):
+        budget = TokenBudget()
+        sections = {"contact page": "Email: hola@ejemplo.com", "about page": PARAGRAPHS, "blog page": PARAGRAPHS}
+
+        packed, report = budget.pack(sections, 300)
+
+        assert packed["contact page"] == sections["contact page"]
+        assert sum(packed_size for _, packed_size in report.values()) <= 300
+        # La pagina "about" tiene mas prioridad que el blog
+        assert report["about page"][1] > report["blog page"][1]
+
+    def test_everything_fits_untouched(self):
+        budget = TokenBudget()
+        sections = {"about": "Somos una empresa", "careers": "Trabaja con nosotros"}
+
+        packed, _ = budget.pack(sections, 1000)
+
+        assert packed == sections
+
+    def test_input_budget_respects_context_window(self):
+        budget = TokenBudget(max_prompt_tokens=100000)
+        messages = [{"role": "system", "content": "Instrucciones " * 100}]
+
+        small = budget.input_budget("gpt-4", 4000, messages)
+        large = budget.input_budget("gpt-4o-mini", 4000, messages)
+
+        assert small < 8192 - 4000
+        assert large == 100000
+
+    def test_pack_lines_keeps_prefix(self):
+        budget = TokenBudget()
+        lines = [f"- https://ejemplo.com/pagina/{i}" for i in range(500)]
+
+        packed = budget.pack_lines(lines, 200)
+
+        assert 0 < len(packed) < len(lines)
+        assert packed == lines[:len(packed)]
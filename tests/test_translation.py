@@ -0,0 +1,140 @@
+import pytest
+import threading
+import time
+from core.translation import ChunkedTranslator, markdown_structure, split_sections
+
+
+BROCHURE = """# Folleto de Empresa
+
+## Resumen
+Somos una empresa de IA.
+
+## Productos/Servicios
+- **Hub**: modelos abiertos
+- **Spaces**: demos
+
+```
+## no es una seccion
+```
+
+## Contacto
+1. Web
+2. Email"""
+
+
+class TestSplitSections:
+
+    def test_split_at_level_two_headings(self):
+        sections = split_sections(BROCHURE)
+
+        assert [s.split("\n")[0] for s in sections] == ["# Folleto de Empresa", "## Resumen", "## Productos/Servicios", "## Contacto"]
+        assert "## no es una seccion" in sections[2]
+        assert "\n\n".join(sections) == BROCHURE
+
+    def test_structure_fingerprint(self):
+        structure = markdown_structure(BROCHURE)
+
+        assert structure == {"headings": [1, 2, 2, 2], "list_items": 4, "table_rows": 0}
+
+
+class TestChunkedTranslator:
+
+    def test_sections_run_in_parallel_and_keep_order(self):
+        translator = ChunkedTranslator(max_workers=4)
+        delays = {"# Folleto de Empresa": 0.05, "## Resumen": 0.2, "## Productos/Servicios": 0.1, "## Contacto": 0.05}
+
+        def translate(section):
+            time.sleep(delays[section.split("\n")[0]])
+            return section.upper()
+
+        start = time.time()
+        result = translator.translate(BROCHURE, translate)
+        elapsed = time.time() - start
+
+        assert result == "\n\n".join(s.upper() for s in split_sections(BROCHURE))
+        assert elapsed < 0.3
+
+    def test_worker_count_is_bounded(self):
+        translator = ChunkedTranslator(max_workers=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def translate(section):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+            return section
+
+        translator.translate(BROCHURE, translate)
+
+        assert max(peak) == 2
+
+    def test_failed_section_is_retried_alone(self):
+        translator = ChunkedTranslator(max_workers=4, max_attempts=2)
+        calls = {}
+
+        def translate(section):
+            title = section.split("\n")[0]
+            calls[title] = calls.get(title, 0) + 1
+            if title == "## Contacto" and calls[title] == 1:
+                return None
+            return section
+
+        assert translator.translate(BROCHURE, translate) == BROCHURE
+        assert calls["## Contacto"] == 2
+        assert calls["## Resumen"] == 1
+
+    def test_broken_structure_triggers_retry(self):
+        translator = ChunkedTranslator(max_workers=1, max_attempts=2)
+        attempts = []
+
+        def translate(section):
+            attempts.append(section)
+            if section.startswith("## Productos") and len([a for a in attempts if a.startswith("## Productos")]) == 1:
+                return "## Products\nHub y Spaces en una sola linea"
+            return section
+
+        assert translator.translate(BROCHURE, translate) == BROCHURE
+
+    def test_untranslatable_section_keeps_original(self):
+        translator = ChunkedTranslator(max_workers=2, max_attempts=2)
+
+        result = translator.translate(BROCHURE, lambda section: None)
+
+        assert result == BROCHURE
+
+    def test_costs_are_attributed_per_language_across_threads(self):
+        from utils.metrics import MetricsTracker
+        tracker = MetricsTracker()
+        translator = ChunkedTranslator(max_workers=4)
+
+        def translate(section):
+            tracker.add_tokens("gpt-4o-mini", 100, 50)
+            return section
+
+        for lang in ("fr", "de"):
+            with tracker.llm_stage(f"Traduccion ({lang})"):
+                translator.translate(BROCHURE, translate)
+
+        sections = len(split_sections(BROCHURE))
+        assert tracker.stage_costs["Traduccion (fr)"]["calls"] == sections
+        assert tracker.stage_costs["Traduccion (de)"]["tokens"] == sections * 150
+        assert tracker.total_tokens == 2 * sections * 150
+
+
+class TestTranslateChunk:
+
+    def test_failure_is_detected_when_budget_changes_model(self):
+        from unittest.mock import MagicMock
+        from core.brochure import BrochureGenerator
+        from utils.api_openai import OpenAIClient
+        generator = BrochureGenerator.__new__(BrochureGenerator)
+        generator.openai_client = MagicMock()
+        # El presupuesto sustituyo gpt-4 por gpt-4o-mini antes de agotar los reintentos
+        generator.openai_client.call_openai.return_value = OpenAIClient.failed_result("gpt-4o-mini")
+
+        assert generator.translate_chunk("## Resumen\nSomos una empresa.", "fr", "gpt-4") is None
@@ -1,5 +1,6 @@
 import pytest
-from utils.validators import validate_selected_links, validate_compiled_content
+from utils.validators import (validate_selected_links, validate_compiled_content, validate_indexed_links,
+                              get_strict_schema, IndexedLinksResponse)
 
 
 class TestValidators:
@@ -64,6 +65,49 @@ class TestValidators:
         assert "empty page" not in result
 
 
+class TestIndexedLinks:
+    
+    URLS = ["https://example.com/", "https://example.com/about", "https://example.com/careers"]
+    
+    def test_strict_schema(self):
+        schema = get_strict_schema(IndexedLinksResponse)["schema"]
+        item = schema["$defs"]["IndexedLink"]
+        
+        assert schema["additionalProperties"] is False
+        assert item["additionalProperties"] is False
+        assert item["required"] == list(item["properties"])
+        assert "url" not in item["properties"]
+        assert "maximum" not in item["properties"]["score"]
+    
+    def test_indices_are_mapped_to_urls(self):
+        data = {"links": [
+            {"index": 2, "type": "careers page", "score": 80, "rationale": "Empleo"},
+            {"index": 2, "type": "careers page", "score": 80, "rationale": "Repetido"},
+            {"index": 9, "type": "about page", "score": 90, "rationale": "Fuera de la lista"}
+        ]}
+        
+        links, errors = validate_indexed_links(data, self.URLS)
+        
+        assert links == [{"type": "careers page", "url": self.URLS[2], "score": 80, "rationale": "Empleo"}]
+        assert errors == []
+    
+    def test_invalid_fields_are_reported(self):
+        item = {"index": 1, "type": "about page", "score": 120, "rationale": ""}
+        
+        links, errors = validate_indexed_links({"links": [item]}, self.URLS)
+        
+        assert links == []
+        assert errors == [{"item": item, "fields": ["rationale", "score"]}]
+    
+    def test_boolean_index_is_discarded(self):
+        data = {"links": [{"index": True, "type": "about page", "score": 90, "rationale": "Empresa"}]}
+        
+        links, errors = validate_indexed_links(data, self.URLS)
+        
+        assert links == []
+        assert errors == []
+
+
 class TestMockMode:
     
     def test_mock_compiled_content_loads(self):